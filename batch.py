@@ -0,0 +1,199 @@
+import os
+import csv
+import json
+import time
+import logging
+import argparse
+import threading
+from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils import (LocationGenerator, PERPLEXITY_RPM, ANTHROPIC_RPM, PLACES_RPM,
+                   METRICS_JSONL, METRICS_PORT)
+from metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+
+def load_jobs(path: str) -> List[Dict]:
+    """Load (location, keyword, radius, count) jobs from a CSV or JSONL file"""
+    rows = []
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"Invalid JSON on line {line_number} of {path}: {e}")
+        else:
+            rows = list(csv.DictReader(f))
+
+    jobs = []
+    for row in rows:
+        location = (row.get('location') or '').strip()
+        keyword = (row.get('keyword') or '').strip()
+        if not location or not keyword:
+            logger.warning(f"Skipping job without location or keyword: {row}")
+            continue
+        jobs.append({
+            'location': location,
+            'keyword': keyword,
+            'radius': int(row.get('radius') or 50),
+            'count': int(row.get('count') or 10)
+        })
+    return jobs
+
+
+def job_key(job: Dict) -> str:
+    """Stable identifier used to checkpoint a job"""
+    return f"{job['location'].lower()}|{job['keyword'].lower()}|{job['radius']}|{job['count']}"
+
+
+def load_checkpoint(path: str) -> Dict[str, Dict]:
+    """Return the jobs already completed according to the checkpoint file"""
+    completed = {}
+    if not os.path.exists(path):
+        return completed
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A partial last line from an interrupted run
+                continue
+            completed[record['key']] = record
+    return completed
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class BatchRunner:
+    """Runs many generate_locations jobs with a global concurrency limit"""
+
+    def __init__(self, generator: LocationGenerator, checkpoint_path: str, concurrency: int = 4,
+                 bypass_cache: bool = False):
+        self.generator = generator
+        self.checkpoint_path = checkpoint_path
+        self.concurrency = max(1, concurrency)
+        self.bypass_cache = bypass_cache
+        self._checkpoint_lock = threading.Lock()
+
+    def run(self, jobs: List[Dict]) -> Dict:
+        completed = load_checkpoint(self.checkpoint_path)
+        pending = [job for job in jobs if job_key(job) not in completed]
+        skipped = len(jobs) - len(pending)
+        logger.info(f"{len(pending)} jobs to run, {skipped} already completed")
+
+        durations = []
+        failures = []
+        started_at = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {executor.submit(self._run_job, job): job for job in pending}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    durations.append(future.result())
+                except Exception as e:
+                    logger.error(f"Job failed for {job['location']} ({job['keyword']}): {e}")
+                    failures.append({**job, 'error': str(e)})
+
+        elapsed = time.monotonic() - started_at
+        succeeded = len(durations)
+        report = {
+            'total': len(jobs),
+            'skipped': skipped,
+            'succeeded': succeeded,
+            'failed': len(failures),
+            'elapsed_seconds': round(elapsed, 2),
+            'jobs_per_minute': round(succeeded / elapsed * 60, 2) if elapsed > 0 else 0.0,
+            'job_seconds_p50': round(percentile(durations, 0.5), 2),
+            'job_seconds_p95': round(percentile(durations, 0.95), 2),
+            'rate_limits': self.generator.rate_limit_stats(),
+            'places': self.generator.places_stats(),
+            'tokens': self.generator.token_stats(),
+            'failures': failures
+        }
+        if self.generator.metrics.enabled:
+            report['metrics'] = self.generator.metrics.snapshot()
+        return report
+
+    def _run_job(self, job: Dict) -> float:
+        started_at = time.monotonic()
+        country_file, locations_file = self.generator.generate_locations(
+            job['location'], job['keyword'], job['radius'], job['count'],
+            bypass_cache=self.bypass_cache
+        )
+        duration = time.monotonic() - started_at
+        self._record_completed(job, country_file, locations_file, duration)
+        logger.info(f"Completed {job['location']} ({job['keyword']}) in {duration:.1f}s")
+        return duration
+
+    def _record_completed(self, job: Dict, country_file: str, locations_file: str, duration: float):
+        record = {
+            'key': job_key(job),
+            'country_file': country_file,
+            'locations_file': locations_file,
+            'seconds': round(duration, 2),
+            'completed_at': time.time()
+        }
+        with self._checkpoint_lock:
+            with open(self.checkpoint_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate location data for many destinations")
+    parser.add_argument('jobs', help="CSV or JSONL file with location, keyword, radius and count columns")
+    parser.add_argument('--concurrency', type=int, default=4, help="Jobs running at once")
+    parser.add_argument('--checkpoint', help="Checkpoint file (default: <jobs>.checkpoint.jsonl)")
+    parser.add_argument('--report', help="Write the summary report to this JSON file")
+    parser.add_argument('--perplexity-rpm', type=float, default=PERPLEXITY_RPM)
+    parser.add_argument('--anthropic-rpm', type=float, default=ANTHROPIC_RPM)
+    parser.add_argument('--places-rpm', type=float, default=PLACES_RPM)
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Ignore cached LLM responses (fresh responses are still cached)")
+    parser.add_argument('--metrics-jsonl', default=METRICS_JSONL,
+                        help="Append timing spans and request metrics to this JSONL file")
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT,
+                        help="Serve Prometheus metrics on this local port while running")
+    parser.add_argument('--log-level', default='INFO')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(args.log_level.upper())
+
+    jobs = load_jobs(args.jobs)
+    generator = LocationGenerator(rate_limits={
+        'perplexity': args.perplexity_rpm,
+        'anthropic': args.anthropic_rpm,
+        'places': args.places_rpm
+    }, metrics=Metrics(args.metrics_jsonl, args.metrics_port or None))
+    runner = BatchRunner(
+        generator,
+        args.checkpoint or f"{args.jobs}.checkpoint.jsonl",
+        concurrency=args.concurrency,
+        bypass_cache=args.no_cache
+    )
+    report = runner.run(jobs)
+    generator.metrics.close()
+
+    print(json.dumps(report, indent=2))
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    return 1 if report['failed'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
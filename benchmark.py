@@ -0,0 +1,285 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import subprocess
+from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from batch import percentile
+from fakes import FixtureStore, FaultModel, ReplaySession, RecordingSession, ReplayAnthropicClient
+from utils import LocationGenerator, create_http_session, ANTHROPIC_API_KEY
+
+logger = logging.getLogger(__name__)
+
+SCENARIOS = ('generate_locations', 'generate_ratings', 'process_locations')
+
+# Modules the viewer should not load before its window is shown
+DEFERRED_MODULES = ('utils', 'anthropic', 'PyQt6.QtWebEngineWidgets')
+
+# Seeded into the probe's data directory so the viewer opens a destination and builds the map
+STARTUP_FIXTURES = {
+    'country_startup_probe.json': 'country_profile_template.json',
+    'locations_startup_probe.json': 'locations_template.json'
+}
+
+# Runs in a fresh interpreter for every sample, so nothing is imported yet
+STARTUP_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import travel
+imported = time.perf_counter()
+app = travel.create_application(sys.argv[:1])
+viewer = travel.LocationViewer(data_dir={data_dir!r})
+viewer.show()
+shown = time.perf_counter()
+eager = [name for name in {deferred!r} if name in sys.modules]
+# The first pass of the event loop builds the map view
+app.processEvents()
+if viewer.web_view is None:
+    sys.exit("The map view was not built")
+print(json.dumps({{
+    'import_seconds': imported - started,
+    'window_seconds': shown - started,
+    'map_seconds': time.perf_counter() - started,
+    'eager_modules': eager
+}}))
+viewer.close()
+"""
+
+
+def build_generator(args, data_dir: str) -> LocationGenerator:
+    """A LocationGenerator wired to replayed (or recording) providers"""
+    fixtures = FixtureStore(args.fixtures) if args.fixtures else None
+    if args.record:
+        import anthropic
+        http_session = RecordingSession(fixtures, create_http_session())
+        anthropic_client = ReplayAnthropicClient(
+            fixtures, inner=anthropic.Client(api_key=ANTHROPIC_API_KEY, max_retries=0)
+        )
+    else:
+        def fault(latency_ms):
+            return FaultModel(latency_ms, latency_ms * args.jitter, args.error_rate, seed=args.seed)
+        http_session = ReplaySession(fixtures, {
+            'perplexity': fault(args.perplexity_latency_ms),
+            'places': fault(args.places_latency_ms),
+            'photos': fault(args.places_latency_ms)
+        })
+        anthropic_client = ReplayAnthropicClient(fixtures, fault(args.anthropic_latency_ms))
+
+    # Provider limits are off unless asked for, so the pipeline itself is measured
+    return LocationGenerator(
+        http_session=http_session,
+        anthropic_client=anthropic_client,
+        rate_limits={
+            'perplexity': args.perplexity_rpm,
+            'anthropic': args.anthropic_rpm,
+            'places': args.places_rpm
+        },
+        data_dir=data_dir
+    )
+
+
+def make_job(scenario: str, generator: LocationGenerator, index: int, results: int):
+    destination = f"Benchmark City {index}"
+    if scenario == 'generate_locations':
+        return lambda: generator.generate_locations(
+            destination, 'benchmarking', 30, results, bypass_cache=True
+        )
+    if scenario == 'generate_ratings':
+        return lambda: generator.generate_ratings(
+            destination, f"Synthetic summary of {destination}.", bypass_cache=True
+        )
+    locations = {"recommended_locations": [
+        {"name": f"{destination} Place {place}", "region": destination, "brief": ""}
+        for place in range(results)
+    ]}
+    return lambda: generator._process_locations_data(locations)
+
+
+def run_scenario(args, scenario: str, concurrency: int) -> Dict:
+    """Run args.jobs jobs of one scenario on a fresh generator and data directory"""
+    data_dir = tempfile.mkdtemp(prefix='travel-bench-')
+    try:
+        generator = build_generator(args, data_dir)
+        durations = []
+        errors = []
+
+        def timed(job):
+            started_at = time.perf_counter()
+            job()
+            return time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [
+                executor.submit(timed, make_job(scenario, generator, index, args.results))
+                for index in range(args.jobs)
+            ]
+            for future in futures:
+                try:
+                    durations.append(future.result())
+                except Exception as e:
+                    errors.append(str(e))
+        elapsed = time.perf_counter() - started_at
+
+        throttled = sum(stats['throttled'] for stats in generator.rate_limit_stats().values())
+        return {
+            'scenario': scenario,
+            'concurrency': concurrency,
+            'jobs': args.jobs,
+            'errors': len(errors),
+            'elapsed_seconds': round(elapsed, 3),
+            'jobs_per_second': round(len(durations) / elapsed, 3) if elapsed > 0 else 0.0,
+            'p50_seconds': round(percentile(durations, 0.5), 3),
+            'p95_seconds': round(percentile(durations, 0.95), 3),
+            'throttled': throttled,
+            'places': generator.places_stats(),
+            'tokens': generator.token_stats()
+        }
+    finally:
+        if not args.keep:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def run_startup(args) -> Dict:
+    """Time how long the viewer takes from a cold interpreter to a shown window"""
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    # config.py refuses to load without a key; the probe never calls the API
+    env.setdefault('GOOGLE_MAPS_API_KEY', 'benchmark')
+
+    samples = []
+    errors = []
+    data_dir = tempfile.mkdtemp(prefix='startup_benchmark_')
+    try:
+        # One destination, so the viewer loads it on startup and asks for the map
+        for filename, template in STARTUP_FIXTURES.items():
+            shutil.copyfile(os.path.join(app_dir, 'templates', template), os.path.join(data_dir, filename))
+        probe = STARTUP_PROBE.format(data_dir=data_dir, deferred=DEFERRED_MODULES)
+        for _ in range(args.startup_runs):
+            completed = subprocess.run(
+                [sys.executable, '-c', probe], cwd=app_dir, env=env,
+                capture_output=True, text=True, timeout=120
+            )
+            if completed.returncode != 0 or not completed.stdout.strip():
+                errors.append(completed.stderr.strip().splitlines()[-1:] or ['no output'])
+                continue
+            samples.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    if errors:
+        logger.warning(f"{len(errors)} startup samples failed, last: {errors[-1][0]}")
+
+    window = [sample['window_seconds'] for sample in samples]
+    eager = sorted({name for sample in samples for name in sample['eager_modules']})
+    return {
+        'scenario': 'startup',
+        'concurrency': 1,
+        'jobs': args.startup_runs,
+        'errors': len(errors),
+        'jobs_per_second': round(len(window) / sum(window), 3) if sum(window) > 0 else 0.0,
+        'p50_seconds': round(percentile(window, 0.5), 3),
+        'p95_seconds': round(percentile(window, 0.95), 3),
+        'import_p50_seconds': round(percentile([s['import_seconds'] for s in samples], 0.5), 3),
+        'map_p50_seconds': round(percentile([s['map_seconds'] for s in samples], 0.5), 3),
+        'eager_modules': eager
+    }
+
+
+def compare(results: List[Dict], baseline: List[Dict], tolerance: float) -> List[str]:
+    """Describe every run that is slower than the baseline by more than tolerance"""
+    previous = {(row['scenario'], row['concurrency']): row for row in baseline}
+    regressions = []
+    for row in results:
+        base = previous.get((row['scenario'], row['concurrency']))
+        if not base:
+            continue
+        label = f"{row['scenario']} x{row['concurrency']}"
+        if base['p95_seconds'] and row['p95_seconds'] > base['p95_seconds'] * (1 + tolerance):
+            regressions.append(f"{label}: p95 {base['p95_seconds']}s -> {row['p95_seconds']}s")
+        if row['jobs_per_second'] < base['jobs_per_second'] * (1 - tolerance):
+            regressions.append(
+                f"{label}: throughput {base['jobs_per_second']}/s -> {row['jobs_per_second']}/s"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark LocationGenerator against replayed providers, without network access"
+    )
+    parser.add_argument('--scenario', choices=SCENARIOS + ('all', 'startup'), default='all',
+                        help="'startup' times the viewer's cold start instead of the pipeline")
+    parser.add_argument('--startup-runs', type=int, default=5,
+                        help="Fresh interpreters to time with --scenario startup")
+    parser.add_argument('--concurrency', default='1,4,8',
+                        help="Comma-separated concurrency levels to run each scenario at")
+    parser.add_argument('--jobs', type=int, default=16, help="Jobs per scenario and concurrency level")
+    parser.add_argument('--results', type=int, default=10, help="Locations per job")
+    parser.add_argument('--fixtures', help="Directory of recorded responses (synthetic data otherwise)")
+    parser.add_argument('--record', action='store_true',
+                        help="Call the real providers and save their responses to --fixtures")
+    parser.add_argument('--perplexity-latency-ms', type=float, default=400)
+    parser.add_argument('--anthropic-latency-ms', type=float, default=600)
+    parser.add_argument('--places-latency-ms', type=float, default=60)
+    parser.add_argument('--jitter', type=float, default=0.2, help="Latency jitter as a fraction of the latency")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of calls answered with a 429")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--perplexity-rpm', type=float, default=0)
+    parser.add_argument('--anthropic-rpm', type=float, default=0)
+    parser.add_argument('--places-rpm', type=float, default=0)
+    parser.add_argument('--report', help="Write the results to this JSON file")
+    parser.add_argument('--baseline', help="Earlier --report to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Allowed slowdown against the baseline before failing")
+    parser.add_argument('--keep', action='store_true', help="Keep each run's data directory")
+    parser.add_argument('--log-level', default='WARNING')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(args.log_level.upper())
+    if args.record and not args.fixtures:
+        parser.error("--record needs --fixtures")
+
+    scenarios = SCENARIOS if args.scenario == 'all' else (args.scenario,)
+    levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+
+    results = []
+    if args.scenario == 'startup':
+        row = run_startup(args)
+        results.append(row)
+        print(f"{'import p50 s':>12} {'window p50 s':>12} {'window p95 s':>12} {'map p50 s':>10} {'errors':>6}")
+        print(f"{row['import_p50_seconds']:>12} {row['p50_seconds']:>12} "
+              f"{row['p95_seconds']:>12} {row['map_p50_seconds']:>10} {row['errors']:>6}")
+        if row['eager_modules']:
+            print(f"Loaded before the window was shown: {', '.join(row['eager_modules'])}")
+        scenarios = ()
+    else:
+        print(f"{'scenario':<20} {'conc':>4} {'jobs/s':>8} {'p50 s':>8} {'p95 s':>8} {'errors':>6}")
+    for scenario in scenarios:
+        for concurrency in levels:
+            row = run_scenario(args, scenario, concurrency)
+            results.append(row)
+            print(f"{scenario:<20} {concurrency:>4} {row['jobs_per_second']:>8} "
+                  f"{row['p50_seconds']:>8} {row['p95_seconds']:>8} {row['errors']:>6}")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 1 if any(row['errors'] or row.get('eager_modules') for row in results) else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
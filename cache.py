@@ -0,0 +1,372 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_key(*parts: str) -> str:
+    """Normalize free-text lookup parts into a stable cache key"""
+    return "|".join(" ".join(str(part or "").lower().split()) for part in parts)
+
+
+def search_area_key(search_area: Optional[Dict]) -> str:
+    """Cache key part for the area a lookup was biased toward, with the centre rounded to ~100 m"""
+    if not search_area:
+        return ""
+    return f"{search_area['lat']:.3f},{search_area['lng']:.3f},{int(search_area['radius_m'])}"
+
+
+class SQLiteCache:
+    """Thread-safe SQLite connection shared by the on-disk caches"""
+
+    schema = ""
+
+    def __init__(self, db_path: str, ttl_seconds: float, max_entries: int):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.executescript(self.schema)
+        self.purge_expired()
+        logger.debug(f"{type(self).__name__} opened at {db_path}")
+
+    def purge_expired(self):
+        raise NotImplementedError
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _evict_lru(self, table: str, key_column: str) -> int:
+        """Delete the least recently accessed rows beyond max_entries"""
+        count = self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return 0
+        self._conn.execute(
+            f"DELETE FROM {table} WHERE {key_column} IN ("
+            f"SELECT {key_column} FROM {table} ORDER BY accessed_at ASC LIMIT ?)",
+            (excess,)
+        )
+        logger.debug(f"Evicted {excess} entries from {table}")
+        return excess
+
+
+class PlaceCache(SQLiteCache):
+    """On-disk cache of Google Places lookups.
+
+    Details are stored once per place_id; (name, region, search area) queries
+    point at the place they resolved to, so different keywords that surface
+    the same landmark share a single entry. The search area is part of the
+    query because the same name can resolve to another place elsewhere. Entries expire after ``ttl_seconds`` and
+    the least recently used places are evicted beyond ``max_entries``.
+    """
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS place_details (
+            place_id TEXT PRIMARY KEY,
+            details TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_place_details_accessed
+            ON place_details(accessed_at);
+        CREATE TABLE IF NOT EXISTS place_queries (
+            query_key TEXT PRIMARY KEY,
+            place_id TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_place_queries_place_id
+            ON place_queries(place_id);
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float = 30 * 24 * 3600, max_entries: int = 5000):
+        super().__init__(db_path, ttl_seconds, max_entries)
+
+    def get(self, name: str, region: str, search_area: Optional[Dict] = None) -> Optional[Dict]:
+        """Return cached details for a (name, region, search area) query, if fresh"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT place_id FROM place_queries WHERE query_key = ?",
+                (normalize_key(name, region, search_area_key(search_area)),)
+            ).fetchone()
+            if not row:
+                return None
+            return self._get_details(row[0])
+
+    def get_by_place_id(self, place_id: str) -> Optional[Dict]:
+        """Return cached details for a place_id, if fresh"""
+        with self._lock:
+            return self._get_details(place_id)
+
+    def put(self, name: str, region: str, details: Dict, search_area: Optional[Dict] = None):
+        """Store details for a place and remember which query resolved to it"""
+        place_id = details.get('place_id')
+        if not place_id:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO place_details (place_id, details, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (place_id, json.dumps(details), now, now)
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO place_queries (query_key, place_id) VALUES (?, ?)",
+                (normalize_key(name, region, search_area_key(search_area)), place_id)
+            )
+            self._evict()
+
+    def purge_expired(self):
+        """Drop every entry older than the TTL"""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM place_details WHERE created_at < ?", (cutoff,))
+            self._delete_orphaned_queries()
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM place_details")
+            self._conn.execute("DELETE FROM place_queries")
+
+    def _get_details(self, place_id: str) -> Optional[Dict]:
+        row = self._conn.execute(
+            "SELECT details, created_at FROM place_details WHERE place_id = ?",
+            (place_id,)
+        ).fetchone()
+        if not row:
+            return None
+
+        details, created_at = row
+        now = time.time()
+        with self._conn:
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM place_details WHERE place_id = ?", (place_id,))
+                self._conn.execute("DELETE FROM place_queries WHERE place_id = ?", (place_id,))
+                return None
+            self._conn.execute(
+                "UPDATE place_details SET accessed_at = ? WHERE place_id = ?",
+                (now, place_id)
+            )
+        return json.loads(details)
+
+    def _evict(self):
+        if self._evict_lru('place_details', 'place_id'):
+            self._delete_orphaned_queries()
+
+    def _delete_orphaned_queries(self):
+        self._conn.execute(
+            "DELETE FROM place_queries WHERE place_id NOT IN (SELECT place_id FROM place_details)"
+        )
+
+
+class ResponseCache(SQLiteCache):
+    """On-disk cache of LLM responses keyed by a hash of the full request.
+
+    The key covers the provider, model, sampling settings and prompt, so any
+    change to them produces a fresh call while identical requests replay.
+    """
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS responses (
+            request_hash TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at);
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float = 7 * 24 * 3600, max_entries: int = 1000):
+        super().__init__(db_path, ttl_seconds, max_entries)
+
+    @staticmethod
+    def make_key(**request) -> str:
+        """Hash the request parameters into a cache key"""
+        encoded = json.dumps(request, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+    def get(self, request_hash: str) -> Optional[str]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE request_hash = ?",
+                (request_hash,)
+            ).fetchone()
+            if not row:
+                return None
+            response, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE request_hash = ?", (request_hash,))
+                return None
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE request_hash = ?",
+                (now, request_hash)
+            )
+            return response
+
+    def put(self, request_hash: str, response: str):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (request_hash, response, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (request_hash, response, now, now)
+            )
+            self._evict_lru('responses', 'request_hash')
+
+    def delete(self, request_hash: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses WHERE request_hash = ?", (request_hash,))
+
+    def purge_expired(self):
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (cutoff,))
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+
+
+class PhotoCache(SQLiteCache):
+    """On-disk cache of place photo thumbnails.
+
+    Image bytes are stored content-addressed under ``blob_dir``, named by
+    their sha256, so a photo shared by several references is kept once.
+    The index maps each photo reference to its blob; the least recently
+    viewed photos are evicted once the blobs exceed ``max_bytes``.
+    """
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS photos (
+            photo_key TEXT PRIMARY KEY,
+            content_hash TEXT NOT NULL,
+            mime_type TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_photos_accessed ON photos(accessed_at);
+        CREATE TABLE IF NOT EXISTS blobs (
+            content_hash TEXT PRIMARY KEY,
+            size INTEGER NOT NULL
+        );
+    """
+
+    def __init__(self, db_path: str, blob_dir: str, ttl_seconds: float = 30 * 24 * 3600,
+                 max_bytes: int = 100 * 1024 * 1024):
+        self.blob_dir = blob_dir
+        self.max_bytes = max_bytes
+        os.makedirs(blob_dir, exist_ok=True)
+        super().__init__(db_path, ttl_seconds, max_entries=0)
+
+    def get(self, photo_key: str) -> Optional[Tuple[bytes, str]]:
+        """Return (image bytes, mime type) for a cached photo, if fresh"""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT content_hash, mime_type, created_at FROM photos WHERE photo_key = ?",
+                (photo_key,)
+            ).fetchone()
+            if not row:
+                return None
+            content_hash, mime_type, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM photos WHERE photo_key = ?", (photo_key,))
+                self._delete_orphaned_blobs()
+                return None
+            try:
+                with open(self._blob_path(content_hash), 'rb') as f:
+                    data = f.read()
+            except OSError:
+                # The blob was removed behind our back; forget the entry
+                self._conn.execute("DELETE FROM photos WHERE photo_key = ?", (photo_key,))
+                self._delete_orphaned_blobs()
+                return None
+            self._conn.execute(
+                "UPDATE photos SET accessed_at = ? WHERE photo_key = ?",
+                (now, photo_key)
+            )
+            return data, mime_type
+
+    def put(self, photo_key: str, data: bytes, mime_type: str):
+        content_hash = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(content_hash)
+        if not os.path.exists(path):
+            # Write then rename so a reader never sees a partial image
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO blobs (content_hash, size) VALUES (?, ?)",
+                (content_hash, len(data))
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO photos (photo_key, content_hash, mime_type, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (photo_key, content_hash, mime_type, now, now)
+            )
+            self._delete_orphaned_blobs()
+            self._evict()
+
+    def purge_expired(self):
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM photos WHERE created_at < ?", (cutoff,))
+            self._delete_orphaned_blobs()
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM photos")
+            self._delete_orphaned_blobs()
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def _blob_path(self, content_hash: str) -> str:
+        return os.path.join(self.blob_dir, content_hash)
+
+    def _evict(self):
+        """Drop the least recently viewed photos until the blobs fit in max_bytes"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for (photo_key,) in self._conn.execute(
+            "SELECT photo_key FROM photos ORDER BY accessed_at ASC"
+        ).fetchall():
+            self._conn.execute("DELETE FROM photos WHERE photo_key = ?", (photo_key,))
+            evicted += 1
+            total -= self._delete_orphaned_blobs()
+            if total <= self.max_bytes:
+                break
+        logger.debug(f"Evicted {evicted} photos")
+
+    def _delete_orphaned_blobs(self) -> int:
+        """Remove blobs no photo refers to, returning the bytes freed"""
+        orphans = self._conn.execute(
+            "SELECT content_hash, size FROM blobs "
+            "WHERE content_hash NOT IN (SELECT content_hash FROM photos)"
+        ).fetchall()
+        freed = 0
+        for content_hash, size in orphans:
+            try:
+                os.remove(self._blob_path(content_hash))
+            except FileNotFoundError:
+                pass
+            self._conn.execute("DELETE FROM blobs WHERE content_hash = ?", (content_hash,))
+            freed += size
+        return freed
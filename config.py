@@ -1,28 +1,26 @@
 import os
+import logging
 from dotenv import load_dotenv
-import sys
+
+logger = logging.getLogger(__name__)
 
 # Get the directory containing the script
 script_dir = os.path.dirname(os.path.abspath(__file__))
-
-# Debug: Print current directory and .env path
-print(f"Current directory: {script_dir}")
-print(f"Looking for .env file at: {os.path.join(script_dir, '.env')}")
+env_path = os.path.join(script_dir, '.env')
 
 # Load environment variables from .env file
-load_dotenv(os.path.join(script_dir, '.env'))
+logger.debug(f"Loading environment from {env_path}")
+load_dotenv(env_path)
 
-# Get API key with error checking
+# Get API key with error checking; the key itself is never logged
 GOOGLE_MAPS_API_KEY = os.getenv('GOOGLE_MAPS_API_KEY')
 if not GOOGLE_MAPS_API_KEY:
-    print("Error: GOOGLE_MAPS_API_KEY not found in .env file")
-    sys.exit(1)
-
-print(f"Loaded API key: {GOOGLE_MAPS_API_KEY}")  # Debug print
+    logger.error(f"GOOGLE_MAPS_API_KEY not found in {env_path}")
+    raise SystemExit(1)
 
 # Map configuration
 DEFAULT_CENTER = {
     'lat': 7.8731,
     'lng': 80.7718
 }
-DEFAULT_ZOOM = 8 
\ No newline at end of file
+DEFAULT_ZOOM = 8 
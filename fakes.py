@@ -0,0 +1,418 @@
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+import requests
+from requests.structures import CaseInsensitiveDict
+from metrics import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+PROVIDER_HOSTS = {
+    'api.perplexity.ai': 'perplexity',
+    'places.googleapis.com': 'places',
+    'fake-photos.invalid': 'photos'
+}
+
+
+def provider_for_url(url: str) -> str:
+    return PROVIDER_HOSTS.get(urlsplit(url).hostname, 'other')
+
+
+def request_key(provider: str, method: str, url: str, body=None) -> str:
+    """Fixture key for a request: provider, method, URL path and the JSON body"""
+    parts = urlsplit(url)
+    encoded = json.dumps(
+        {'provider': provider, 'method': method.upper(), 'path': parts.path, 'body': body},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class FixtureStore:
+    """Recorded provider responses, one JSON file per request key"""
+
+    def __init__(self, fixture_dir: str):
+        self.fixture_dir = fixture_dir
+        self._lock = threading.Lock()
+        os.makedirs(fixture_dir, exist_ok=True)
+
+    def get(self, key: str) -> Optional[Dict]:
+        path = os.path.join(self.fixture_dir, f"{key}.json")
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, fixture: Dict):
+        path = os.path.join(self.fixture_dir, f"{key}.json")
+        with self._lock:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(fixture, f, indent=2, ensure_ascii=False)
+
+
+class FaultModel:
+    """Injected latency and throttling for one provider.
+
+    Every call waits ``latency_ms`` +/- ``jitter_ms``; with probability
+    ``error_rate`` it is answered with a 429 carrying ``retry_after``.
+    """
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0,
+                 retry_after: float = 0.05, seed: int = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self) -> float:
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    def should_fail(self) -> bool:
+        if not self.error_rate:
+            return False
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+
+class _ChunkedRaw:
+    """File-like body that hands out one chunk per read, pausing between chunks"""
+
+    def __init__(self, chunks: List[bytes], chunk_delay: float):
+        self._chunks = list(chunks)
+        self._chunk_delay = chunk_delay
+
+    def read(self, amount=None, **kwargs) -> bytes:
+        if not self._chunks:
+            return b''
+        if self._chunk_delay:
+            time.sleep(self._chunk_delay)
+        return self._chunks.pop(0)
+
+    def close(self):
+        self._chunks = []
+
+
+def make_response(url: str, status: int = 200, body: bytes = b'', headers: Dict = None,
+                  chunks: List[bytes] = None, chunk_delay: float = 0) -> requests.Response:
+    """Build a requests.Response the generator can't tell from a real one"""
+    response = requests.Response()
+    response.status_code = status
+    response.url = url
+    response.headers = CaseInsensitiveDict(headers or {})
+    response.encoding = 'utf-8'
+    response.raw = _ChunkedRaw(chunks if chunks is not None else [body], chunk_delay)
+    if chunks is None:
+        response.headers.setdefault('Content-Length', str(len(body)))
+    return response
+
+
+def sse_chunks(text: str, chunk_chars: int = 24) -> List[bytes]:
+    """Split text into Perplexity-style server-sent delta events"""
+    events = []
+    for start in range(0, len(text), chunk_chars):
+        delta = {"choices": [{"delta": {"content": text[start:start + chunk_chars]}}]}
+        events.append(f"data: {json.dumps(delta)}\n\n".encode('utf-8'))
+    events.append(b"data: [DONE]\n\n")
+    return events
+
+
+class SyntheticResponder:
+    """Plausible provider answers generated from the request alone.
+
+    Used when no recorded fixture matches, so a benchmark runs on a clean
+    checkout. Place ids and coordinates are derived from the query text, so
+    repeated runs see the same data.
+    """
+
+    def __init__(self):
+        with open(os.path.join(TEMPLATE_DIR, 'score_template.json'), encoding='utf-8') as f:
+            self.score_template = json.load(f)
+
+    def perplexity(self, prompt: str) -> str:
+        if 'recommended_locations' in prompt:
+            match = re.search(r'List (\d+) verified.*?within (\d+)km of (.+?) that are great', prompt, re.S)
+            count, main_location = (int(match.group(1)), match.group(3)) if match else (10, 'Somewhere')
+            data = {"recommended_locations": [
+                {
+                    "name": f"{main_location} Spot {index + 1}",
+                    "region": main_location,
+                    "coords": {"lat": 0.0, "lng": 0.0},
+                    "brief": f"Synthetic location {index + 1} near {main_location}."
+                }
+                for index in range(count)
+            ]}
+        else:
+            match = re.search(r'country profile for (.+?) focusing on', prompt)
+            name = match.group(1) if match else 'Somewhere'
+            scores = {key: 3 for key in (
+                'freedom', 'environment', 'culture', 'healthcare', 'education', 'living_costs',
+                'safety', 'taxation', 'internet_access', 'tolerance', 'outdoors'
+            )}
+            data = {
+                "location": {"name": name, "region": "Synthetic Region", "country": "Synthetic Country"},
+                "scores": scores,
+                "summary": {
+                    "total_score": sum(scores.values()),
+                    "strengths": ["Strength one", "Strength two", "Strength three", "Strength four"],
+                    "weaknesses": ["Weakness one", "Weakness two"],
+                    "overall_notes": f"Synthetic profile of {name}."
+                }
+            }
+        return f"Here is the data:\n```json\n{json.dumps(data, indent=2)}\n```"
+
+    def claude(self, prompt: str) -> str:
+        # Answer only the sections the prompt asks for, as the model would
+        rating = {key: value for key, value in self.score_template.items() if f'"{key}"' in prompt}
+        return f"```json\n{json.dumps(rating or self.score_template, indent=2)}\n```"
+
+    def places_search(self, body: Dict) -> Dict:
+        query = body.get('textQuery', '')
+        count = max(1, int(body.get('maxResultCount', 1)))
+        bias = body.get('locationBias', {}).get('circle', {}).get('center')
+        return {"places": [self._place(query, index, bias) for index in range(count)]}
+
+    def places_details(self, place_id: str) -> Dict:
+        return self._place(place_id, 0, None, place_id=place_id)
+
+    def photo_media(self, path: str) -> Dict:
+        return {"photoUri": f"https://fake-photos.invalid{path}"}
+
+    def photo_bytes(self, path: str) -> bytes:
+        # Small, deterministic stand-in for a JPEG thumbnail
+        return hashlib.sha256(path.encode('utf-8')).digest() * 256
+
+    @staticmethod
+    def _place(query: str, index: int, bias: Optional[Dict], place_id: str = None) -> Dict:
+        digest = hashlib.sha256(f"{query}|{index}".encode('utf-8')).digest()
+        lat0 = bias['latitude'] if bias else (digest[0] / 255 * 120 - 60)
+        lng0 = bias['longitude'] if bias else (digest[1] / 255 * 340 - 170)
+        place_id = place_id or f"fake-{digest[:8].hex()}"
+        name = query.split(',')[0] if index == 0 else f"{query.split(',')[0]} Annex {index}"
+        return {
+            "id": place_id,
+            "displayName": {"text": name, "languageCode": "en"},
+            "formattedAddress": f"{index + 1} Synthetic Street, {query}",
+            "location": {
+                "latitude": lat0 + (digest[2] - 128) / 2560,
+                "longitude": lng0 + (digest[3] - 128) / 2560
+            },
+            "types": ["point_of_interest"],
+            "photos": [{"name": f"places/{place_id}/photos/p0"}],
+            "rating": round(3 + digest[4] / 128, 1),
+            "userRatingCount": digest[5] * 10,
+            "businessStatus": "OPERATIONAL"
+        }
+
+
+class ReplaySession(requests.Session):
+    """Stand-in for the shared HTTP session that never touches the network.
+
+    Requests are answered from recorded fixtures when one matches, otherwise
+    from the SyntheticResponder. Each provider gets its own FaultModel.
+    """
+
+    def __init__(self, fixtures: FixtureStore = None, faults: Dict[str, FaultModel] = None,
+                 stream_chunk_chars: int = 24):
+        super().__init__()
+        self.fixtures = fixtures
+        self.faults = faults or {}
+        self.stream_chunk_chars = stream_chunk_chars
+        self.synthetic = SyntheticResponder()
+
+    def request(self, method, url, params=None, json=None, stream=False, **kwargs):
+        provider = provider_for_url(url)
+        faults = self.faults.get(provider) or FaultModel()
+        delay = faults.delay()
+        if faults.should_fail():
+            time.sleep(delay)
+            return make_response(url, 429, b'{"error": "rate limited"}',
+                                 {'Retry-After': str(faults.retry_after)})
+
+        fixture = self.fixtures.get(request_key(provider, method, url, json)) if self.fixtures else None
+        status, headers, body = fixture_response(fixture) if fixture else self._synthesize(
+            provider, method, url, json
+        )
+
+        if stream and provider == 'perplexity' and status == 200:
+            # Spend half the latency before the headers and spread the rest over the stream
+            time.sleep(delay / 2)
+            chunks = sse_chunks(body_text(body), self.stream_chunk_chars)
+            return make_response(url, status, headers={'Content-Type': 'text/event-stream'},
+                                 chunks=chunks, chunk_delay=delay / 2 / len(chunks))
+        time.sleep(delay)
+        return make_response(url, status, body, headers)
+
+    def _synthesize(self, provider: str, method: str, url: str, body: Optional[Dict]):
+        path = urlsplit(url).path
+        if provider == 'perplexity':
+            prompt = body['messages'][-1]['content']
+            text = self.synthetic.perplexity(prompt)
+            payload = {
+                "choices": [{"message": {"role": "assistant", "content": text}}],
+                "usage": {"prompt_tokens": estimate_tokens(prompt), "completion_tokens": estimate_tokens(text)}
+            }
+        elif provider == 'places' and path.endswith('/media'):
+            payload = self.synthetic.photo_media(path)
+        elif provider == 'places' and path.endswith(':searchText'):
+            payload = self.synthetic.places_search(body or {})
+        elif provider == 'places':
+            payload = self.synthetic.places_details(path.rsplit('/', 1)[-1])
+        elif provider == 'photos':
+            return 200, {'Content-Type': 'image/jpeg'}, self.synthetic.photo_bytes(path)
+        else:
+            return 404, {}, b''
+        return 200, {'Content-Type': 'application/json'}, json_bytes(payload)
+
+
+class RecordingSession(requests.Session):
+    """Passes requests to a real session and saves each response as a fixture"""
+
+    def __init__(self, fixtures: FixtureStore, inner: requests.Session):
+        super().__init__()
+        self.fixtures = fixtures
+        self.inner = inner
+        # Cancellation in LocationGenerator walks the session's adapters
+        self.adapters = inner.adapters
+
+    def request(self, method, url, params=None, json=None, stream=False, **kwargs):
+        response = self.inner.request(method, url, params=params, json=json, stream=stream, **kwargs)
+        provider = provider_for_url(url)
+        content = response.content
+        if response.status_code == 200 and provider in ('perplexity', 'places'):
+            if stream and provider == 'perplexity':
+                # Store the assembled answer; replay re-streams it
+                content = json_bytes({"choices": [{"message": {"content": sse_text(content)}}]})
+            self.fixtures.put(request_key(provider, method, url, json), {
+                'provider': provider,
+                'method': method.upper(),
+                'url': urlsplit(url).path,
+                'status': response.status_code,
+                'headers': {'Content-Type': response.headers.get('Content-Type', '')},
+                'body': content.decode('utf-8')
+            })
+        # The body has been read, so iter_lines replays it from memory
+        return response
+
+
+def fixture_response(fixture: Dict):
+    return fixture['status'], fixture.get('headers', {}), fixture['body'].encode('utf-8')
+
+
+def json_bytes(payload: Dict) -> bytes:
+    return json.dumps(payload).encode('utf-8')
+
+
+def body_text(body: bytes) -> str:
+    """Assistant text of a non-streamed chat completion body"""
+    return json.loads(body)['choices'][0]['message']['content']
+
+
+def sse_text(body: bytes) -> str:
+    """Join the deltas of a recorded server-sent event stream"""
+    text = []
+    for line in body.decode('utf-8').splitlines():
+        if line.startswith('data:') and line[5:].strip() != '[DONE]':
+            choices = json.loads(line[5:]).get('choices') or []
+            if choices:
+                text.append(choices[0].get('delta', {}).get('content') or '')
+    return ''.join(text)
+
+
+class _FakeStream:
+    """Iterates Anthropic-style text delta events, pausing between them"""
+
+    def __init__(self, text: str, chunk_chars: int, total_delay: float, usage: SimpleNamespace = None):
+        self.response = SimpleNamespace(close=self.close)
+        self.usage = usage
+        self._chunks = [text[start:start + chunk_chars] for start in range(0, len(text), chunk_chars)]
+        self._chunk_delay = total_delay / max(1, len(self._chunks))
+        self._closed = False
+
+    def __iter__(self):
+        if self.usage:
+            yield SimpleNamespace(
+                type='message_start',
+                message=SimpleNamespace(usage=SimpleNamespace(input_tokens=self.usage.input_tokens))
+            )
+        for chunk in self._chunks:
+            if self._closed:
+                return
+            if self._chunk_delay:
+                time.sleep(self._chunk_delay)
+            yield SimpleNamespace(
+                type='content_block_delta',
+                delta=SimpleNamespace(type='text_delta', text=chunk)
+            )
+        if self.usage:
+            yield SimpleNamespace(
+                type='message_delta',
+                usage=SimpleNamespace(output_tokens=self.usage.output_tokens)
+            )
+
+    def close(self):
+        self._closed = True
+
+
+class ReplayAnthropicClient:
+    """Stand-in for anthropic.Client covering messages.create, streamed or not.
+
+    With ``inner`` set it records: the real client is called and its text is
+    saved as a fixture before being replayed to the caller.
+    """
+
+    def __init__(self, fixtures: FixtureStore = None, fault: FaultModel = None,
+                 stream_chunk_chars: int = 24, inner=None):
+        self.fixtures = fixtures
+        self.fault = fault or FaultModel()
+        self.stream_chunk_chars = stream_chunk_chars
+        self.inner = inner
+        self.synthetic = SyntheticResponder()
+        self.messages = SimpleNamespace(create=self.create)
+
+    def create(self, stream: bool = False, **request):
+        key = request_key('anthropic', 'POST', '/v1/messages', request)
+        if self.inner is not None:
+            text = self.inner.messages.create(**request).content[0].text
+            self.fixtures.put(key, {'provider': 'anthropic', 'request': request, 'text': text})
+            delay = 0.0
+        else:
+            delay = self.fault.delay()
+            if self.fault.should_fail():
+                time.sleep(delay)
+                raise self._rate_limit_error()
+            fixture = self.fixtures.get(key) if self.fixtures else None
+            text = fixture['text'] if fixture else self.synthetic.claude(request['messages'][-1]['content'])
+
+        usage = SimpleNamespace(
+            input_tokens=estimate_tokens(request['messages'][-1]['content']),
+            output_tokens=estimate_tokens(text)
+        )
+        if stream:
+            time.sleep(delay / 2)
+            return _FakeStream(text, self.stream_chunk_chars, delay / 2, usage)
+        time.sleep(delay)
+        return SimpleNamespace(content=[SimpleNamespace(type='text', text=text)], usage=usage)
+
+    def _rate_limit_error(self):
+        import anthropic
+        import httpx
+        request = httpx.Request('POST', 'https://api.anthropic.com/v1/messages')
+        response = httpx.Response(
+            429, headers={'retry-after': str(self.fault.retry_after)}, request=request
+        )
+        return anthropic.RateLimitError("Injected rate limit", response=response, body=None)
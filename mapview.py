@@ -0,0 +1,125 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, unquote
+from PyQt6.QtCore import pyqtSignal, QBuffer, QIODevice
+from PyQt6.QtWidgets import QSizePolicy
+from PyQt6.QtWebEngineWidgets import QWebEngineView
+from PyQt6.QtWebEngineCore import (QWebEngineSettings, QWebEnginePage, QWebEngineUrlScheme,
+                                   QWebEngineUrlSchemeHandler, QWebEngineUrlRequestJob)
+from utils import parse_photo_name
+
+logger = logging.getLogger(__name__)
+
+# Custom URL scheme the map page loads place photos from
+PHOTO_SCHEME = b'travelphoto'
+
+_photo_scheme_registered = False
+
+def register_photo_scheme():
+    """Declare the photo scheme; must run before the first WebEngine profile is created"""
+    global _photo_scheme_registered
+    if _photo_scheme_registered:
+        return
+    scheme = QWebEngineUrlScheme(PHOTO_SCHEME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Path)
+    # Secure so the https map page can load it without mixed-content blocking
+    scheme.setFlags(QWebEngineUrlScheme.Flag.SecureScheme | QWebEngineUrlScheme.Flag.CorsEnabled)
+    QWebEngineUrlScheme.registerScheme(scheme)
+    _photo_scheme_registered = True
+
+def photo_url(location):
+    """Keyless URL for a location's photo, also covering records saved with a media URL"""
+    photo_name = location.get('photo_name') or parse_photo_name(location.get('photo_url'))
+    if not photo_name:
+        return None
+    return f"{PHOTO_SCHEME.decode()}:{quote(photo_name, safe='/')}"
+
+class PhotoSchemeHandler(QWebEngineUrlSchemeHandler):
+    """Serves place photos to the map page.
+    
+    Each request is resolved on a small thread pool through fetch_photo, which
+    reads the local photo cache before going to the network, and is answered
+    back on the GUI thread. Requests the page abandons in the meantime are dropped.
+    """
+    photoReady = pyqtSignal(int, object)
+    
+    def __init__(self, fetch_photo, parent=None):
+        super().__init__(parent)
+        self.fetch_photo = fetch_photo
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        self.pending_jobs = {}
+        self.next_request_id = 0
+        self.photoReady.connect(self.on_photo_ready)
+    
+    def requestStarted(self, job):
+        request_id = self.next_request_id
+        self.next_request_id += 1
+        self.pending_jobs[request_id] = job
+        job.destroyed.connect(lambda *args: self.pending_jobs.pop(request_id, None))
+        photo_name = unquote(job.requestUrl().path())
+        self.executor.submit(self.fetch, request_id, photo_name)
+    
+    def fetch(self, request_id, photo_name):
+        try:
+            result = self.fetch_photo(photo_name)
+        except Exception as e:
+            logger.error(f"Error loading photo {photo_name}: {e}")
+            result = None
+        self.photoReady.emit(request_id, result)
+    
+    def on_photo_ready(self, request_id, result):
+        job = self.pending_jobs.pop(request_id, None)
+        if job is None:
+            return
+        if not result:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+            return
+        data, mime_type = result
+        buffer = QBuffer(job)
+        buffer.setData(data)
+        buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+        job.reply(mime_type.encode(), buffer)
+    
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+class CustomWebEnginePage(QWebEnginePage):
+    def javaScriptConsoleMessage(self, level, message, lineNumber, sourceID):
+        level_str = {
+            QWebEnginePage.JavaScriptConsoleMessageLevel.InfoMessageLevel: "INFO",
+            QWebEnginePage.JavaScriptConsoleMessageLevel.WarningMessageLevel: "WARNING",
+            QWebEnginePage.JavaScriptConsoleMessageLevel.ErrorMessageLevel: "ERROR"
+        }.get(level, "DEBUG")
+        
+        logger.log(
+            logging.INFO if level_str == "INFO" else 
+            logging.WARNING if level_str == "WARNING" else 
+            logging.ERROR if level_str == "ERROR" else 
+            logging.DEBUG,
+            f"JavaScript {level_str}: {message} (line: {lineNumber}, source: {sourceID})"
+        )
+
+def create_map_view(fetch_photo, parent=None):
+    """Build the map's web view with the photo scheme handler installed.
+    
+    Returns (web_view, photo_handler). Importing this module loads Qt WebEngine,
+    so the viewer only does it once its window is on screen.
+    """
+    register_photo_scheme()
+    web_view = QWebEngineView(parent)
+    web_view.setPage(CustomWebEnginePage(web_view))
+    photo_handler = PhotoSchemeHandler(fetch_photo, parent)
+    web_view.page().profile().installUrlSchemeHandler(PHOTO_SCHEME, photo_handler)
+    web_view.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+    
+    # Initialize WebEngine settings
+    try:
+        settings = web_view.page().settings()
+        settings.setAttribute(QWebEngineSettings.WebAttribute.LocalContentCanAccessRemoteUrls, True)
+        settings.setAttribute(QWebEngineSettings.WebAttribute.LocalContentCanAccessFileUrls, True)
+        settings.setAttribute(QWebEngineSettings.WebAttribute.ScrollAnimatorEnabled, True)
+        settings.setAttribute(QWebEngineSettings.WebAttribute.ShowScrollBars, True)
+        logger.info("WebEngine settings initialized successfully")
+    except Exception as e:
+        logger.error(f"Failed to initialize WebEngine settings: {e}")
+    return web_view, photo_handler
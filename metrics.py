@@ -0,0 +1,225 @@
+import json
+import time
+import logging
+import threading
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SECONDS_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+TOKEN_BUCKETS = (64, 256, 1024, 2048, 4096, 8192, 16384)
+
+PROMETHEUS_PREFIX = 'travel_'
+
+# Returned by span() while metrics are disabled
+_NULL_SPAN = nullcontext()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters each) for calls that report no usage"""
+    return (len(text) + 3) // 4 if text else 0
+
+
+def _label_key(labels: Dict) -> Tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(label_key: Tuple, extra: Tuple = ()) -> str:
+    pairs = label_key + extra
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in pairs) + '}'
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _Span:
+    """Times a block and records it as a span when it exits"""
+    __slots__ = ('metrics', 'name', 'labels', 'started', 'wall_started', 'parent')
+
+    def __init__(self, metrics: 'Metrics', name: str, labels: Dict):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        stack = self.metrics._span_stack()
+        self.parent = stack[-1] if stack else None
+        stack.append(self.name)
+        self.wall_started = time.time()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.started
+        self.metrics._span_stack().pop()
+        self.metrics._record_span(self, seconds, exc_type)
+        return False
+
+
+class Metrics:
+    """Spans, counters and histograms for the generation pipeline.
+
+    Nothing is recorded unless a JSONL path or a Prometheus port is given;
+    while disabled every call returns immediately. Spans and observations
+    are appended to the JSONL file as they happen, and the running totals
+    are served at http://127.0.0.1:<port>/metrics in Prometheus text format.
+    """
+
+    def __init__(self, jsonl_path: Optional[str] = None, prometheus_port: Optional[int] = None):
+        self.enabled = bool(jsonl_path or prometheus_port)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        # (name, labels) -> [bucket bounds, per-bucket counts, sum, count]
+        self._histograms: Dict[Tuple[str, Tuple], list] = {}
+        self._jsonl = open(jsonl_path, 'a', encoding='utf-8') if jsonl_path else None
+        self._server = None
+        if prometheus_port:
+            self._start_server(prometheus_port)
+
+    def span(self, name: str, **labels):
+        """Context manager timing a pipeline stage"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, labels)
+
+    def increment(self, name: str, amount: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+        self._write({'type': 'counter', 'name': name, 'labels': labels, 'value': amount})
+
+    def observe(self, name: str, value: float, buckets: Tuple = SECONDS_BUCKETS, **labels):
+        if not self.enabled:
+            return
+        self._observe(name, value, buckets, labels)
+        self._write({'type': 'observation', 'name': name, 'labels': labels, 'value': value})
+
+    def snapshot(self) -> Dict:
+        """Current counters and histogram totals, keyed by name and labels"""
+        with self._lock:
+            counters = {
+                name + _format_labels(labels): value
+                for (name, labels), value in self._counters.items()
+            }
+            histograms = {
+                name + _format_labels(labels): {'count': count, 'sum': round(total, 6)}
+                for (name, labels), (_, _, total, count) in self._histograms.items()
+            }
+        return {'counters': counters, 'histograms': histograms}
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, (bounds, list(counts), total, count))
+                for key, (bounds, counts, total, count) in self._histograms.items()
+            )
+        typed = set()
+        for (name, labels), value in counters:
+            metric = f"{PROMETHEUS_PREFIX}{name}_total"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+        for (name, labels), (bounds, counts, total, count) in histograms:
+            metric = f"{PROMETHEUS_PREFIX}{name}"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} histogram")
+                typed.add(metric)
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                lines.append(f"{metric}_bucket{_format_labels(labels, (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{metric}_bucket{_format_labels(labels, (('le', '+Inf'),))} {count}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        with self._lock:
+            if self._jsonl:
+                self._jsonl.close()
+                self._jsonl = None
+
+    def _span_stack(self) -> list:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record_span(self, span: _Span, seconds: float, exc_type):
+        status = 'ok' if exc_type is None else exc_type.__name__
+        self._observe('span_seconds', seconds, SECONDS_BUCKETS, {'span': span.name, **span.labels})
+        self._write({
+            'type': 'span',
+            'name': span.name,
+            'labels': span.labels,
+            'parent': span.parent,
+            'start': span.wall_started,
+            'seconds': seconds,
+            'status': status
+        })
+
+    def _observe(self, name: str, value: float, buckets: Tuple, labels: Dict):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [buckets, [0] * len(buckets), 0.0, 0]
+            for index, bound in enumerate(histogram[0]):
+                if value <= bound:
+                    histogram[1][index] += 1
+                    break
+            histogram[2] += value
+            histogram[3] += 1
+
+    def _write(self, event: Dict):
+        if not self._jsonl:
+            return
+        event.setdefault('time', time.time())
+        line = json.dumps(event, default=str) + "\n"
+        with self._lock:
+            if self._jsonl:
+                self._jsonl.write(line)
+                self._jsonl.flush()
+
+    def _start_server(self, port: int):
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') not in ('', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(f"Metrics endpoint: {format % args}")
+
+        try:
+            self._server = ThreadingHTTPServer(('127.0.0.1', port), MetricsHandler)
+        except OSError as e:
+            logger.error(f"Could not start metrics endpoint on port {port}: {e}")
+            return
+        thread = threading.Thread(target=self._server.serve_forever, name='metrics-endpoint', daemon=True)
+        thread.start()
+        logger.info(f"Serving metrics at http://127.0.0.1:{port}/metrics")
@@ -0,0 +1,270 @@
+import re
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from streaming import StreamingJSONExtractor
+
+logger = logging.getLogger(__name__)
+
+# Scores in templates/ are integers on this scale unless the caller says otherwise
+SCORE_RANGE = (1, 10)
+# Members holding a score, and objects whose numeric members are all scores
+SCORE_KEYS = ('score', 'overall_score')
+SCORE_GROUPS = ('category_scores', 'scores')
+
+# A location in the path to a value: object keys and list positions
+Path = Tuple
+
+
+def is_score(key: Optional[str], parent_key: Optional[str]) -> bool:
+    return key in SCORE_KEYS or parent_key in SCORE_GROUPS
+
+
+def compact_schema(template: Any, skip: Iterable[str] = (), score_range: Tuple = SCORE_RANGE,
+                   key: Optional[str] = None, parent_key: Optional[str] = None) -> str:
+    """Render the shape of a template without its example content.
+
+    Keys are kept verbatim and every leaf becomes a type marker: str, int,
+    number, bool, or the score range (e.g. 1-10). A list shows one element
+    standing for any number of them. Members named in skip are left out;
+    key and parent_key place a section of a template for score detection.
+    """
+    return _render(template, key, parent_key, set(skip), score_range)
+
+
+def _render(value: Any, key: Optional[str], parent_key: Optional[str], skip: set, score_range: Tuple) -> str:
+    if isinstance(value, dict):
+        members = ','.join(
+            f"{json.dumps(member)}:{_render(item, member, key, skip, score_range)}"
+            for member, item in value.items() if member not in skip
+        )
+        return '{' + members + '}'
+    if isinstance(value, list):
+        return '[' + (_render(value[0], key, parent_key, skip, score_range) if value else '') + ']'
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, (int, float)):
+        if is_score(key, parent_key):
+            return f"{score_range[0]}-{score_range[1]}"
+        return 'int' if isinstance(value, int) else 'number'
+    if value is None:
+        return 'null'
+    return 'str'
+
+
+def extract_json(text: str) -> Optional[Any]:
+    """Parse the JSON in an LLM answer, tolerating a missing fence and trailing commas"""
+    body = json_body(text)
+    if body is None:
+        return None
+    for candidate in (body, strip_trailing_commas(body)):
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def json_body(text: str) -> Optional[str]:
+    """The JSON part of an answer: the fenced block, else the outermost braces"""
+    match = re.search(r'```(?:json)?\s*(.*?)(?:```|$)', text, re.DOTALL)
+    if match and match.group(1).lstrip()[:1] in ('{', '['):
+        return match.group(1).strip()
+    start = text.find('{')
+    end = text.rfind('}')
+    if start < 0:
+        return None
+    # An answer cut off mid-object has no closing brace; keep everything after the opening one
+    return text[start:end + 1] if end > start else text[start:]
+
+
+def strip_trailing_commas(body: str) -> str:
+    """Drop commas directly before a closing bracket, leaving string contents alone"""
+    out = []
+    in_string = escape = False
+    pending_comma = None
+    for char in body:
+        if in_string:
+            out.append(char)
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+        if pending_comma is not None:
+            if char.isspace():
+                pending_comma.append(char)
+                continue
+            if char not in '}]':
+                out.append(',')
+            out.extend(pending_comma[1:])
+            pending_comma = None
+        if char == ',':
+            pending_comma = [',']
+            continue
+        if char == '"':
+            in_string = True
+        out.append(char)
+    if pending_comma is not None:
+        out.extend(pending_comma)
+    return ''.join(out)
+
+
+def salvage(text: str, template: Dict) -> Dict:
+    """Recover whichever top-level sections of a malformed answer still parse.
+
+    A section that is itself broken, e.g. cut off by the token limit, keeps
+    the members or items that were complete.
+    """
+    body = json_body(text)
+    if body is None:
+        return {}
+    body = strip_trailing_commas(body)
+    decoder = json.JSONDecoder()
+    data = {}
+    for member, member_template in template.items():
+        match = re.search(r'"%s"\s*:\s*' % re.escape(member), body)
+        if not match:
+            continue
+        try:
+            data[member], _ = decoder.raw_decode(body, match.end())
+            continue
+        except json.JSONDecodeError:
+            pass
+        if isinstance(member_template, dict):
+            partial = {}
+            StreamingJSONExtractor(member, partial.__setitem__, fence='').feed(body)
+        elif isinstance(member_template, list):
+            items = {}
+            StreamingJSONExtractor(member, items.__setitem__, fence='').feed(body)
+            partial = [items[index] for index in sorted(items)]
+        else:
+            continue
+        if partial:
+            data[member] = partial
+    return data
+
+
+def validate(value: Any, template: Any, score_range: Tuple = SCORE_RANGE,
+             key: Optional[str] = None, parent_key: Optional[str] = None) -> List[Tuple[Path, str]]:
+    """List what in value does not match the template, as (path, problem) pairs.
+
+    Every member the template gives a value is required with that value's
+    type; null members are optional. Scores must lie within score_range.
+    """
+    issues = []
+    _validate(value, template, (), key, parent_key, score_range, issues)
+    return issues
+
+
+def _validate(value, template, path, key, parent_key, score_range, issues):
+    if isinstance(template, dict):
+        if not isinstance(value, dict):
+            issues.append((path, "expected an object"))
+            return
+        for member, member_template in template.items():
+            if member_template is None:
+                continue
+            if value.get(member) is None:
+                issues.append((path + (member,), "missing"))
+            else:
+                _validate(value[member], member_template, path + (member,), member, key, score_range, issues)
+    elif isinstance(template, list):
+        if not isinstance(value, list):
+            issues.append((path, "expected a list"))
+        elif template:
+            for index, item in enumerate(value):
+                _validate(item, template[0], path + (index,), key, parent_key, score_range, issues)
+    elif isinstance(template, bool):
+        if not isinstance(value, bool):
+            issues.append((path, "expected true or false"))
+    elif isinstance(template, (int, float)):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            issues.append((path, "expected a number"))
+        elif is_score(key, parent_key) and not score_range[0] <= value <= score_range[1]:
+            issues.append((path, f"score outside {score_range[0]}-{score_range[1]}"))
+    elif isinstance(template, str) and not isinstance(value, str):
+        issues.append((path, "expected text"))
+
+
+def repair(value: Any, template: Any, score_range: Tuple = SCORE_RANGE,
+           key: Optional[str] = None, parent_key: Optional[str] = None) -> Tuple[Any, int]:
+    """Fix what can be fixed without asking the model again.
+
+    Numbers sent as text are converted, scores are rounded and clamped into
+    score_range, and list items that still don't match the template are
+    dropped. Returns the repaired value and the number of fixes made.
+    """
+    if isinstance(template, dict) and isinstance(value, dict):
+        fixes = 0
+        for member, member_template in template.items():
+            if member_template is not None and value.get(member) is not None:
+                value[member], member_fixes = repair(value[member], member_template, score_range, member, key)
+                fixes += member_fixes
+        return value, fixes
+    if isinstance(template, list) and isinstance(value, list):
+        if not template:
+            return value, 0
+        kept = []
+        fixes = 0
+        for item in value:
+            item, item_fixes = repair(item, template[0], score_range, key, parent_key)
+            fixes += item_fixes
+            if validate(item, template[0], score_range, key, parent_key):
+                fixes += 1
+            else:
+                kept.append(item)
+        return kept, fixes
+    if isinstance(template, (int, float)) and not isinstance(template, bool):
+        return _repair_number(value, key, parent_key, score_range)
+    return value, 0
+
+
+def _repair_number(value, key, parent_key, score_range) -> Tuple[Any, int]:
+    original = value
+    if isinstance(value, str):
+        try:
+            # Also accepts scores written as "7/10"
+            value = float(value.strip().split('/')[0])
+        except ValueError:
+            return original, 0
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return original, 0
+    if is_score(key, parent_key):
+        low, high = score_range
+        value = min(max(int(round(value)), low), high)
+    changed = type(value) is not type(original) or value != original
+    return value, 1 if changed else 0
+
+
+def broken_sections(value: Dict, template: Dict, score_range: Tuple = SCORE_RANGE) -> List[Path]:
+    """The smallest sections worth asking for again to fix what validate finds.
+
+    That is a top-level member, or one entry of a top-level object whose
+    members are all objects (such as one category under "scores").
+    """
+    sections = []
+    for path, _ in validate(value, template, score_range):
+        section = path[:1]
+        group = template.get(path[0]) if path else None
+        if len(path) > 1 and isinstance(group, dict) and all(isinstance(entry, dict) for entry in group.values()):
+            section = path[:2]
+        if section and section not in sections:
+            sections.append(section)
+    return sections
+
+
+def section_template(template: Dict, section: Path) -> Any:
+    for member in section:
+        template = template[member]
+    return template
+
+
+def replace_section(value: Dict, section: Path, replacement: Any):
+    for member in section[:-1]:
+        if not isinstance(value.get(member), dict):
+            value[member] = {}
+        value = value[member]
+    value[section[-1]] = replacement
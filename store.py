@@ -0,0 +1,243 @@
+import os
+import gzip
+import json
+import hashlib
+import sqlite3
+import tempfile
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+RECORD_KINDS = ('country', 'locations', 'ratings')
+
+# How records are serialized: indented, compact, or compact and gzipped (.json.gz)
+DATA_FORMATS = ('pretty', 'compact', 'gzip')
+
+
+def normalize_name(name: str) -> str:
+    """Normalize a display name or filename stem into an index key"""
+    return " ".join(name.lower().replace('_', ' ').replace('-', ' ').split())
+
+
+def record_stem(filename: str) -> Optional[str]:
+    """The filename without its .json or .json.gz suffix, or None for other files"""
+    for suffix in ('.json.gz', '.json'):
+        if filename.endswith(suffix):
+            return filename[:-len(suffix)]
+    return None
+
+
+def parse_filename(filename: str) -> Optional[Tuple[str, str]]:
+    """Split a data filename such as country_tokyo_food.json into (kind, key)"""
+    stem = record_stem(filename)
+    if stem is None:
+        return None
+    for kind in RECORD_KINDS:
+        if filename.startswith(kind):
+            key = normalize_name(stem[len(kind):])
+            if key and 'template' not in key:
+                return kind, key
+    return None
+
+
+def serialize(data, data_format: str) -> bytes:
+    """Encode a record the way it is stored on disk"""
+    if data_format == 'pretty':
+        return json.dumps(data, indent=2).encode('utf-8')
+    encoded = json.dumps(data, separators=(',', ':')).encode('utf-8')
+    if data_format == 'gzip':
+        # mtime=0 keeps the output identical for identical records
+        return gzip.compress(encoded, mtime=0)
+    return encoded
+
+
+def write_atomic(path: str, content: bytes):
+    """Replace path with content so readers see the old or the new file, never a partial one"""
+    directory, filename = os.path.split(path)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{filename}.", suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+class DataStore:
+    """SQLite index of the country, locations and ratings files in data/.
+
+    Each file is recorded under its kind and a normalized name key, so a
+    selection is a single indexed lookup instead of probing filename variants.
+    Writers register the files they save; a directory rescan only happens when
+    the data directory itself has changed since the last sync. Records saved
+    through save() are written atomically and only when their content changed.
+    """
+
+    def __init__(self, data_dir: str, index_path: str = None, data_format: str = None):
+        self.data_dir = data_dir
+        self.data_format = (data_format or os.getenv('DATA_FORMAT') or 'pretty').lower()
+        if self.data_format not in DATA_FORMATS:
+            logger.warning(f"Unknown DATA_FORMAT {self.data_format!r}, writing pretty JSON")
+            self.data_format = 'pretty'
+        # filename -> (sha256, mtime_ns) of what this store last wrote or confirmed
+        self._written: Dict[str, Tuple[str, int]] = {}
+        # Kept in a subdirectory so SQLite journal files don't touch data/'s mtime
+        index_path = index_path or os.path.join(data_dir, 'cache', 'index.sqlite3')
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(index_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS records (
+                    kind TEXT NOT NULL,
+                    name_key TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    PRIMARY KEY (kind, name_key)
+                );
+                CREATE INDEX IF NOT EXISTS idx_records_name_key ON records(name_key);
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+            """)
+
+    def refresh(self, force: bool = False):
+        """Bring the index in line with the data directory if it has changed"""
+        dir_mtime = str(os.stat(self.data_dir).st_mtime_ns)
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'dir_mtime_ns'").fetchone()
+        if not force and row and row[0] == dir_mtime:
+            return
+
+        on_disk = {}
+        with os.scandir(self.data_dir) as entries:
+            for entry in entries:
+                parsed = parse_filename(entry.name)
+                if parsed and entry.is_file():
+                    on_disk[entry.name] = (parsed, entry.stat().st_mtime_ns)
+
+        with self._lock, self._conn:
+            indexed = {
+                filename for (filename,) in self._conn.execute("SELECT filename FROM records")
+            }
+            for filename in indexed - set(on_disk):
+                self._conn.execute("DELETE FROM records WHERE filename = ?", (filename,))
+            for filename, ((kind, key), mtime_ns) in on_disk.items():
+                self._upsert(kind, key, filename, mtime_ns)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('dir_mtime_ns', ?)",
+                (dir_mtime,)
+            )
+        logger.debug(f"Indexed {len(on_disk)} data files in {self.data_dir}")
+
+    def register(self, filename: str):
+        """Record a file that was just written to the data directory"""
+        parsed = parse_filename(filename)
+        if not parsed:
+            return
+        kind, key = parsed
+        mtime_ns = os.stat(os.path.join(self.data_dir, filename)).st_mtime_ns
+        with self._lock, self._conn:
+            self._upsert(kind, key, filename, mtime_ns)
+
+    def save(self, filename: str, data) -> str:
+        """Write a record and return the name it was saved as.
+        
+        filename may carry either suffix, so a name returned by an earlier
+        save can be passed back in. With the gzip format the file gets a
+        .json.gz suffix, otherwise .json, and a copy left
+        in the other format is removed. Nothing is written when the file
+        already holds exactly this content.
+        """
+        stem = record_stem(filename) or filename
+        filename = stem + ('.json.gz' if self.data_format == 'gzip' else '.json')
+        stale = stem + ('.json' if self.data_format == 'gzip' else '.json.gz')
+        path = os.path.join(self.data_dir, filename)
+        content = serialize(data, self.data_format)
+        digest = hashlib.sha256(content).hexdigest()
+
+        if self._is_unchanged(filename, path, content, digest):
+            logger.debug(f"{filename} is unchanged, skipping write")
+        else:
+            write_atomic(path, content)
+            self._written[filename] = (digest, os.stat(path).st_mtime_ns)
+            self.register(filename)
+            logger.debug(f"Saved {filename} ({len(content)} bytes)")
+
+        stale_path = os.path.join(self.data_dir, stale)
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+            self._written.pop(stale, None)
+            self.refresh()
+        return filename
+
+    def list_names(self) -> List[str]:
+        """Display names of every destination that has a country record"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name_key FROM records WHERE kind = 'country' ORDER BY name_key"
+            ).fetchall()
+        return sorted(name_key.title() for (name_key,) in rows)
+
+    def lookup(self, name: str) -> Dict[str, str]:
+        """Map each record kind available for a destination to its file path"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT kind, filename FROM records WHERE name_key = ?",
+                (normalize_name(name),)
+            ).fetchall()
+        return {kind: os.path.join(self.data_dir, filename) for kind, filename in rows}
+
+    def load(self, name: str) -> Dict[str, Dict]:
+        """Load and parse every record stored for a destination"""
+        records = {}
+        for kind, path in self.lookup(name).items():
+            try:
+                opener = gzip.open if path.endswith('.gz') else open
+                with opener(path, 'rt', encoding='utf-8') as f:
+                    records[kind] = json.load(f)
+            except (OSError, EOFError, json.JSONDecodeError) as e:
+                logger.error(f"Error reading {path}: {e}")
+        return records
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _is_unchanged(self, filename: str, path: str, content: bytes, digest: str) -> bool:
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        known = self._written.get(filename)
+        if known and known[1] == mtime_ns:
+            # Written by this store and untouched since, so no need to read it back
+            return known[0] == digest
+        with open(path, 'rb') as f:
+            unchanged = f.read() == content
+        if unchanged:
+            self._written[filename] = (digest, mtime_ns)
+        return unchanged
+
+    def _upsert(self, kind: str, key: str, filename: str, mtime_ns: int):
+        # When separator variants collide on one key, the most recent file wins
+        row = self._conn.execute(
+            "SELECT filename, mtime_ns FROM records WHERE kind = ? AND name_key = ?",
+            (kind, key)
+        ).fetchone()
+        if row and row[0] != filename and row[1] > mtime_ns:
+            return
+        self._conn.execute(
+            "INSERT OR REPLACE INTO records (kind, name_key, filename, mtime_ns) VALUES (?, ?, ?, ?)",
+            (kind, key, filename, mtime_ns)
+        )
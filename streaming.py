@@ -0,0 +1,123 @@
+import json
+import logging
+from typing import Any, Callable, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+class _Frame:
+    """An open JSON object or array while scanning"""
+    __slots__ = ('kind', 'key', 'is_target', 'item_start', 'index')
+
+    def __init__(self, kind: str, is_target: bool = False):
+        self.kind = kind
+        # Member key currently being read when kind is '{'
+        self.key = None
+        self.is_target = is_target
+        self.item_start = None
+        # Position of the current element when kind is '['
+        self.index = 0
+
+
+class StreamingJSONExtractor:
+    """Incrementally scans a streamed LLM response for one JSON container.
+
+    Text is fed in chunks as it arrives. Once the ```json fence has been seen,
+    every object or array nested directly inside the container stored under
+    ``target_key`` is parsed and handed to ``on_item`` the moment it closes:
+    with its position for arrays (e.g. "recommended_locations") and its member
+    key for objects (e.g. "scores"). Each character is scanned only once.
+    """
+
+    def __init__(self, target_key: str,
+                 on_item: Callable[[Union[int, str], Any], None],
+                 fence: str = '```json'):
+        self.target_key = target_key
+        self.on_item = on_item
+        self.fence = fence
+        self.buffer = ''
+        self.items_emitted = 0
+        self._pos = 0
+        self._started = False
+        self._finished = False
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+
+    def feed(self, text: str):
+        self.buffer += text
+        if not self._started:
+            # Only scan inside the fenced block so braces in prose are ignored
+            start = self.buffer.find(self.fence)
+            if start < 0:
+                return
+            self._started = True
+            self._pos = start + len(self.fence)
+        if not self._finished:
+            self._scan()
+
+    def _scan(self):
+        buffer = self.buffer
+        stack = self._stack
+        pos = self._pos
+        while pos < len(buffer):
+            char = buffer[pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = buffer[self._string_start + 1:pos]
+            elif char == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif char == ':':
+                if stack and stack[-1].kind == '{':
+                    stack[-1].key = self._last_string
+            elif char == ',':
+                if stack and stack[-1].kind == '{':
+                    stack[-1].key = None
+                elif stack and stack[-1].is_target:
+                    # Count every element, scalars included, to match the final parse
+                    stack[-1].index += 1
+            elif char in '{[':
+                parent = stack[-1] if stack else None
+                if parent is not None and parent.is_target:
+                    parent.item_start = pos
+                is_target = (
+                    parent is not None and parent.kind == '{' and parent.key == self.target_key
+                )
+                stack.append(_Frame(char, is_target))
+            elif char in '}]':
+                if not stack:
+                    self._finished = True
+                    break
+                stack.pop()
+                parent = stack[-1] if stack else None
+                if parent is not None and parent.is_target and parent.item_start is not None:
+                    self._emit(parent, buffer[parent.item_start:pos + 1])
+                if not stack:
+                    # The top-level value is complete
+                    self._finished = True
+                    pos += 1
+                    break
+            pos += 1
+        self._pos = pos
+
+    def _emit(self, frame: _Frame, text: str):
+        key = frame.key if frame.kind == '{' else frame.index
+        frame.item_start = None
+        try:
+            item = json.loads(text)
+        except json.JSONDecodeError as e:
+            logger.debug(f"Skipping unparseable streamed item {key}: {e}")
+            return
+        self.items_emitted += 1
+        try:
+            self.on_item(key, item)
+        except Exception as e:
+            logger.error(f"Error handling streamed item {key}: {e}")
@@ -0,0 +1,110 @@
+import json
+import threading
+
+import pytest
+
+from batch import BatchRunner, load_jobs, load_checkpoint, job_key, percentile
+
+
+class StubMetrics:
+    enabled = False
+
+
+class StubGenerator:
+    """Stands in for LocationGenerator; destinations named in fail raise"""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.calls = []
+        self.metrics = StubMetrics()
+        self._lock = threading.Lock()
+
+    def generate_locations(self, location, keyword, radius, count, bypass_cache=False):
+        with self._lock:
+            self.calls.append((location, keyword, radius, count, bypass_cache))
+        if location in self.fail:
+            raise RuntimeError(f"no data for {location}")
+        stem = f"{location}_{keyword}".lower().replace(' ', '_')
+        return f"country_{stem}.json", f"locations_{stem}.json"
+
+    def rate_limit_stats(self):
+        return {}
+
+    def places_stats(self):
+        return {}
+
+    def token_stats(self):
+        return {}
+
+
+def write(path, text):
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_load_jobs_from_csv(tmp_path):
+    path = write(tmp_path / "jobs.csv", "location,keyword,radius,count\nLisbon,surf,30,5\nPorto,,,\nTokyo,food,,\n")
+    assert load_jobs(path) == [
+        {"location": "Lisbon", "keyword": "surf", "radius": 30, "count": 5},
+        {"location": "Tokyo", "keyword": "food", "radius": 50, "count": 10},
+    ]
+
+
+def test_load_jobs_from_jsonl(tmp_path):
+    path = write(tmp_path / "jobs.jsonl", '{"location": " Lisbon ", "keyword": "surf"}\n\n{"location": "Porto"}\n')
+    assert load_jobs(path) == [{"location": "Lisbon", "keyword": "surf", "radius": 50, "count": 10}]
+
+
+def test_load_jobs_reports_bad_jsonl_line(tmp_path):
+    path = write(tmp_path / "jobs.jsonl", '{"location": "Lisbon", "keyword": "surf"}\n{oops\n')
+    with pytest.raises(ValueError, match="line 2"):
+        load_jobs(path)
+
+
+def test_checkpoint_ignores_partial_last_line(tmp_path):
+    path = write(tmp_path / "checkpoint.jsonl", '{"key": "a"}\n{"key": "b"}\n{"key": "c')
+    assert set(load_checkpoint(path)) == {"a", "b"}
+    assert load_checkpoint(str(tmp_path / "missing.jsonl")) == {}
+
+
+@pytest.mark.parametrize("values, fraction, expected", [
+    ([], 0.5, 0.0),
+    ([3.0], 0.95, 3.0),
+    ([4.0, 1.0, 3.0, 2.0, 5.0], 0.5, 3.0),
+    ([4.0, 1.0, 3.0, 2.0, 5.0], 0.95, 5.0),
+])
+def test_percentile(values, fraction, expected):
+    assert percentile(values, fraction) == expected
+
+
+JOBS = [
+    {"location": "Lisbon", "keyword": "surf", "radius": 30, "count": 5},
+    {"location": "Porto", "keyword": "wine", "radius": 30, "count": 5},
+    {"location": "Nowhere", "keyword": "food", "radius": 30, "count": 5},
+]
+
+
+def test_run_reports_and_checkpoints(tmp_path):
+    checkpoint = str(tmp_path / "checkpoint.jsonl")
+    generator = StubGenerator(fail={"Nowhere"})
+    report = BatchRunner(generator, checkpoint, concurrency=2, bypass_cache=True).run(JOBS)
+
+    assert (report["total"], report["skipped"], report["succeeded"], report["failed"]) == (3, 0, 2, 1)
+    assert report["failures"] == [{**JOBS[2], "error": "no data for Nowhere"}]
+    assert all(call[4] for call in generator.calls)
+    records = load_checkpoint(checkpoint)
+    assert set(records) == {job_key(JOBS[0]), job_key(JOBS[1])}
+    assert records[job_key(JOBS[0])]["locations_file"] == "locations_lisbon_surf.json"
+
+
+def test_rerun_skips_completed_jobs(tmp_path):
+    checkpoint = str(tmp_path / "checkpoint.jsonl")
+    BatchRunner(StubGenerator(fail={"Nowhere"}), checkpoint).run(JOBS)
+
+    generator = StubGenerator()
+    report = BatchRunner(generator, checkpoint).run(JOBS)
+    assert report["skipped"] == 2
+    assert report["succeeded"] == 1
+    assert [call[0] for call in generator.calls] == ["Nowhere"]
+    with open(checkpoint, encoding="utf-8") as f:
+        assert len([json.loads(line) for line in f]) == 3
@@ -0,0 +1,146 @@
+import os
+import time
+
+import pytest
+
+from cache import PlaceCache, ResponseCache, PhotoCache, search_area_key
+
+LISBON = {"lat": 38.7223, "lng": -9.1393, "radius_m": 30000}
+PORTO = {"lat": 41.1579, "lng": -8.6291, "radius_m": 30000}
+
+
+def details(place_id, name="Ericeira"):
+    return {"place_id": place_id, "name": name, "lat": 38.96, "lng": -9.41}
+
+
+def time_passes():
+    # Access times are wall-clock seconds; make sure the next access sorts later
+    time.sleep(0.01)
+
+
+@pytest.fixture
+def place_cache(tmp_path):
+    return PlaceCache(os.path.join(tmp_path, "places.sqlite3"))
+
+
+@pytest.mark.parametrize("search_area, expected", [
+    (None, ""),
+    ({}, ""),
+    (LISBON, "38.722,-9.139,30000"),
+    ({"lat": 38.72231, "lng": -9.13934, "radius_m": 30000.0}, "38.722,-9.139,30000"),
+])
+def test_search_area_key(search_area, expected):
+    assert search_area_key(search_area) == expected
+
+
+def test_place_lookup_round_trip(place_cache):
+    place_cache.put("Ericeira", "Lisbon", details("p1"), LISBON)
+    assert place_cache.get("ericeira ", "LISBON", LISBON) == details("p1")
+    assert place_cache.get_by_place_id("p1") == details("p1")
+
+
+def test_search_area_is_part_of_the_query(place_cache):
+    place_cache.put("Praia Grande", "Portugal", details("p-sintra", "Praia Grande"), LISBON)
+    assert place_cache.get("Praia Grande", "Portugal", PORTO) is None
+    assert place_cache.get("Praia Grande", "Portugal") is None
+    place_cache.put("Praia Grande", "Portugal", details("p-porto", "Praia Grande"), PORTO)
+    assert place_cache.get("Praia Grande", "Portugal", LISBON)["place_id"] == "p-sintra"
+    assert place_cache.get("Praia Grande", "Portugal", PORTO)["place_id"] == "p-porto"
+
+
+def test_entries_from_before_search_areas_are_not_reused(place_cache):
+    place_cache.put("Ericeira", "Lisbon", details("p1"))
+    with place_cache._lock, place_cache._conn:
+        place_cache._conn.execute(
+            "INSERT INTO place_queries (query_key, place_id) VALUES ('ericeira|lisbon', 'p1')"
+        )
+    assert place_cache.get("Ericeira", "Lisbon", LISBON) is None
+
+
+def test_queries_share_one_place(place_cache):
+    place_cache.put("Ericeira", "Lisbon", details("p1"), LISBON)
+    place_cache.put("Ericeira beach town", "Mafra", details("p1"), LISBON)
+    assert place_cache.get("Ericeira", "Lisbon", LISBON) == details("p1")
+    with place_cache._lock:
+        count = place_cache._conn.execute("SELECT COUNT(*) FROM place_details").fetchone()[0]
+    assert count == 1
+
+
+def test_expired_places_are_dropped(tmp_path):
+    place_cache = PlaceCache(os.path.join(tmp_path, "places.sqlite3"), ttl_seconds=-1)
+    place_cache.put("Ericeira", "Lisbon", details("p1"), LISBON)
+    assert place_cache.get("Ericeira", "Lisbon", LISBON) is None
+    assert place_cache.get_by_place_id("p1") is None
+
+
+@pytest.fixture
+def response_cache(tmp_path):
+    return ResponseCache(os.path.join(tmp_path, "responses.sqlite3"), max_entries=2)
+
+
+def test_response_key_covers_every_request_parameter():
+    key = ResponseCache.make_key(provider="perplexity", model="sonar", prompt="Hi")
+    assert key == ResponseCache.make_key(prompt="Hi", model="sonar", provider="perplexity")
+    assert key != ResponseCache.make_key(provider="perplexity", model="sonar-pro", prompt="Hi")
+    assert key != ResponseCache.make_key(provider="perplexity", model="sonar", prompt="Hi ")
+
+
+def test_response_round_trip_and_delete(response_cache):
+    response_cache.put("k1", "answer")
+    assert response_cache.get("k1") == "answer"
+    response_cache.delete("k1")
+    assert response_cache.get("k1") is None
+
+
+def test_least_recently_used_response_is_evicted(response_cache):
+    response_cache.put("k1", "one")
+    response_cache.put("k2", "two")
+    time_passes()
+    response_cache.get("k1")
+    response_cache.put("k3", "three")
+    assert response_cache.get("k2") is None
+    assert response_cache.get("k1") == "one"
+    assert response_cache.get("k3") == "three"
+
+
+def test_expired_response_is_dropped(tmp_path):
+    response_cache = ResponseCache(os.path.join(tmp_path, "responses.sqlite3"), ttl_seconds=-1)
+    response_cache.put("k1", "answer")
+    assert response_cache.get("k1") is None
+
+
+@pytest.fixture
+def photo_cache(tmp_path):
+    return PhotoCache(os.path.join(tmp_path, "photos.sqlite3"), os.path.join(tmp_path, "blobs"), max_bytes=10)
+
+
+def blobs(photo_cache):
+    return sorted(os.listdir(photo_cache.blob_dir))
+
+
+def test_photo_round_trip_shares_blobs(photo_cache):
+    photo_cache.put("ref-a", b"jpeg", "image/jpeg")
+    photo_cache.put("ref-b", b"jpeg", "image/jpeg")
+    assert photo_cache.get("ref-a") == (b"jpeg", "image/jpeg")
+    assert photo_cache.get("ref-b") == (b"jpeg", "image/jpeg")
+    assert len(blobs(photo_cache)) == 1
+    assert photo_cache.total_bytes() == 4
+
+
+def test_least_recently_viewed_photos_are_evicted(photo_cache):
+    photo_cache.put("ref-a", b"aaaa", "image/jpeg")
+    photo_cache.put("ref-b", b"bbbb", "image/jpeg")
+    time_passes()
+    photo_cache.get("ref-a")
+    photo_cache.put("ref-c", b"cccc", "image/png")
+    assert photo_cache.get("ref-b") is None
+    assert photo_cache.get("ref-a") == (b"aaaa", "image/jpeg")
+    assert photo_cache.total_bytes() == 8
+    assert len(blobs(photo_cache)) == 2
+
+
+def test_missing_blob_is_forgotten(photo_cache):
+    photo_cache.put("ref-a", b"jpeg", "image/jpeg")
+    os.remove(os.path.join(photo_cache.blob_dir, blobs(photo_cache)[0]))
+    assert photo_cache.get("ref-a") is None
+    assert photo_cache.total_bytes() == 0
@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+from utils import RateLimiter, GenerationCancelled
+
+
+def timed(func, *args):
+    start = time.monotonic()
+    func(*args)
+    return time.monotonic() - start
+
+
+def test_acquire_spends_burst_then_paces():
+    limiter = RateLimiter(600, burst=2)
+    assert timed(limiter.acquire) < 0.05
+    assert timed(limiter.acquire) < 0.05
+    # 600 requests per minute refill one token every 0.1 s
+    assert 0.07 < timed(limiter.acquire) < 0.3
+    assert limiter.stats()['requests'] == 3
+
+
+def test_unlimited_rate_never_waits():
+    limiter = RateLimiter(0)
+    assert timed(lambda: [limiter.acquire() for _ in range(50)]) < 0.05
+
+
+def test_throttle_blocks_callers_and_halves_rate():
+    limiter = RateLimiter(600, burst=5)
+    delay = limiter.record_throttle(0.2, attempt=0)
+    assert delay == pytest.approx(0.2)
+    assert 0.15 < timed(limiter.acquire) < 0.5
+    stats = limiter.stats()
+    assert stats['rate_per_minute'] == 300
+    assert stats['throttled'] == 1
+
+
+def test_retry_after_is_capped():
+    limiter = RateLimiter(600, max_backoff=0.5)
+    assert limiter.record_throttle(120, attempt=0) == 0.5
+
+
+def test_jittered_backoff_without_retry_after():
+    limiter = RateLimiter(600, base_backoff=0.1, max_backoff=1.0)
+    for attempt in range(6):
+        assert 0 <= limiter.record_throttle(None, attempt) <= min(1.0, 0.1 * 2 ** attempt)
+
+
+def test_concurrent_throttles_halve_rate_once():
+    limiter = RateLimiter(50)
+    barrier = threading.Barrier(8)
+
+    def throttled():
+        barrier.wait()
+        limiter.record_throttle(1.0, attempt=0)
+
+    threads = [threading.Thread(target=throttled) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = limiter.stats()
+    assert stats['throttled'] == 8
+    assert stats['rate_per_minute'] == 25
+
+
+def test_rate_has_a_floor():
+    limiter = RateLimiter(50)
+    for _ in range(20):
+        # A zero delay closes the window at once, so each throttle counts
+        limiter.record_throttle(0, attempt=0)
+    assert limiter.stats()['rate_per_minute'] == 5
+
+
+def test_successes_restore_rate():
+    limiter = RateLimiter(60)
+    limiter.record_throttle(0, attempt=0)
+    assert limiter.stats()['rate_per_minute'] == 30
+    for _ in range(4):
+        limiter.record_success()
+    assert limiter.stats()['rate_per_minute'] == 54
+    for _ in range(4):
+        limiter.record_success()
+    assert limiter.stats()['rate_per_minute'] == 60
+
+
+def test_cancel_interrupts_wait():
+    limiter = RateLimiter(600)
+    limiter.record_throttle(5, attempt=0)
+    cancel_event = threading.Event()
+    threading.Timer(0.05, cancel_event.set).start()
+    start = time.monotonic()
+    with pytest.raises(GenerationCancelled):
+        limiter.acquire(cancel_event)
+    assert time.monotonic() - start < 1
@@ -0,0 +1,209 @@
+import json
+
+import pytest
+
+import fakes
+from schema import (strip_trailing_commas, salvage, validate, repair, broken_sections,
+                    section_template, replace_section)
+from utils import LocationGenerator
+
+TEMPLATE = {
+    "location": {"name": "Example", "region": "Example region"},
+    "scores": {
+        "surfing": {"score": 7, "notes": "Example notes"},
+        "hiking": {"score": 8, "notes": "Example notes"},
+    },
+    "property_info": {"average_price": 250000, "family_friendly": True},
+    "highlights": ["Example highlight"],
+}
+
+VALID = {
+    "location": {"name": "Ericeira", "region": "Lisbon"},
+    "scores": {
+        "surfing": {"score": 9, "notes": "Reef breaks"},
+        "hiking": {"score": 6, "notes": "Coastal trails"},
+    },
+    "property_info": {"average_price": 410000, "family_friendly": True},
+    "highlights": ["Ribeira d'Ilhas", "Fishing harbour"],
+}
+
+
+def copy(value):
+    return json.loads(json.dumps(value))
+
+
+def with_value(path, replacement):
+    value = copy(VALID)
+    replace_section(value, path, replacement)
+    return value
+
+
+@pytest.mark.parametrize("body, expected", [
+    ('{"a": 1,}', '{"a": 1}'),
+    ('[1, 2, ]', '[1, 2 ]'),
+    ('{"a": [1,\n  ],\n}', '{"a": [1\n  ]\n}'),
+    ('{"a": "x, }", "b": "y,]",}', '{"a": "x, }", "b": "y,]"}'),
+    ('{"a": "say \\"hi,\\" }",}', '{"a": "say \\"hi,\\" }"}'),
+    ('{"a": 1, "b": 2}', '{"a": 1, "b": 2}'),
+    ('{"a": [1, 2', '{"a": [1, 2'),
+])
+def test_strip_trailing_commas(body, expected):
+    assert strip_trailing_commas(body) == expected
+
+
+def test_salvage_truncated_mid_section():
+    text = json.dumps(VALID, indent=2)
+    cut = text[:text.index('"hiking"') + len('"hiking": {"score": 6')]
+    data = salvage("```json\n" + cut, TEMPLATE)
+    assert data["location"] == VALID["location"]
+    assert data["scores"] == {"surfing": VALID["scores"]["surfing"]}
+    assert "property_info" not in data and "highlights" not in data
+    assert broken_sections(data, TEMPLATE) == [
+        ("scores", "hiking"), ("property_info",), ("highlights",)
+    ]
+
+
+LOCATIONS_TEMPLATE = {"recommended_locations": [{"name": "Example", "region": "Example region"}]}
+
+
+@pytest.mark.parametrize("text, template, expected", [
+    ('no json here', TEMPLATE, {}),
+    ('```json\n{"location": {"name": "A", "region": "B"},}\n```', TEMPLATE,
+     {"location": {"name": "A", "region": "B"}}),
+    ('{"location": {"name": "A", "region": "B"}, "highlights": "oops"}', TEMPLATE,
+     {"location": {"name": "A", "region": "B"}, "highlights": "oops"}),
+    # Only complete objects survive in a list cut off mid-item
+    ('{"recommended_locations": [{"name": "A", "region": "B"}, {"name": "C", "reg', LOCATIONS_TEMPLATE,
+     {"recommended_locations": [{"name": "A", "region": "B"}]}),
+    ('{"recommended_locations": [{"name": "A, }", "region": "B"},]}', LOCATIONS_TEMPLATE,
+     {"recommended_locations": [{"name": "A, }", "region": "B"}]}),
+])
+def test_salvage(text, template, expected):
+    assert salvage(text, template) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    (VALID, []),
+    (with_value(("scores", "surfing", "score"), 11), [(("scores", "surfing", "score"), "score outside 1-10")]),
+    (with_value(("scores", "surfing", "score"), "7/10"), [(("scores", "surfing", "score"), "expected a number")]),
+    (with_value(("property_info", "average_price"), True),
+     [(("property_info", "average_price"), "expected a number")]),
+    (with_value(("property_info", "family_friendly"), "yes"),
+     [(("property_info", "family_friendly"), "expected true or false")]),
+    (with_value(("location", "name"), None), [(("location", "name"), "missing")]),
+    (with_value(("highlights",), "Ribeira"), [(("highlights",), "expected a list")]),
+    (with_value(("highlights",), ["Ribeira", 3]), [(("highlights", 1), "expected text")]),
+    (with_value(("scores",), []), [(("scores",), "expected an object")]),
+])
+def test_validate(value, expected):
+    assert validate(value, TEMPLATE) == expected
+
+
+def test_validate_score_range():
+    assert validate(4, 3, (1, 5), key="freedom", parent_key="scores") == []
+    assert validate(6, 3, (1, 5), key="freedom", parent_key="scores") == [((), "score outside 1-5")]
+    # Outside a score group any number goes
+    assert validate(6, 3, (1, 5), key="population") == []
+
+
+@pytest.mark.parametrize("path, given, repaired, fixes", [
+    (("scores", "surfing", "score"), "7/10", 7, 1),
+    (("scores", "surfing", "score"), " 8 ", 8, 1),
+    (("scores", "surfing", "score"), 12, 10, 1),
+    (("scores", "surfing", "score"), 0, 1, 1),
+    (("scores", "surfing", "score"), 6.6, 7, 1),
+    (("scores", "surfing", "score"), 7, 7, 0),
+    (("scores", "surfing", "score"), "great", "great", 0),
+    (("scores", "surfing", "score"), True, True, 0),
+    (("property_info", "average_price"), "410000", 410000.0, 1),
+    (("property_info", "average_price"), 1e9, 1e9, 0),
+    (("highlights",), ["Ribeira", 3, None, "Harbour"], ["Ribeira", "Harbour"], 2),
+])
+def test_repair(path, given, repaired, fixes):
+    value, count = repair(with_value(path, given), TEMPLATE)
+    assert section_template(value, path) == repaired
+    assert count == fixes
+
+
+@pytest.mark.parametrize("value, expected", [
+    (VALID, []),
+    (with_value(("scores", "hiking", "notes"), None), [("scores", "hiking")]),
+    (with_value(("property_info", "average_price"), "n/a"), [("property_info",)]),
+    ({"location": VALID["location"]}, [("scores",), ("property_info",), ("highlights",)]),
+])
+def test_broken_sections(value, expected):
+    assert broken_sections(value, TEMPLATE) == expected
+
+
+@pytest.mark.parametrize("value, section, replacement, expected", [
+    ({"scores": {"surfing": 1}}, ("scores", "hiking"), 2, {"scores": {"surfing": 1, "hiking": 2}}),
+    ({}, ("scores", "hiking"), 2, {"scores": {"hiking": 2}}),
+    ({"scores": "broken"}, ("scores", "hiking"), 2, {"scores": {"hiking": 2}}),
+    ({"highlights": "broken"}, ("highlights",), ["a"], {"highlights": ["a"]}),
+])
+def test_replace_section(value, section, replacement, expected):
+    replace_section(value, section, replacement)
+    assert value == expected
+
+
+@pytest.fixture
+def generator(tmp_path, monkeypatch):
+    generator = LocationGenerator(
+        http_session=fakes.ReplaySession(),
+        anthropic_client=fakes.ReplayAnthropicClient(),
+        rate_limits={'perplexity': 0, 'anthropic': 0, 'places': 0},
+        data_dir=str(tmp_path)
+    )
+    generator.discarded = []
+    monkeypatch.setattr(generator, '_discard_cached_response',
+                        lambda provider, prompt: generator.discarded.append(provider))
+    return generator
+
+
+def answer_with(generator, monkeypatch, payload):
+    answer = "```json\n" + json.dumps(payload) + "\n```"
+    monkeypatch.setattr(generator, '_get_claude_response', lambda prompt, bypass_cache=False: answer)
+
+
+@pytest.mark.parametrize("section, payload, expected", [
+    (("scores", "hiking"), {"score": "6/10", "notes": "Trails"}, {"score": 6, "notes": "Trails"}),
+    (("scores", "hiking"), {"hiking": {"score": 6, "notes": "Trails"}}, {"score": 6, "notes": "Trails"}),
+    (("highlights",), {"highlights": ["Harbour"]}, ["Harbour"]),
+    (("location",), {"name": "Ericeira", "region": "Lisbon"}, {"name": "Ericeira", "region": "Lisbon"}),
+])
+def test_reask_section(generator, monkeypatch, section, payload, expected):
+    answer_with(generator, monkeypatch, payload)
+    value = generator._reask_section(
+        'anthropic', "Rate Ericeira.", section, section_template(TEMPLATE, section), (1, 10)
+    )
+    assert value == expected
+    assert generator.discarded == []
+
+
+def test_reask_section_keeps_member_named_like_the_section(generator, monkeypatch):
+    # A section whose template has a member of its own name must not be unwrapped
+    template = {"location": {"location": "Example", "country": None}}
+    answer_with(generator, monkeypatch, {"location": "Ericeira"})
+    value = generator._reask_section('anthropic', "Rate Ericeira.", ("location",), template["location"], (1, 10))
+    assert value == {"location": "Ericeira"}
+
+
+@pytest.mark.parametrize("section, payload", [
+    (("scores", "hiking"), {"score": "great", "notes": "Trails"}),
+    (("scores", "hiking"), {"notes": "Trails"}),
+    (("highlights",), {"items": ["Harbour"]}),
+])
+def test_reask_section_discards_invalid_answer(generator, monkeypatch, section, payload):
+    answer_with(generator, monkeypatch, payload)
+    with pytest.raises(ValueError, match="Could not repair"):
+        generator._reask_section(
+            'anthropic', "Rate Ericeira.", section, section_template(TEMPLATE, section), (1, 10)
+        )
+    assert generator.discarded == ['anthropic']
+
+
+def test_reask_section_discards_answer_without_json(generator, monkeypatch):
+    monkeypatch.setattr(generator, '_get_claude_response', lambda prompt, bypass_cache=False: "Sorry, no.")
+    with pytest.raises(ValueError, match="Could not repair"):
+        generator._reask_section('anthropic', "Rate Ericeira.", ("highlights",), ["Example"], (1, 10))
+    assert generator.discarded == ['anthropic']
@@ -0,0 +1,106 @@
+import gzip
+import json
+import os
+
+import pytest
+
+from store import DataStore, parse_filename, record_stem
+
+RECORD = {"location": {"name": "Tokyo", "region": "Kanto"}, "scores": {"food": 5}}
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    return str(tmp_path)
+
+
+def make_store(data_dir, data_format):
+    store = DataStore(data_dir, data_format=data_format)
+    store.refresh()
+    return store
+
+
+def files(data_dir):
+    return sorted(entry.name for entry in os.scandir(data_dir) if entry.is_file())
+
+
+@pytest.mark.parametrize("filename, stem, parsed", [
+    ("country_tokyo_food.json", "country_tokyo_food", ("country", "tokyo food")),
+    ("locations_tokyo_food.json.gz", "locations_tokyo_food", ("locations", "tokyo food")),
+    ("ratings_new-york_jazz.json", "ratings_new-york_jazz", ("ratings", "new york jazz")),
+    ("country_template.json", "country_template", None),
+    ("notes.txt", None, None),
+    ("country_tokyo.json.bak", None, None),
+])
+def test_parse_filename(filename, stem, parsed):
+    assert record_stem(filename) == stem
+    assert parse_filename(filename) == parsed
+
+
+@pytest.mark.parametrize("data_format, filename", [
+    ("pretty", "country_tokyo_food.json"),
+    ("compact", "country_tokyo_food.json"),
+    ("gzip", "country_tokyo_food.json.gz"),
+])
+def test_save_and_load_round_trip(data_dir, data_format, filename):
+    store = make_store(data_dir, data_format)
+    assert store.save("country_tokyo_food.json", RECORD) == filename
+    assert files(data_dir) == [filename]
+    assert store.list_names() == ["Tokyo Food"]
+    assert store.lookup("Tokyo Food") == {"country": os.path.join(data_dir, filename)}
+    assert store.load("tokyo_food") == {"country": RECORD}
+
+
+def test_gzip_file_is_compressed_json(data_dir):
+    store = make_store(data_dir, "gzip")
+    store.save("country_tokyo_food.json", RECORD)
+    with gzip.open(os.path.join(data_dir, "country_tokyo_food.json.gz"), "rt", encoding="utf-8") as f:
+        assert json.load(f) == RECORD
+
+
+@pytest.mark.parametrize("data_format", ["pretty", "gzip"])
+def test_saved_name_can_be_saved_again(data_dir, data_format):
+    store = make_store(data_dir, data_format)
+    saved = store.save("locations_tokyo_food.json", {"recommended_locations": []})
+    updated = {"recommended_locations": [{"name": "Tsukiji"}]}
+    assert store.save(saved, updated) == saved
+    assert files(data_dir) == [saved]
+    assert store.load("Tokyo Food") == {"locations": updated}
+
+
+def test_switching_format_removes_stale_copy(data_dir):
+    make_store(data_dir, "pretty").save("country_tokyo_food.json", RECORD)
+    store = make_store(data_dir, "gzip")
+    assert store.save("country_tokyo_food.json", RECORD) == "country_tokyo_food.json.gz"
+    assert files(data_dir) == ["country_tokyo_food.json.gz"]
+    assert store.lookup("Tokyo Food") == {"country": os.path.join(data_dir, "country_tokyo_food.json.gz")}
+
+
+def test_unchanged_record_is_not_rewritten(data_dir):
+    store = make_store(data_dir, "pretty")
+    store.save("country_tokyo_food.json", RECORD)
+    path = os.path.join(data_dir, "country_tokyo_food.json")
+    os.utime(path, ns=(1, 1))
+    store.save("country_tokyo_food.json", dict(RECORD))
+    assert os.stat(path).st_mtime_ns == 1
+    store.save("country_tokyo_food.json", {**RECORD, "scores": {"food": 4}})
+    assert os.stat(path).st_mtime_ns != 1
+
+
+def test_refresh_picks_up_external_changes(data_dir):
+    store = make_store(data_dir, "pretty")
+    store.save("country_tokyo_food.json", RECORD)
+    with open(os.path.join(data_dir, "country_osaka_food.json"), "w") as f:
+        json.dump(RECORD, f)
+    os.remove(os.path.join(data_dir, "country_tokyo_food.json"))
+    store.refresh()
+    assert store.list_names() == ["Osaka Food"]
+    assert store.lookup("Tokyo Food") == {}
+
+
+def test_index_persists_between_stores(data_dir):
+    make_store(data_dir, "pretty").save("country_tokyo_food.json", RECORD)
+    store = DataStore(data_dir)
+    # The directory is unchanged since the last sync, so no rescan is needed
+    store.refresh()
+    assert store.list_names() == ["Tokyo Food"]
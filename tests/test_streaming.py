@@ -0,0 +1,139 @@
+import json
+import threading
+
+import pytest
+
+import fakes
+from streaming import StreamingJSONExtractor
+from utils import LocationGenerator
+
+
+def location(name, region="Lisbon", brief="Streamed"):
+    return {"name": name, "region": region, "brief": brief}
+
+
+@pytest.fixture
+def generator(tmp_path, monkeypatch):
+    generator = LocationGenerator(
+        http_session=fakes.ReplaySession(),
+        anthropic_client=fakes.ReplayAnthropicClient(),
+        rate_limits={'perplexity': 0, 'anthropic': 0, 'places': 0},
+        data_dir=str(tmp_path)
+    )
+    generator.lookups = []
+    lock = threading.Lock()
+
+    def place_fields(location, search_area=None):
+        with lock:
+            generator.lookups.append(location['name'])
+        if location['name'] == 'Nowhere':
+            return None
+        return {'place_id': f"place-{location['name']}", 'coords': {'lat': 38.9, 'lng': -9.4}}
+
+    monkeypatch.setattr(generator, '_place_fields', place_fields)
+    return generator
+
+
+def stream(generator, monkeypatch, locations, chunk_size=7):
+    answer = "```json\n" + json.dumps({"recommended_locations": locations}) + "\n```"
+
+    def respond(prompt, bypass_cache=False, on_text=None):
+        for start in range(0, len(answer), chunk_size):
+            on_text(answer[start:start + chunk_size])
+        return answer
+
+    monkeypatch.setattr(generator, '_get_perplexity_response', respond)
+
+
+def test_repeated_place_keeps_both_lookups(generator, monkeypatch):
+    stream(generator, monkeypatch, [location("Ericeira"), location("Sintra"), location("Ericeira")])
+    events = []
+    result = generator._stream_locations_data(
+        "prompt", False, lambda stage, data: events.append(data['name'])
+    )["recommended_locations"]
+    assert [item['name'] for item in result] == ["Ericeira", "Sintra", "Ericeira"]
+    assert sorted(generator.lookups) == ["Ericeira", "Ericeira", "Sintra"]
+    assert sorted(events) == sorted(generator.lookups)
+
+
+def test_places_fields_go_onto_repaired_records(generator, monkeypatch):
+    stream(generator, monkeypatch, [location("Ericeira"), location("Sintra")])
+    repaired = [location("Ericeira", brief="Repaired"), location("Sintra", brief="Repaired")]
+    monkeypatch.setattr(generator, '_parse_checked',
+                        lambda *args, **kwargs: {"recommended_locations": repaired})
+    result = generator._stream_locations_data("prompt", False)["recommended_locations"]
+    assert [item['brief'] for item in result] == ["Repaired", "Repaired"]
+    assert [item['place_id'] for item in result] == ["place-Ericeira", "place-Sintra"]
+    assert result[0] is repaired[0]
+    assert sorted(generator.lookups) == ["Ericeira", "Sintra"]
+
+
+def test_dropped_and_unmatched_records(generator, monkeypatch):
+    # The second item fails validation and is dropped; Nowhere has no Places match
+    stream(generator, monkeypatch, [location("Ericeira"), location("Bad", region=5), location("Nowhere")])
+    result = generator._stream_locations_data("prompt", False)["recommended_locations"]
+    assert [item['name'] for item in result] == ["Ericeira"]
+    assert sorted(generator.lookups) == ["Bad", "Ericeira", "Nowhere"]
+
+
+def test_record_missing_from_stream_is_looked_up_after(generator, monkeypatch):
+    stream(generator, monkeypatch, [location("Ericeira")])
+    repaired = [location("Ericeira"), location("Cascais")]
+    monkeypatch.setattr(generator, '_parse_checked',
+                        lambda *args, **kwargs: {"recommended_locations": repaired})
+    result = generator._stream_locations_data("prompt", False)["recommended_locations"]
+    assert [item['place_id'] for item in result] == ["place-Ericeira", "place-Cascais"]
+    assert sorted(generator.lookups) == ["Cascais", "Ericeira"]
+
+
+def extract(text, target_key="recommended_locations", chunk_size=None, fence='```json'):
+    items = []
+    extractor = StreamingJSONExtractor(target_key, lambda key, item: items.append((key, item)), fence=fence)
+    chunk_size = chunk_size or len(text)
+    for start in range(0, len(text), chunk_size):
+        extractor.feed(text[start:start + chunk_size])
+    return items
+
+
+LOCATIONS_ANSWER = (
+    'Here you go {not json}\n```json\n{"recommended_locations": ['
+    '{"name": "A", "coords": {"lat": 1, "lng": 2}}, "skip me", {"name": "B, [}", "tags": ["x"]}'
+    ']}\n```'
+)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 17, None])
+def test_extractor_emits_items_in_any_chunking(chunk_size):
+    assert extract(LOCATIONS_ANSWER, chunk_size=chunk_size) == [
+        (0, {"name": "A", "coords": {"lat": 1, "lng": 2}}),
+        (2, {"name": "B, [}", "tags": ["x"]}),
+    ]
+
+
+@pytest.mark.parametrize("text, target_key, fence, expected", [
+    # Object members are keyed by name
+    ('```json\n{"scores": {"food": {"score": 4}, "note": "x", "nightlife": {"score": 2}}}',
+     "scores", '```json', [("food", {"score": 4}), ("nightlife", {"score": 2})]),
+    # Nothing before the fence is scanned
+    ('{"recommended_locations": [{"name": "A"}]}', "recommended_locations", '```json', []),
+    ('{"recommended_locations": [{"name": "A"}]}', "recommended_locations", '', [(0, {"name": "A"})]),
+    # An item cut off by the end of the stream is never emitted
+    ('```json\n{"recommended_locations": [{"name": "A"}, {"name": "B"', "recommended_locations", '```json',
+     [(0, {"name": "A"})]),
+    # Escaped quotes do not end a string
+    ('```json\n{"recommended_locations": [{"name": "say \\"}\\""}]}', "recommended_locations", '```json',
+     [(0, {"name": 'say "}"'})]),
+])
+def test_extractor(text, target_key, fence, expected):
+    assert extract(text, target_key, fence=fence) == expected
+
+
+def test_extractor_stops_after_the_top_level_value():
+    text = '```json\n{"recommended_locations": [{"name": "A"}]}\n```\nAlso {"recommended_locations": [{}]}'
+    assert extract(text, chunk_size=5) == [(0, {"name": "A"})]
+
+
+def test_extractor_survives_a_failing_callback():
+    extractor = StreamingJSONExtractor('recommended_locations', lambda key, item: 1 / 0, fence='')
+    extractor.feed('{"recommended_locations": [{"name": "A"}, {"name": "B"}]}')
+    assert extractor.items_emitted == 2
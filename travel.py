@@ -1,20 +1,20 @@
 import os
 import sys
 import json
+import threading
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
-                           QHBoxLayout, QTableWidget, QTableWidgetItem, QLabel, 
+                           QHBoxLayout, QTableWidget, QTableWidgetItem, QTableView, QLabel, 
                            QComboBox, QTabWidget, QHeaderView, QPushButton,
                            QScrollArea, QTextEdit, QSplitter, QSizePolicy,
                            QDialog, QLineEdit, QSpinBox, QProgressDialog, QMessageBox,
                            QFormLayout, QDialogButtonBox, QGroupBox)
-from PyQt6.QtCore import Qt, QUrl, pyqtSlot, QObject
-from PyQt6.QtGui import QColor
-from PyQt6.QtWebEngineWidgets import QWebEngineView
-from PyQt6.QtWebEngineCore import QWebEngineSettings, QWebEnginePage
-from PyQt6.QtWebChannel import QWebChannel
+from PyQt6.QtCore import (Qt, QUrl, pyqtSlot, pyqtSignal, QObject, QThread, QTimer,
+                          QAbstractTableModel, QModelIndex, QSortFilterProxyModel)
 from config import GOOGLE_MAPS_API_KEY, DEFAULT_CENTER, DEFAULT_ZOOM
 import logging
-from utils import LocationGenerator
+from store import DataStore
+# Qt WebEngine (mapview) and the provider clients (utils) are slow to import,
+# so they are loaded once the window is up or a generation job needs them
 
 logging.basicConfig(
     level=logging.DEBUG,
@@ -71,22 +71,317 @@ class GenerateLocationsDialog(QDialog):
             'results': self.results_input.value()
         }
 
+class GenerationWorker(QObject):
+    """Runs a generation job on a worker thread and reports back through signals"""
+    progress = pyqtSignal(str, object)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+    done = pyqtSignal()
+
+    def __init__(self, job):
+        super().__init__()
+        # job is called with a progress callback and returns the job result
+        self.job = job
+
+    @pyqtSlot()
+    def run(self):
+        # Jobs call into the generator, so utils is already loaded by now
+        from utils import GenerationCancelled
+        try:
+            result = self.job(self.progress.emit)
+        except GenerationCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            logger.error(f"Background job failed: {e}")
+            self.failed.emit(str(e))
+        else:
+            self.finished.emit(result)
+        finally:
+            self.done.emit()
+
+def location_key(location):
+    """Stable identifier for a location: its place_id, falling back to name and region.
+    
+    Used to diff map markers, index table rows and identify marker clicks.
+    """
+    return location.get('place_id') or f"{location.get('name')}|{location.get('region')}"
+
+def location_keys(locations):
+    """location_key for each record, made unique within the list.
+    
+    The model can return the same place twice, e.g. under two names; repeats
+    get an occurrence suffix so neither row nor marker replaces the other.
+    """
+    keys = []
+    seen = {}
+    for location in locations:
+        key = location_key(location)
+        count = seen.get(key, 0) + 1
+        seen[key] = count
+        if count > 1:
+            logger.debug(f"Location {key} is listed {count} times")
+            key = f"{key}#{count}"
+        keys.append(key)
+    return keys
+
+class LocationTableModel(QAbstractTableModel):
+    """Table model over the location records.
+    
+    Display text and sort keys are computed once per record, so the view only
+    asks for the rows it paints. set_locations diffs by location_keys and emits
+    row-level signals instead of resetting the whole table.
+    """
+    HEADERS = ('Location', 'Region', 'Rating', 'Status')
+    SORT_ROLE = Qt.ItemDataRole.UserRole
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # Each row is (key, location, display texts, sort keys, snapshot)
+        self._rows = []
+        self._row_by_key = {}
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+    
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS[section]
+        return None
+    
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return row[2][index.column()]
+        if role == self.SORT_ROLE:
+            return row[3][index.column()]
+        return None
+    
+    def location_at(self, row):
+        return self._rows[row][1]
+    
+    def row_for_key(self, key):
+        return self._row_by_key.get(key)
+    
+    def set_locations(self, locations):
+        """Replace the records, signalling only the rows that changed"""
+        new_rows = {}
+        for key, location in zip(location_keys(locations), locations):
+            new_rows[key] = self._make_row(key, location)
+        
+        if not any(key in new_rows for key in self._row_by_key):
+            # Nothing in common, e.g. another destination was selected
+            self.beginResetModel()
+            self._rows = list(new_rows.values())
+            self.endResetModel()
+            self._reindex()
+            return
+        
+        for row in range(len(self._rows) - 1, -1, -1):
+            if self._rows[row][0] not in new_rows:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self._rows[row]
+                self.endRemoveRows()
+        self._reindex()
+        
+        last_column = len(self.HEADERS) - 1
+        for row, existing in enumerate(self._rows):
+            updated = new_rows.pop(existing[0])
+            self._rows[row] = updated
+            if updated[4] != existing[4]:
+                self.dataChanged.emit(self.index(row, 0), self.index(row, last_column))
+        
+        if new_rows:
+            first = len(self._rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(new_rows) - 1)
+            self._rows.extend(new_rows.values())
+            self.endInsertRows()
+            self._reindex()
+    
+    def _reindex(self):
+        self._row_by_key = {row[0]: index for index, row in enumerate(self._rows)}
+    
+    @staticmethod
+    def _make_row(key, location):
+        # Rating - with better handling of None values
+        rating = location.get('rating')
+        rating_value = -1.0
+        if rating is not None:
+            try:
+                rating_value = float(rating)
+                rating_text = f"★ {rating_value:.1f}"
+                if location.get('user_ratings_total'):
+                    rating_text += f" ({location['user_ratings_total']} reviews)"
+            except (ValueError, TypeError):
+                rating_text = "Invalid rating"
+        else:
+            rating_text = "No ratings"
+        
+        # Status - with better handling of None values
+        status = location.get('business_status')
+        status_text = status.title() if status else 'N/A'
+        
+        name = location.get('name', '')
+        region = location.get('region', '')
+        display = (name, region, rating_text, status_text)
+        sort_keys = (name.lower(), region.lower(), rating_value, status_text.lower())
+        return key, location, display, sort_keys, json.dumps(location, sort_keys=True)
+
+# Applied once to the scores tab; the pooled widgets pick it up by object name
+SCORES_STYLESHEET = """
+    QGroupBox#scoreCategory {
+        color: #ffffff;
+        border: 1px solid #444444;
+        border-radius: 4px;
+        margin-top: 12px;
+        padding: 15px;
+    }
+    QGroupBox#scoreCategory::title {
+        color: #4fc3f7;
+        subcontrol-origin: margin;
+        left: 10px;
+    }
+    QLabel#scoreOverall {
+        color: #4fc3f7;
+        margin-bottom: 10px;
+    }
+    QLabel#scoreNotes {
+        color: #ffffff;
+        margin-top: 10px;
+    }
+    QLabel#noScores {
+        color: #ffffff;
+        padding: 20px;
+    }
+    QTableWidget#scoreTable {
+        background-color: #2c2c2c;
+        color: #ffffff;
+        gridline-color: #444444;
+        border: none;
+    }
+    QTableWidget#scoreTable::item {
+        padding: 5px;
+    }
+    QTableWidget#scoreTable QHeaderView::section {
+        background-color: #1e1e1e;
+        color: #ffffff;
+        padding: 5px;
+        border: 1px solid #444444;
+    }
+"""
+
+class ScoreCategoryWidget(QGroupBox):
+    """One detailed score category, refilled in place when the scores change"""
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setObjectName('scoreCategory')
+        layout = QVBoxLayout(self)
+        
+        self.overall_label = QLabel()
+        self.overall_label.setObjectName('scoreOverall')
+        layout.addWidget(self.overall_label)
+        
+        self.subcategories_table = QTableWidget(0, 3)
+        self.subcategories_table.setObjectName('scoreTable')
+        self.subcategories_table.setHorizontalHeaderLabels(['Subcategory', 'Score', 'Description'])
+        self.subcategories_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.subcategories_table)
+        
+        self.notes_label = QLabel()
+        self.notes_label.setObjectName('scoreNotes')
+        self.notes_label.setWordWrap(True)
+        layout.addWidget(self.notes_label)
+    
+    def set_category(self, category, data):
+        self.setTitle(category.replace('_', ' ').title())
+        self.overall_label.setText(f"Overall Score: {data.get('overall_score', 0)}/10")
+        
+        subcategories = list(data['subcategories'].items())
+        table = self.subcategories_table
+        table.setRowCount(len(subcategories))
+        for row, (subcat, subdata) in enumerate(subcategories):
+            texts = (
+                subcat.replace('_', ' ').title(),
+                f"{subdata.get('score', 0)}/10",
+                subdata.get('description', '')
+            )
+            for column, text in enumerate(texts):
+                item = table.item(row, column)
+                if item is None:
+                    table.setItem(row, column, QTableWidgetItem(text))
+                elif item.text() != text:
+                    item.setText(text)
+        
+        self.notes_label.setText(f"Notes: {data['notes']}" if 'notes' in data else "")
+        self.notes_label.setVisible('notes' in data)
+
+class MapHandler(QObject):
+    """Bridge object exposed to the map page over the WebChannel"""
+    locationsUpdated = pyqtSignal(str)
+
+    @pyqtSlot()
+    def mapReady(self):
+        self.parent().on_map_ready()
+
+    @pyqtSlot(str)
+    def handleMarkerClick(self, key):
+        try:
+            self.parent().select_location(key)
+        except Exception as e:
+            logger.error(f"Error handling marker click: {e}")
+
+    @pyqtSlot(str)
+    def handleStreetViewEvent(self, event_data):
+        try:
+            event = json.loads(event_data)
+            logger.info(f"Street View Event: {event['event']}")
+            logger.debug(f"Event Details: {event['details']}")
+        except Exception as e:
+            logger.error(f"Error handling street view event: {e}")
+
+    @pyqtSlot(str)
+    def handleError(self, error_data):
+        logger.error(f"JavaScript error: {error_data}")
+
 class LocationViewer(QMainWindow):
-    def __init__(self):
+    def __init__(self, data_dir: str = None):
         super().__init__()
         self.setWindowTitle("Travel Location Viewer")
         self.setGeometry(100, 100, 1000, 1200)
         
         # Initialize data storage and paths
         self.app_dir = os.path.dirname(os.path.abspath(__file__))
-        self.data_dir = os.path.join(self.app_dir, 'data')
+        self.data_dir = data_dir or os.path.join(self.app_dir, 'data')
         os.makedirs(self.data_dir, exist_ok=True)
         logger.debug(f"Initialized data directory at: {self.data_dir}")
+        self.store = DataStore(self.data_dir)
         
         # Initialize data storage
         self.data = {}
         self.current_country = None
         
+        # Background generation jobs as (thread, worker) pairs
+        self.background_jobs = []
+        
+        # Created on first use, see the location_generator property
+        self._location_generator = None
+        self._location_generator_lock = threading.Lock()
+        
+        # Map page state; markers are updated incrementally once it has loaded.
+        # The web view itself is built after the window is first shown.
+        self.web_view = None
+        self.photo_handler = None
+        self.map_view_pending = False
+        self.map_loaded = False
+        self.map_ready = False
+        self.map_locations = {}
+        
         # Create main widget and layout
         main_widget = QWidget()
         self.setCentralWidget(main_widget)
@@ -111,9 +406,20 @@ class LocationViewer(QMainWindow):
                 'recommended_locations': []
             }
             self.update_display()
+    
+    @property
+    def location_generator(self):
+        """The LocationGenerator, created the first time it is needed.
         
-        # Add LocationGenerator instance
-        self.location_generator = LocationGenerator()
+        Building it imports and connects the provider clients, which the window
+        does not need until a generation job starts or the map asks for a photo.
+        Photo requests arrive on worker threads, hence the lock.
+        """
+        with self._location_generator_lock:
+            if self._location_generator is None:
+                from utils import LocationGenerator
+                self._location_generator = LocationGenerator()
+            return self._location_generator
         
     def create_ui(self, layout):
         """Create all UI elements"""
@@ -154,22 +460,12 @@ class LocationViewer(QMainWindow):
         map_container_layout.setContentsMargins(0, 0, 0, 0)
         map_container_layout.setSpacing(0)
         
-        self.web_view = QWebEngineView()
-        self.web_view.setPage(CustomWebEnginePage(self.web_view))
-        self.web_view.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
-        
-        # Initialize WebEngine settings
-        try:
-            settings = self.web_view.page().settings()
-            settings.setAttribute(QWebEngineSettings.WebAttribute.LocalContentCanAccessRemoteUrls, True)
-            settings.setAttribute(QWebEngineSettings.WebAttribute.LocalContentCanAccessFileUrls, True)
-            settings.setAttribute(QWebEngineSettings.WebAttribute.ScrollAnimatorEnabled, True)
-            settings.setAttribute(QWebEngineSettings.WebAttribute.ShowScrollBars, True)
-            logger.info("WebEngine settings initialized successfully")
-        except Exception as e:
-            logger.error(f"Failed to initialize WebEngine settings: {e}")
-        
-        map_container_layout.addWidget(self.web_view)
+        # Stands in for the web view until create_map_view replaces it
+        self.map_container_layout = map_container_layout
+        self.map_placeholder = QLabel("Loading map...")
+        self.map_placeholder.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.map_placeholder.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        map_container_layout.addWidget(self.map_placeholder)
         map_layout.addWidget(map_container)
         
         # Data section
@@ -267,13 +563,34 @@ class LocationViewer(QMainWindow):
         # Split view for locations
         locations_splitter = QSplitter(Qt.Orientation.Vertical)
         
-        # Locations table
-        self.locations_table = QTableWidget()
-        self.locations_table.setColumnCount(4)
-        self.locations_table.setHorizontalHeaderLabels(['Location', 'Region', 'Rating', 'Status'])
-        self.locations_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
-        self.locations_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
-        self.locations_table.itemClicked.connect(self.on_location_selected)
+        # Locations table; a proxy handles sorting and filtering over the model
+        self.locations_filter = QLineEdit()
+        self.locations_filter.setPlaceholderText("Filter locations...")
+        self.locations_filter.setClearButtonEnabled(True)
+        
+        self.locations_model = LocationTableModel(self)
+        self.locations_proxy = QSortFilterProxyModel(self)
+        self.locations_proxy.setSourceModel(self.locations_model)
+        self.locations_proxy.setSortRole(LocationTableModel.SORT_ROLE)
+        self.locations_proxy.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.locations_proxy.setFilterKeyColumn(-1)
+        self.locations_filter.textChanged.connect(self.locations_proxy.setFilterFixedString)
+        
+        self.locations_table = QTableView()
+        self.locations_table.setModel(self.locations_proxy)
+        self.locations_table.setSortingEnabled(True)
+        self.locations_table.sortByColumn(-1, Qt.SortOrder.AscendingOrder)
+        # Fixed widths instead of ResizeToContents, which measures every cell
+        header = self.locations_table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        header.setStretchLastSection(True)
+        header.resizeSection(0, 220)
+        header.resizeSection(1, 160)
+        header.resizeSection(2, 160)
+        self.locations_table.verticalHeader().setVisible(False)
+        self.locations_table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.locations_table.setSelectionMode(QTableView.SelectionMode.SingleSelection)
+        self.locations_table.clicked.connect(self.on_location_selected)
         
         # Location details panel
         details_widget = QWidget()
@@ -293,8 +610,14 @@ class LocationViewer(QMainWindow):
         
         details_layout.addWidget(self.location_detail_panel)
         
+        table_widget = QWidget()
+        table_layout = QVBoxLayout(table_widget)
+        table_layout.setContentsMargins(0, 0, 0, 0)
+        table_layout.addWidget(self.locations_filter)
+        table_layout.addWidget(self.locations_table)
+        
         # Add widgets to splitter
-        locations_splitter.addWidget(self.locations_table)
+        locations_splitter.addWidget(table_widget)
         locations_splitter.addWidget(details_widget)
         locations_splitter.setSizes([300, 200])
         
@@ -319,33 +642,10 @@ class LocationViewer(QMainWindow):
         layout.addWidget(main_splitter)
         
     def populate_country_selector(self):
-        """Scan data directory for country files and populate selector"""
-        data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
-        
-        # Create data directory if it doesn't exist
-        if not os.path.exists(data_dir):
-            os.makedirs(data_dir)
-        
-        # Get list of country files
-        country_files = set()  # Use set to avoid duplicates
-        
-        if os.path.exists(data_dir):
-            for file in os.listdir(data_dir):
-                if file.startswith('country') and file.endswith('.json'):
-                    # Extract country name from filename
-                    country_name = file[7:-5]  # Remove 'country' prefix and '.json' suffix
-                    if country_name.startswith('_') or country_name.startswith('-'):
-                        country_name = country_name[1:]  # Remove the separator
-                    
-                    # Clean up the name
-                    country_name = country_name.replace('_', ' ').replace('-', ' ').strip()
-                    
-                    # Don't add template files
-                    if 'template' not in country_name.lower():
-                        country_files.add(country_name.title())
-        
-        # Sort countries alphabetically
-        country_files = sorted(list(country_files))
+        """Populate the selector from the data store index"""
+        # Only rescans data/ when the directory has changed since the last sync
+        self.store.refresh()
+        country_files = self.store.list_names()
         
         # Add to selector
         self.country_selector.clear()
@@ -357,72 +657,10 @@ class LocationViewer(QMainWindow):
         if not country_name:
             return
         
-        data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
-        
-        # Convert display name to file name format (handle multi-part names)
-        file_name_base = country_name.lower().strip()
-        
-        # Try different possible filename formats
-        possible_country_filenames = [
-            f"country_{file_name_base.replace(' ', '_')}.json",
-            f"country-{file_name_base.replace(' ', '-')}.json",
-            f"country_{file_name_base.replace(' ', '-')}.json",
-            f"country-{file_name_base.replace(' ', '_')}.json"
-        ]
-        
-        possible_location_filenames = [
-            f"locations_{file_name_base.replace(' ', '_')}.json",
-            f"locations-{file_name_base.replace(' ', '-')}.json",
-            f"locations_{file_name_base.replace(' ', '-')}.json",
-            f"locations-{file_name_base.replace(' ', '_')}.json"
-        ]
-        
-        possible_ratings_filenames = [
-            f"ratings_{file_name_base.replace(' ', '_')}.json",
-            f"ratings-{file_name_base.replace(' ', '-')}.json",
-            f"ratings_{file_name_base.replace(' ', '-')}.json",
-            f"ratings-{file_name_base.replace(' ', '_')}.json"
-        ]
-        
-        country_data = None
-        locations_data = None
-        ratings_data = None
-        
-        # Try to find country data file
-        for filename in possible_country_filenames:
-            file_path = os.path.join(data_dir, filename)
-            if os.path.exists(file_path):
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        country_data = json.load(f)
-                        print(f"Found country data: {filename}")
-                        break
-                except json.JSONDecodeError as e:
-                    print(f"Error parsing {filename}: {e}")
-        
-        # Try to find locations data file
-        for filename in possible_location_filenames:
-            file_path = os.path.join(data_dir, filename)
-            if os.path.exists(file_path):
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        locations_data = json.load(f)
-                        print(f"Found locations data: {filename}")
-                        break
-                except json.JSONDecodeError as e:
-                    print(f"Error parsing {filename}: {e}")
-        
-        # Try to find ratings data file
-        for filename in possible_ratings_filenames:
-            file_path = os.path.join(data_dir, filename)
-            if os.path.exists(file_path):
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        ratings_data = json.load(f)
-                        print(f"Found ratings data: {filename}")
-                        break
-                except json.JSONDecodeError as e:
-                    print(f"Error parsing {filename}: {e}")
+        records = self.store.load(country_name)
+        country_data = records.get('country')
+        locations_data = records.get('locations')
+        ratings_data = records.get('ratings')
         
         if country_data and locations_data:
             # Combine data
@@ -436,7 +674,7 @@ class LocationViewer(QMainWindow):
             
             # Update display
             self.update_display()
-            self.create_map()
+            self.update_map()
         else:
             error_message = []
             if not country_data:
@@ -445,9 +683,6 @@ class LocationViewer(QMainWindow):
                 error_message.append(f"Locations data file not found for {country_name}")
             
             print("Error loading data:", ", ".join(error_message))
-            print("Tried country files:", possible_country_filenames)
-            print("Tried location files:", possible_location_filenames)
-            print("Tried ratings files:", possible_ratings_filenames)
             
             self.data = {
                 'scores': {},
@@ -530,62 +765,15 @@ class LocationViewer(QMainWindow):
 
     def update_locations(self):
         """Update the locations table with all locations"""
-        self.locations_table.setRowCount(0)
-        
-        if not self.data.get('recommended_locations'):
-            return
-        
-        for location in self.data['recommended_locations']:
-            row = self.locations_table.rowCount()
-            self.locations_table.insertRow(row)
-            
-            # Location name
-            name_item = QTableWidgetItem(location['name'])
-            
-            # Region
-            region_item = QTableWidgetItem(location['region'])
-            
-            # Rating - with better handling of None values
-            rating = location.get('rating')
-            if rating is not None:
-                try:
-                    rating_text = f"★ {float(rating):.1f}"
-                    if location.get('user_ratings_total'):
-                        rating_text += f" ({location['user_ratings_total']} reviews)"
-                except (ValueError, TypeError):
-                    rating_text = "Invalid rating"
-            else:
-                rating_text = "No ratings"
-            rating_item = QTableWidgetItem(rating_text)
-            
-            # Status - with better handling of None values
-            status = location.get('business_status')
-            if status:
-                status_text = status.title()
-            else:
-                status_text = 'N/A'
-            status_item = QTableWidgetItem(status_text)
-            
-            # Set items
-            self.locations_table.setItem(row, 0, name_item)
-            self.locations_table.setItem(row, 1, region_item)
-            self.locations_table.setItem(row, 2, rating_item)
-            self.locations_table.setItem(row, 3, status_item)
-            
-        self.locations_table.resizeColumnsToContents()
+        self.locations_model.set_locations(self.data.get('recommended_locations', []))
 
-    def on_location_selected(self, item):
+    def on_location_selected(self, index):
         """Handle location selection and update detail panel"""
-        row = item.row()
-        location_name = self.locations_table.item(row, 0).text()
-        
-        # Find the selected location data
-        location = next(
-            (loc for loc in self.data['recommended_locations'] 
-             if loc['name'] == location_name), 
-            None
-        )
-        
+        row = self.locations_proxy.mapToSource(index).row()
+        self.show_location_in_panel(self.locations_model.location_at(row))
+
+    def show_location_in_panel(self, location):
+        """Render a location's details in the panel below the table"""
         if location:
             # Create HTML content for location details
             html_content = f"""
@@ -616,10 +804,30 @@ class LocationViewer(QMainWindow):
                         Lat: {location['coords']['lat']}<br>
                         Lng: {location['coords']['lng']}
                     </div>
+                    {self.location_ratings_html(location.get('ratings'))}
                 </div>
             """
             self.location_detail_panel.setHtml(html_content)
 
+    def location_ratings_html(self, ratings):
+        """Overall score per category from a location's detailed ratings"""
+        if not ratings or not isinstance(ratings.get('scores'), dict):
+            return ""
+        rows = "".join(
+            f"<tr><td>{category.replace('_', ' ').title()}</td>"
+            f"<td style='padding-left: 10px;'>{data.get('overall_score', 'N/A')}/10</td></tr>"
+            for category, data in ratings['scores'].items() if isinstance(data, dict)
+        )
+        summary = ratings.get('summary') or {}
+        notes = summary.get('overall_notes', '')
+        return f"""
+            <div style='margin: 10px 0;'>
+                <strong>Detailed Ratings:</strong> {summary.get('total_score', 'N/A')}
+                <table style='margin-top: 5px;'>{rows}</table>
+                <p>{notes}</p>
+            </div>
+        """
+
     def change_view(self, view_name):
         if view_name == "Overview":
             self.main_display.setCurrentIndex(0)
@@ -628,30 +836,17 @@ class LocationViewer(QMainWindow):
         else:
             self.main_display.setCurrentIndex(2)
             
-    def show_location_details(self, location):
-        """Update the location details panel with the selected location"""
-        # Update locations table
-        self.locations_table.clearContents()
-        self.locations_table.setRowCount(1)
-        
-        # Set location data in table
-        self.locations_table.setItem(0, 0, QTableWidgetItem(location['name']))
-        self.locations_table.setItem(0, 1, QTableWidgetItem(location['region']))
-        self.locations_table.setItem(0, 2, QTableWidgetItem(str(location.get('score', 'N/A'))))
-        
-        # Update detail panel
-        detail_text = f"""
-        <div style="padding: 10px;">
-            <h2 style="color: #2c3e50;">{location['name']}</h2>
-            <p><strong>Region:</strong> {location['region']}</p>
-            <p><strong>Score:</strong> {location.get('score', 'N/A')}</p>
-            <div style="margin-top: 15px;">
-                <h3 style="color: #34495e;">Description</h3>
-                <p>{location['brief']}</p>
-            </div>
-        </div>
-        """
-        self.detail_panel.setHtml(detail_text)
+    def select_location(self, key):
+        """Select a location clicked on the map and show its details"""
+        row = self.locations_model.row_for_key(key)
+        if row is None:
+            logger.warning(f"Clicked location {key} is not in the table")
+            return
+        index = self.locations_proxy.mapFromSource(self.locations_model.index(row, 0))
+        if index.isValid():
+            self.locations_table.selectRow(index.row())
+            self.locations_table.scrollTo(index)
+        self.show_location_in_panel(self.locations_model.location_at(row))
         
     def create_map(self):
         html_content = f"""
@@ -727,7 +922,6 @@ class LocationViewer(QMainWindow):
             <script>
                 let map;
                 let panorama;
-                let markers = [];
                 let activeInfoWindow = null;
                 let channel;
 
@@ -758,6 +952,300 @@ class LocationViewer(QMainWindow):
                     }}
                 }}
 
+                function createInfoWindowContent(location) {{
+                    const ratingStars = '★'.repeat(Math.round(location.rating || 0)) + 
+                                      '☆'.repeat(5 - Math.round(location.rating || 0));
+                    
+                    const statusClass = location.business_status === 'OPERATIONAL' ? 
+                        'status-operational' : 'status-closed';
+                    
+                    const statusText = location.business_status === 'OPERATIONAL' ? 
+                        'Open' : 'Closed';
+
+                    let content = '<div class="info-window">';
+                    
+                    // Add photo if available
+                    if (location.photo_url) {{
+                        content += '<img src="' + location.photo_url + '" alt="' + location.name + '">';
+                    }}
+                    
+                    // Add name
+                    content += '<h3>' + location.name + '</h3>';
+                    
+                    // Add rating if available
+                    if (location.rating) {{
+                        content += '<div class="rating">' + 
+                                  ratingStars + ' (' + (location.user_ratings_total || 0) + ' reviews)' +
+                                  '</div>';
+                    }}
+                    
+                    // Add business status if available
+                    if (location.business_status) {{
+                        content += '<div class="business-status ' + statusClass + '">' +
+                                  statusText +
+                                  '</div>';
+                    }}
+                    
+                    // Add description and address
+                    content += '<p>' + location.brief + '</p>' +
+                               '<p><small>' + location.formatted_address + '</small></p>';
+                    
+                    // Add Street View button
+                    content += '<button onclick="showStreetView(' + 
+                               location.coords.lat + ', ' + 
+                               location.coords.lng + ')" ' +
+                               'style="background: #1B4F72; color: white; border: none; ' +
+                               'padding: 5px 10px; border-radius: 3px; cursor: pointer;">' +
+                               'Show Street View' +
+                               '</button>';
+                    
+                    content += '</div>';
+                    
+                    return content;
+                }}
+
+                // Location data, its spatial index and the markers currently on the map
+                let locationsByKey = {{}};
+                const INDEX_CELL_DEGREES = 0.5;
+                let spatialIndex = {{}};
+                let renderedMarkers = {{}};
+                const CLUSTER_CELL_PX = 60;
+                const CLUSTER_MAX_ZOOM = 15;
+
+                function indexCell(lat, lng) {{
+                    return Math.floor(lat / INDEX_CELL_DEGREES) + ':' + Math.floor(lng / INDEX_CELL_DEGREES);
+                }}
+
+                function indexAdd(key, location) {{
+                    const cell = indexCell(location.coords.lat, location.coords.lng);
+                    (spatialIndex[cell] = spatialIndex[cell] || new Set()).add(key);
+                }}
+
+                function indexRemove(key, location) {{
+                    const cell = indexCell(location.coords.lat, location.coords.lng);
+                    if (spatialIndex[cell]) {{
+                        spatialIndex[cell].delete(key);
+                        if (spatialIndex[cell].size === 0) {{
+                            delete spatialIndex[cell];
+                        }}
+                    }}
+                }}
+
+                // Keys of the locations inside the given bounds
+                function queryIndex(bounds) {{
+                    const keys = [];
+                    const sw = bounds.getSouthWest();
+                    const ne = bounds.getNorthEast();
+                    const minRow = Math.floor(sw.lat() / INDEX_CELL_DEGREES);
+                    const maxRow = Math.floor(ne.lat() / INDEX_CELL_DEGREES);
+                    let minCol = Math.floor(sw.lng() / INDEX_CELL_DEGREES);
+                    let maxCol = Math.floor(ne.lng() / INDEX_CELL_DEGREES);
+                    const wrapsAntimeridian = minCol > maxCol;
+                    const cellCount = (maxRow - minRow + 1) *
+                        (wrapsAntimeridian ? (360 / INDEX_CELL_DEGREES) : (maxCol - minCol + 1));
+
+                    // Zoomed far out it is cheaper to filter the occupied cells
+                    if (wrapsAntimeridian || cellCount > Object.keys(spatialIndex).length) {{
+                        for (const cell in spatialIndex) {{
+                            for (const key of spatialIndex[cell]) {{
+                                const location = locationsByKey[key];
+                                if (bounds.contains(location.coords)) {{
+                                    keys.push(key);
+                                }}
+                            }}
+                        }}
+                        return keys;
+                    }}
+
+                    for (let row = minRow; row <= maxRow; row++) {{
+                        for (let col = minCol; col <= maxCol; col++) {{
+                            const cellKeys = spatialIndex[row + ':' + col];
+                            if (cellKeys) {{
+                                keys.push(...cellKeys);
+                            }}
+                        }}
+                    }}
+                    return keys;
+                }}
+
+                // Group visible locations by screen-space grid cell at the current zoom
+                function buildClusters(keys) {{
+                    const zoom = map.getZoom();
+                    const projection = map.getProjection();
+                    if (zoom >= CLUSTER_MAX_ZOOM || !projection) {{
+                        return keys.map(key => ({{ id: key, keys: [key] }}));
+                    }}
+                    const scale = Math.pow(2, zoom);
+                    const cells = {{}};
+                    for (const key of keys) {{
+                        const location = locationsByKey[key];
+                        const point = projection.fromLatLngToPoint(
+                            new google.maps.LatLng(location.coords.lat, location.coords.lng)
+                        );
+                        const cell = Math.floor(point.x * scale / CLUSTER_CELL_PX) + ':' +
+                                     Math.floor(point.y * scale / CLUSTER_CELL_PX);
+                        (cells[cell] = cells[cell] || []).push(key);
+                    }}
+                    return Object.entries(cells).map(([cell, cellKeys]) =>
+                        cellKeys.length === 1 ?
+                            {{ id: cellKeys[0], keys: cellKeys }} :
+                            {{ id: 'cluster:' + zoom + ':' + cell, keys: cellKeys }}
+                    );
+                }}
+
+                function createClusterMarker(keys) {{
+                    const bounds = new google.maps.LatLngBounds();
+                    for (const key of keys) {{
+                        bounds.extend(locationsByKey[key].coords);
+                    }}
+                    const marker = new google.maps.Marker({{
+                        position: bounds.getCenter(),
+                        map: map,
+                        icon: {{
+                            path: google.maps.SymbolPath.CIRCLE,
+                            scale: Math.min(30, 12 + Math.log2(keys.length) * 3),
+                            fillColor: '#1B4F72',
+                            fillOpacity: 0.85,
+                            strokeColor: '#ffffff',
+                            strokeWeight: 2
+                        }},
+                        label: {{
+                            text: String(keys.length),
+                            color: '#ffffff',
+                            fontSize: '12px',
+                            fontWeight: 'bold'
+                        }},
+                        zIndex: 1000 + keys.length
+                    }});
+                    marker.addListener('click', () => map.fitBounds(bounds));
+                    return marker;
+                }}
+
+                // Draw only what is in view, reusing markers that are still visible
+                function renderVisible() {{
+                    if (!map || !map.getBounds()) {{
+                        return;
+                    }}
+                    const clusters = buildClusters(queryIndex(map.getBounds()));
+                    const animate = Object.keys(locationsByKey).length <= 50;
+                    const nextMarkers = {{}};
+                    for (const cluster of clusters) {{
+                        if (renderedMarkers[cluster.id]) {{
+                            nextMarkers[cluster.id] = renderedMarkers[cluster.id];
+                            delete renderedMarkers[cluster.id];
+                        }} else if (cluster.keys.length === 1) {{
+                            nextMarkers[cluster.id] = createMarker(cluster.id, animate);
+                        }} else {{
+                            nextMarkers[cluster.id] = createClusterMarker(cluster.keys);
+                        }}
+                    }}
+                    for (const id in renderedMarkers) {{
+                        renderedMarkers[id].setMap(null);
+                    }}
+                    renderedMarkers = nextMarkers;
+                }}
+
+                function createMarker(key, animate) {{
+                    const location = locationsByKey[key];
+                    const position = {{ 
+                        lat: location.coords.lat, 
+                        lng: location.coords.lng 
+                    }};
+                    
+                    const marker = new google.maps.Marker({{
+                        position: position,
+                        map: map,
+                        title: location.name,
+                        label: {{
+                            text: location.name,
+                            className: 'marker-label',
+                            fontSize: '12px',
+                            fontWeight: 'bold'
+                        }},
+                        animation: animate ? google.maps.Animation.DROP : null
+                    }});
+
+                    // Info window content is only built when the marker is opened
+                    marker.addListener('click', () => {{
+                        if (activeInfoWindow) {{
+                            activeInfoWindow.close();
+                        }}
+
+                        const infoWindow = new google.maps.InfoWindow({{
+                            content: createInfoWindowContent(location)
+                        }});
+                        
+                        infoWindow.open({{
+                            anchor: marker,
+                            map
+                        }});
+                        
+                        activeInfoWindow = infoWindow;
+
+                        if (channel && channel.objects.handler) {{
+                            channel.objects.handler.handleMarkerClick(key);
+                        }}
+                    }});
+
+                    return marker;
+                }}
+
+                function forgetLocation(key) {{
+                    const location = locationsByKey[key];
+                    if (location) {{
+                        indexRemove(key, location);
+                        delete locationsByKey[key];
+                    }}
+                    if (renderedMarkers[key]) {{
+                        renderedMarkers[key].setMap(null);
+                        delete renderedMarkers[key];
+                    }}
+                }}
+
+                // Apply a {{remove, upsert, fit}} diff pushed from Python
+                function applyLocationDiff(payload) {{
+                    try {{
+                        const diff = JSON.parse(payload);
+                        
+                        if (activeInfoWindow && diff.remove.length > 0) {{
+                            activeInfoWindow.close();
+                            activeInfoWindow = null;
+                        }}
+                        
+                        for (const key of diff.remove) {{
+                            forgetLocation(key);
+                        }}
+                        for (const item of diff.upsert) {{
+                            forgetLocation(item.key);
+                            locationsByKey[item.key] = item.location;
+                            indexAdd(item.key, item.location);
+                        }}
+                        
+                        // Cluster membership may have changed, so rebuild those markers
+                        for (const id in renderedMarkers) {{
+                            if (id.startsWith('cluster:')) {{
+                                renderedMarkers[id].setMap(null);
+                                delete renderedMarkers[id];
+                            }}
+                        }}
+                        
+                        console.log("Applied location diff: -" + diff.remove.length + " +" + diff.upsert.length);
+
+                        // Fit map to show all locations
+                        const keys = Object.keys(locationsByKey);
+                        if (diff.fit && keys.length > 0) {{
+                            const bounds = new google.maps.LatLngBounds();
+                            for (const key of keys) {{
+                                bounds.extend(locationsByKey[key].coords);
+                            }}
+                            map.fitBounds(bounds);
+                        }}
+                        renderVisible();
+                    }} catch (error) {{
+                        console.error("Error applying location diff:", error);
+                    }}
+                }}
+
                 async function initialize() {{
                     try {{
                         console.log("Initializing map...");
@@ -794,114 +1282,8 @@ class LocationViewer(QMainWindow):
                         map.setStreetView(panorama);
                         console.log("Map and Street View initialized");
 
-                        // Add markers for locations
-                        const locations = {json.dumps(self.data.get('recommended_locations', []))};
-                        const bounds = new google.maps.LatLngBounds();
-                        
-                        console.log("Adding markers for locations:", locations);
-
-                        for (const location of locations) {{
-                            const position = {{ 
-                                lat: location.coords.lat, 
-                                lng: location.coords.lng 
-                            }};
-                            
-                            // Create marker
-                            const marker = new google.maps.Marker({{
-                                position: position,
-                                map: map,
-                                title: location.name,
-                                label: {{
-                                    text: location.name,
-                                    className: 'marker-label',
-                                    fontSize: '12px',
-                                    fontWeight: 'bold'
-                                }},
-                                animation: google.maps.Animation.DROP
-                            }});
-                            
-                            bounds.extend(position);
-                            markers.push(marker);
-
-                            function createInfoWindowContent(location) {{
-                                const ratingStars = '★'.repeat(Math.round(location.rating || 0)) + 
-                                                  '☆'.repeat(5 - Math.round(location.rating || 0));
-                                
-                                const statusClass = location.business_status === 'OPERATIONAL' ? 
-                                    'status-operational' : 'status-closed';
-                                
-                                const statusText = location.business_status === 'OPERATIONAL' ? 
-                                    'Open' : 'Closed';
-
-                                let content = '<div class="info-window">';
-                                
-                                // Add photo if available
-                                if (location.photo_url) {{
-                                    content += '<img src="' + location.photo_url + '" alt="' + location.name + '">';
-                                }}
-                                
-                                // Add name
-                                content += '<h3>' + location.name + '</h3>';
-                                
-                                // Add rating if available
-                                if (location.rating) {{
-                                    content += '<div class="rating">' + 
-                                              ratingStars + ' (' + (location.user_ratings_total || 0) + ' reviews)' +
-                                              '</div>';
-                                }}
-                                
-                                // Add business status if available
-                                if (location.business_status) {{
-                                    content += '<div class="business-status ' + statusClass + '">' +
-                                              statusText +
-                                              '</div>';
-                                }}
-                                
-                                // Add description and address
-                                content += '<p>' + location.brief + '</p>' +
-                                           '<p><small>' + location.formatted_address + '</small></p>';
-                                
-                                // Add Street View button
-                                content += '<button onclick="showStreetView(' + 
-                                           location.coords.lat + ', ' + 
-                                           location.coords.lng + ')" ' +
-                                           'style="background: #1B4F72; color: white; border: none; ' +
-                                           'padding: 5px 10px; border-radius: 3px; cursor: pointer;">' +
-                                           'Show Street View' +
-                                           '</button>';
-                                
-                                content += '</div>';
-                                
-                                return content;
-                            }}
-
-                            // Update the marker click handler
-                            marker.addListener('click', () => {{
-                                if (activeInfoWindow) {{
-                                    activeInfoWindow.close();
-                                }}
-
-                                const infoWindow = new google.maps.InfoWindow({{
-                                    content: createInfoWindowContent(location)
-                                }});
-                                
-                                infoWindow.open({{
-                                    anchor: marker,
-                                    map
-                                }});
-                                
-                                activeInfoWindow = infoWindow;
-
-                                if (channel && channel.objects.handler) {{
-                                    channel.objects.handler.handleMarkerClick(JSON.stringify(location));
-                                }}
-                            }});
-                        }}
-
-                        // Fit map to show all markers
-                        if (markers.length > 0) {{
-                            map.fitBounds(bounds);
-                        }}
+                        // Re-render the visible markers whenever the viewport settles
+                        map.addListener('idle', renderVisible);
 
                         // Add Street View visibility listener
                         panorama.addListener('visible_changed', () => {{
@@ -919,13 +1301,15 @@ class LocationViewer(QMainWindow):
                             }}
                         }});
 
-                        // ... rest of the initialize function ...
+                        // Markers arrive as diffs once Python knows the page is ready
+                        if (channel && channel.objects.handler) {{
+                            channel.objects.handler.locationsUpdated.connect(applyLocationDiff);
+                            channel.objects.handler.mapReady();
+                        }}
                     }} catch (error) {{
                         console.error("Initialization error:", error);
                     }}
                 }}
-                
-                // ... rest of the JavaScript ...
             </script>
         </body>
         </html>
@@ -935,47 +1319,141 @@ class LocationViewer(QMainWindow):
         logger.debug("Creating map with HTML content")
         
         try:
+            from PyQt6.QtWebChannel import QWebChannel
+            
             # Create map channel
             map_channel = QWebChannel(self.web_view.page())
             self.web_view.page().setWebChannel(map_channel)
             logger.debug("WebChannel created successfully")
             
-            # Add error handling to Handler class
-            class Handler(QObject):
-                @pyqtSlot(str)
-                def handleMarkerClick(self, location_data):
-                    try:
-                        self.parent().show_location_details(json.loads(location_data))
-                    except Exception as e:
-                        logger.error(f"Error handling marker click: {e}")
-
-                @pyqtSlot(str)
-                def handleStreetViewEvent(self, event_data):
-                    try:
-                        event = json.loads(event_data)
-                        logger.info(f"Street View Event: {event['event']}")
-                        logger.debug(f"Event Details: {event['details']}")
-                    except Exception as e:
-                        logger.error(f"Error handling street view event: {e}")
-
-                @pyqtSlot(str)
-                def handleError(self, error_data):
-                    logger.error(f"JavaScript error: {error_data}")
-
-            self.handler = Handler()
-            self.handler.setParent(self)
+            self.handler = MapHandler(self)
             map_channel.registerObject('handler', self.handler)
             logger.debug("Handler registered with WebChannel")
 
-            # Set the HTML content
+            # Set the HTML content; markers are pushed once the page reports ready
+            self.map_loaded = True
+            self.map_ready = False
             self.web_view.setHtml(html_content, QUrl("https://maps.googleapis.com/"))
             logger.info("Map initialized successfully")
             
         except Exception as e:
             logger.error(f"Error creating map: {e}")
 
+    def create_map_view(self):
+        """Build the WebEngine view in place of the placeholder and load the map"""
+        self.map_view_pending = False
+        if self.web_view is not None:
+            return
+        try:
+            from mapview import create_map_view
+            
+            # Photos are the first thing that needs the generator once the map is up
+            self.web_view, self.photo_handler = create_map_view(
+                lambda photo_name: self.location_generator.get_place_photo(photo_name), self
+            )
+        except Exception as e:
+            logger.error(f"Error creating map view: {e}")
+            self.map_placeholder.setText("The map could not be loaded")
+            return
+        self.map_container_layout.replaceWidget(self.map_placeholder, self.web_view)
+        self.map_placeholder.deleteLater()
+        self.map_placeholder = None
+        self.update_map()
+
+    def update_map(self):
+        """Show the current locations on the map, loading the page only once"""
+        if self.web_view is None:
+            # Deferred to the event loop so the window and its data show first
+            if not self.map_view_pending:
+                self.map_view_pending = True
+                QTimer.singleShot(0, self.create_map_view)
+        elif not self.map_loaded:
+            self.create_map()
+        elif self.map_ready:
+            self.push_map_diff()
+
+    def on_map_ready(self):
+        """Called from JavaScript once the map can accept markers"""
+        self.map_ready = True
+        # A freshly loaded page has no markers, whatever was sent before
+        self.map_locations = {}
+        self.push_map_diff()
+
+    def push_map_diff(self, locations=None):
+        """Send only the markers that changed since the last update.
+        
+        locations defaults to the loaded data; generation passes the locations
+        streamed so far to preview them before the files are saved.
+        """
+        if locations is None:
+            locations = self.data.get('recommended_locations', [])
+        from mapview import photo_url
+        
+        new_locations = dict(zip(location_keys(locations), locations))
+        
+        removed = [key for key in self.map_locations if key not in new_locations]
+        upserted = []
+        new_snapshot = {}
+        for key, location in new_locations.items():
+            snapshot = json.dumps(location, sort_keys=True)
+            new_snapshot[key] = snapshot
+            if self.map_locations.get(key) != snapshot:
+                # Photos are served through the local scheme; never send a keyed media URL.
+                # Detailed ratings are only shown in the panel, so they stay out of the page.
+                marker = {field: value for field, value in location.items() if field != 'ratings'}
+                upserted.append({'key': key, 'location': {**marker, 'photo_url': photo_url(location)}})
+        
+        self.map_locations = new_snapshot
+        if removed or upserted:
+            logger.debug(f"Pushing map diff: {len(removed)} removed, {len(upserted)} added or changed")
+            self.handler.locationsUpdated.emit(json.dumps({
+                'remove': removed,
+                'upsert': upserted,
+                'fit': True
+            }))
+
+    def run_in_background(self, job, on_finished, on_failed, on_progress=None, on_cancelled=None):
+        """Run a generation job on a worker thread, delivering its signals on the GUI thread"""
+        thread = QThread(self)
+        worker = GenerationWorker(job)
+        worker.moveToThread(thread)
+        
+        thread.started.connect(worker.run)
+        if on_progress:
+            worker.progress.connect(on_progress)
+        worker.finished.connect(on_finished)
+        worker.failed.connect(on_failed)
+        if on_cancelled:
+            worker.cancelled.connect(on_cancelled)
+        
+        # Tear the thread down once the job is over, whatever the outcome
+        job_entry = (thread, worker)
+        worker.done.connect(thread.quit)
+        thread.finished.connect(worker.deleteLater)
+        thread.finished.connect(thread.deleteLater)
+        thread.finished.connect(lambda: self.background_jobs.remove(job_entry))
+        
+        self.background_jobs.append(job_entry)
+        self.location_generator.reset_cancel()
+        thread.start()
+
+    def closeEvent(self, event):
+        """Cancel running jobs and wait for their threads before closing"""
+        if self.background_jobs:
+            self.location_generator.cancel()
+            for thread, _ in list(self.background_jobs):
+                thread.quit()
+                thread.wait(5000)
+        if self.photo_handler:
+            self.photo_handler.shutdown()
+        super().closeEvent(event)
+
     def show_generate_dialog(self):
         """Show the generate locations dialog"""
+        if self.background_jobs:
+            QMessageBox.information(self, "Busy", "A generation job is already running.")
+            return
+        
         dialog = GenerateLocationsDialog(self)
         if dialog.exec() == QDialog.DialogCode.Accepted:
             values = dialog.get_values()
@@ -998,42 +1476,60 @@ class LocationViewer(QMainWindow):
             progress.setWindowTitle("Generating Locations")
             progress.setMinimumWidth(400)  # Make dialog wider for better readability
             progress.setWindowModality(Qt.WindowModality.WindowModal)
+            progress.canceled.connect(self.location_generator.cancel)
             progress.show()
             
-            try:
-                # Generate locations with callback for progress updates
-                def progress_callback(stage, data=None):
-                    if stage == "country_data":
-                        # Format the country data nicely for display
-                        summary = data.get('summary', {})
-                        strengths = "\n• " + "\n• ".join(summary.get('strengths', []))
-                        weaknesses = "\n• " + "\n• ".join(summary.get('weaknesses', []))
-                        
-                        progress_text = (
-                            f"Analysis of {values['location']} complete!\n\n"
-                            f"Overall Score: {summary.get('total_score', 'N/A')}\n\n"
-                            f"Key Strengths:{strengths}\n\n"
-                            f"Areas to Consider:{weaknesses}\n\n"
-                            f"Step 2: Finding specific locations..."
-                        )
-                        progress.setLabelText(progress_text)
-                    elif stage == "locations_data":
-                        progress.setLabelText(
-                            "Step 3: Finalizing location details...\n\n"
-                            f"Found {len(data.get('recommended_locations', []))} locations!"
-                        )
-
-                # Generate locations
-                country_file, locations_file = self.location_generator.generate_locations(
-                    values['location'],
-                    values['keyword'],
-                    values['distance'],
-                    values['results'],
-                    progress_callback  # Pass the callback
-                )
-                
-                # Close progress dialog
+            def close_progress():
+                # Closing the dialog emits canceled, which must not cancel a finished job
+                progress.canceled.disconnect()
                 progress.close()
+            
+            # Locations resolved while the response is still streaming
+            streamed_locations = []
+            
+            def restore_map():
+                if streamed_locations and self.map_ready:
+                    self.push_map_diff()
+            
+            # Progress updates arrive from the worker thread via signals
+            def on_progress(stage, data=None):
+                if stage == "location":
+                    streamed_locations.append(data)
+                    if self.map_ready:
+                        self.push_map_diff(streamed_locations)
+                    progress.setLabelText(
+                        f"Analyzing {values['location']} for {values['keyword']}...\n\n"
+                        f"Step 1: Found {len(streamed_locations)} locations so far\n"
+                        f"Latest: {data.get('name', '')}"
+                    )
+                elif stage == "country_data":
+                    # Format the country data nicely for display
+                    summary = data.get('summary', {})
+                    strengths = "\n• " + "\n• ".join(summary.get('strengths', []))
+                    weaknesses = "\n• " + "\n• ".join(summary.get('weaknesses', []))
+                    
+                    progress_text = (
+                        f"Analysis of {values['location']} complete!\n\n"
+                        f"Overall Score: {summary.get('total_score', 'N/A')}\n\n"
+                        f"Key Strengths:{strengths}\n\n"
+                        f"Areas to Consider:{weaknesses}\n\n"
+                        f"Step 2: Finding specific locations..."
+                    )
+                    progress.setLabelText(progress_text)
+                elif stage == "locations_data":
+                    progress.setLabelText(
+                        "Step 3: Finalizing location details...\n\n"
+                        f"Found {len(data.get('recommended_locations', []))} locations!"
+                    )
+                elif stage == "location_ratings":
+                    progress.setLabelText(
+                        "Step 3: Rating each location...\n\n"
+                        f"Rated {data['rated']} of {data['total']} locations\n"
+                        f"Latest: {data['name']}"
+                    )
+            
+            def on_finished(result):
+                close_progress()
                 
                 # Show success message
                 QMessageBox.information(
@@ -1054,18 +1550,41 @@ class LocationViewer(QMainWindow):
                     self.country_selector.setCurrentIndex(index)
                     # Force a refresh of the map and data
                     self.load_country_data(display_name)
-                
-            except Exception as e:
-                progress.close()
+                else:
+                    restore_map()
+            
+            def on_failed(message):
+                close_progress()
+                restore_map()
                 QMessageBox.critical(
                     self,
                     "Error",
-                    f"Failed to generate locations: {str(e)}"
+                    f"Failed to generate locations: {message}"
                 )
+            
+            def on_cancelled():
+                close_progress()
+                restore_map()
+                logger.info(f"Generation for {values['location']} cancelled by user")
+            
+            self.run_in_background(
+                lambda progress_callback: self.location_generator.generate_locations(
+                    values['location'],
+                    values['keyword'],
+                    values['distance'],
+                    values['results'],
+                    progress_callback
+                ),
+                on_finished,
+                on_failed,
+                on_progress=on_progress,
+                on_cancelled=on_cancelled
+            )
 
     def create_detailed_scores_tab(self):
         """Create the detailed scores tab with comprehensive rating system"""
         scores_tab = QWidget()
+        scores_tab.setStyleSheet(SCORES_STYLESHEET)
         scores_layout = QVBoxLayout(scores_tab)
         
         # Add header section with Rate button
@@ -1103,8 +1622,14 @@ class LocationViewer(QMainWindow):
         scroll_content = QWidget()
         scroll_layout = QVBoxLayout(scroll_content)
         
-        # Add content placeholder
+        # Category widgets are pooled and reused across destinations
         self.detailed_scores_content = QVBoxLayout()
+        self.no_scores_label = QLabel("No detailed ratings available. Click 'Generate Detailed Ratings' to analyze this location.")
+        self.no_scores_label.setObjectName('noScores')
+        self.no_scores_label.setWordWrap(True)
+        self.detailed_scores_content.addWidget(self.no_scores_label)
+        self.score_category_widgets = []
+        self.detailed_scores_content.addStretch()
         scroll_layout.addLayout(self.detailed_scores_content)
         
         scroll_content.setLayout(scroll_layout)
@@ -1115,186 +1640,134 @@ class LocationViewer(QMainWindow):
 
     def update_detailed_scores(self):
         """Update the detailed scores display"""
-        # Clear existing content
-        while self.detailed_scores_content.count():
-            item = self.detailed_scores_content.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-        
-        # Check if we have detailed scores
-        if not isinstance(self.data.get('scores', {}), dict):
-            no_scores_label = QLabel("No detailed ratings available. Click 'Generate Detailed Ratings' to analyze this location.")
-            no_scores_label.setStyleSheet("color: #ffffff; padding: 20px;")
-            no_scores_label.setWordWrap(True)
-            self.detailed_scores_content.addWidget(no_scores_label)
+        scores = self.data.get('scores', {})
+        categories = []
+        if isinstance(scores, dict):
+            categories = [
+                (category, data) for category, data in scores.items()
+                if isinstance(data, dict) and 'subcategories' in data
+            ]
+        
+        # Grow the pool only when a destination has more categories than seen so far
+        while len(self.score_category_widgets) < len(categories):
+            widget = ScoreCategoryWidget()
+            # After the placeholder label and existing widgets, before the stretch
+            self.detailed_scores_content.insertWidget(len(self.score_category_widgets) + 1, widget)
+            self.score_category_widgets.append(widget)
+        
+        for widget, (category, data) in zip(self.score_category_widgets, categories):
+            widget.set_category(category, data)
+            widget.show()
+        for widget in self.score_category_widgets[len(categories):]:
+            widget.hide()
+        
+        self.no_scores_label.setVisible(not categories)
+
+    def generate_ratings(self):
+        """Generate detailed ratings using Anthropic API"""
+        if not self.current_country:
+            QMessageBox.warning(self, "Error", "Please select a country first")
+            return
+        if self.background_jobs:
+            QMessageBox.information(self, "Busy", "A generation job is already running.")
             return
         
-        for category, data in self.data['scores'].items():
-            if isinstance(data, dict) and 'subcategories' in data:
-                # Create category group
-                category_group = QGroupBox(category.replace('_', ' ').title())
-                category_group.setStyleSheet("""
-                    QGroupBox {
-                        color: #ffffff;
-                        border: 1px solid #444444;
-                        border-radius: 4px;
-                        margin-top: 12px;
-                        padding: 15px;
-                    }
-                    QGroupBox::title {
-                        color: #4fc3f7;
-                        subcontrol-origin: margin;
-                        left: 10px;
-                    }
-                """)
+        country = self.current_country
+        progress = QProgressDialog(
+            "Generating detailed ratings analysis...\n\n"
+            "This may take a minute as we thoroughly analyze all aspects.",
+            "Cancel", 0, 0, self
+        )
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.canceled.connect(self.location_generator.cancel)
+        progress.show()
+        
+        def close_progress():
+            progress.canceled.disconnect()
+            progress.close()
+        
+        def on_finished(ratings):
+            close_progress()
+            try:
+                if not ratings:
+                    raise ValueError("No ratings data received from API")
                 
-                group_layout = QVBoxLayout()
+                logger.debug(f"Received ratings data: {json.dumps(ratings, indent=2)}")
                 
-                # Overall score for category - Changed to numerical display
-                overall_score = data.get('overall_score', 0)
-                overall_label = QLabel(f"Overall Score: {overall_score}/10")
-                overall_label.setStyleSheet("color: #4fc3f7; margin-bottom: 10px;")
-                group_layout.addWidget(overall_label)
+                # Save ratings to file
+                clean_name = country.lower().replace(' ', '_')
+                ratings_file = f"ratings_{clean_name}.json"
                 
-                # Add subcategories table
-                subcategories_table = QTableWidget()
-                subcategories_table.setColumnCount(3)
-                subcategories_table.setHorizontalHeaderLabels(['Subcategory', 'Score', 'Description'])
-                subcategories_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
-                subcategories_table.setStyleSheet("""
-                    QTableWidget {
-                        background-color: #2c2c2c;
-                        color: #ffffff;
-                        gridline-color: #444444;
-                        border: none;
-                    }
-                    QTableWidget::item {
-                        padding: 5px;
-                    }
-                    QHeaderView::section {
-                        background-color: #1e1e1e;
-                        color: #ffffff;
-                        padding: 5px;
-                        border: 1px solid #444444;
-                    }
-                """)
+                logger.debug(f"Saving ratings to: {ratings_file}")
                 
-                for subcat, subdata in data['subcategories'].items():
-                    row = subcategories_table.rowCount()
-                    subcategories_table.insertRow(row)
-                    
-                    name_item = QTableWidgetItem(subcat.replace('_', ' ').title())
-                    score = subdata.get('score', 0)
-                    # Changed to numerical score display
-                    score_item = QTableWidgetItem(f"{score}/10")
-                    desc_item = QTableWidgetItem(subdata.get('description', ''))
-                    
-                    subcategories_table.setItem(row, 0, name_item)
-                    subcategories_table.setItem(row, 1, score_item)
-                    subcategories_table.setItem(row, 2, desc_item)
-                
-                group_layout.addWidget(subcategories_table)
+                try:
+                    ratings_file = self.store.save(ratings_file, ratings)
+                    logger.debug(f"Successfully saved ratings to {ratings_file}")
+                except Exception as save_error:
+                    logger.error(f"Error saving ratings file: {save_error}")
+                    raise
                 
-                # Add notes if available
-                if 'notes' in data:
-                    notes_label = QLabel(f"Notes: {data['notes']}")
-                    notes_label.setWordWrap(True)
-                    notes_label.setStyleSheet("color: #ffffff; margin-top: 10px;")
-                    group_layout.addWidget(notes_label)
+                # Update the display if the user is still viewing the same country
+                if 'scores' not in ratings:
+                    raise ValueError("Ratings data missing 'scores' section")
+                if self.current_country == country:
+                    self.data['scores'] = ratings['scores']
+                    self.update_detailed_scores()
+                    logger.debug("Updated display with new ratings")
                 
-                category_group.setLayout(group_layout)
-                self.detailed_scores_content.addWidget(category_group)
-        
-        # Add stretch at the end
-        self.detailed_scores_content.addStretch()
-
-    def generate_ratings(self):
-        """Generate detailed ratings using Anthropic API"""
-        if not self.current_country:
-            QMessageBox.warning(self, "Error", "Please select a country first")
-            return
+                QMessageBox.information(
+                    self,
+                    "Success",
+                    f"Generated detailed ratings analysis for {country}"
+                )
+            except Exception as e:
+                on_failed(str(e))
         
-        progress = None
-        try:
-            progress = QProgressDialog(
-                "Generating detailed ratings analysis...\n\n"
-                "This may take a minute as we thoroughly analyze all aspects.",
-                "Cancel", 0, 0, self
-            )
-            progress.setWindowModality(Qt.WindowModality.WindowModal)
-            progress.show()
-            
-            logger.debug(f"Starting ratings generation for {self.current_country}")
-            
-            # Generate ratings using LocationGenerator
-            ratings = self.location_generator.generate_ratings(
-                self.current_country,
-                self.data.get('summary', {}).get('overall_notes', '')
-            )
-            
-            if not ratings:
-                raise ValueError("No ratings data received from API")
-            
-            logger.debug(f"Received ratings data: {json.dumps(ratings, indent=2)}")
-            
-            # Save ratings to file
-            clean_name = self.current_country.lower().replace(' ', '_')
-            ratings_file = f"ratings_{clean_name}.json"
-            file_path = os.path.join(self.data_dir, ratings_file)
-            
-            logger.debug(f"Saving ratings to: {file_path}")
-            
-            try:
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(ratings, f, indent=2)
-                logger.debug(f"Successfully saved ratings to {file_path}")
-            except Exception as save_error:
-                logger.error(f"Error saving ratings file: {save_error}")
-                raise
-            
-            # Update the display
-            if 'scores' in ratings:
-                self.data['scores'] = ratings['scores']
-                self.update_detailed_scores()
-                logger.debug("Updated display with new ratings")
-            else:
-                raise ValueError("Ratings data missing 'scores' section")
-            
-            if progress:
-                progress.close()
-            
-            QMessageBox.information(
-                self,
-                "Success",
-                f"Generated detailed ratings analysis for {self.current_country}"
-            )
-            
-        except Exception as e:
-            logger.error(f"Error in generate_ratings: {str(e)}")
-            if progress:
-                progress.close()
+        def on_failed(message):
+            logger.error(f"Error in generate_ratings: {message}")
+            if progress.isVisible():
+                close_progress()
             QMessageBox.critical(
                 self,
                 "Error",
-                f"Failed to generate ratings: {str(e)}\n\nCheck the logs for more details."
+                f"Failed to generate ratings: {message}\n\nCheck the logs for more details."
             )
-
-class CustomWebEnginePage(QWebEnginePage):
-    def javaScriptConsoleMessage(self, level, message, lineNumber, sourceID):
-        level_str = {
-            QWebEnginePage.JavaScriptConsoleMessageLevel.InfoMessageLevel: "INFO",
-            QWebEnginePage.JavaScriptConsoleMessageLevel.WarningMessageLevel: "WARNING",
-            QWebEnginePage.JavaScriptConsoleMessageLevel.ErrorMessageLevel: "ERROR"
-        }.get(level, "DEBUG")
-        
-        logger.log(
-            logging.INFO if level_str == "INFO" else 
-            logging.WARNING if level_str == "WARNING" else 
-            logging.ERROR if level_str == "ERROR" else 
-            logging.DEBUG,
-            f"JavaScript {level_str}: {message} (line: {lineNumber}, source: {sourceID})"
+        
+        def on_cancelled():
+            close_progress()
+            logger.info(f"Ratings generation for {country} cancelled by user")
+        
+        rated_categories = []
+        
+        def on_progress(stage, data=None):
+            if stage == "rating_category":
+                rated_categories.append(data['category'].replace('_', ' ').title())
+                progress.setLabelText(
+                    "Generating detailed ratings analysis...\n\n"
+                    f"Rated so far: {', '.join(rated_categories)}"
+                )
+        
+        logger.debug(f"Starting ratings generation for {country}")
+        summary = self.data.get('summary', {}).get('overall_notes', '')
+        self.run_in_background(
+            lambda progress_callback: self.location_generator.generate_ratings(
+                country, summary, progress_callback=progress_callback
+            ),
+            on_finished,
+            on_failed,
+            on_progress=on_progress,
+            on_cancelled=on_cancelled
         )
 
+def create_application(argv):
+    """Create the QApplication so that Qt WebEngine can still be loaded later"""
+    # Importing QtWebEngineWidgets sets this itself; mapview is imported after
+    # the QApplication exists, so it has to be set up front instead
+    QApplication.setAttribute(Qt.ApplicationAttribute.AA_ShareOpenGLContexts)
+    app = QApplication(argv)
+    app.setStyle('Fusion')
+    return app
+
 def main():
     # Set up dictionary path before creating QApplication
     try:
@@ -1315,8 +1788,7 @@ def main():
         os.environ["QTWEBENGINE_DICTIONARIES_PATH"] = fallback_path
         logger.debug(f"Using fallback dictionary path: {fallback_path}")
 
-    app = QApplication(sys.argv)
-    app.setStyle('Fusion')
+    app = create_application(sys.argv)
     viewer = LocationViewer()
     viewer.show()
     sys.exit(app.exec())
@@ -1,12 +1,28 @@
 import os
 import json
 import logging
-from typing import Dict, Tuple
-import anthropic
+import socket
+import threading
+import time
+import random
+import weakref
+import math
+import difflib
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 import re
-import googlemaps
+import textwrap
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_EXCEPTION
+from cache import PlaceCache, ResponseCache, PhotoCache, normalize_key
+from store import DataStore
+from streaming import StreamingJSONExtractor
+from metrics import Metrics, SIZE_BUCKETS, TOKEN_BUCKETS, estimate_tokens
+from schema import (compact_schema, extract_json, salvage, validate, repair, broken_sections,
+                    section_template, replace_section, SCORE_RANGE)
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -18,15 +34,327 @@ ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
 PERPLEXITY_API_KEY = os.getenv('PERPLEXITY_API_KEY')
 GOOGLE_MAPS_API_KEY = os.getenv('GOOGLE_MAPS_API_KEY')
 
+# Maximum number of Places lookups in flight at once
+PLACES_MAX_WORKERS = int(os.getenv('PLACES_MAX_WORKERS', '8'))
+
+# Country profile scores run 1-5, unlike the 1-10 detailed ratings
+COUNTRY_SCORE_RANGE = (1, 5)
+
+# Detailed ratings for every recommended location, this many Claude calls at a time
+LOCATION_RATINGS = os.getenv('LOCATION_RATINGS', 'true').lower() in ('1', 'true', 'yes')
+RATINGS_MAX_WORKERS = int(os.getenv('RATINGS_MAX_WORKERS', '8'))
+
+# Place lookup cache settings
+PLACE_CACHE_TTL_DAYS = float(os.getenv('PLACE_CACHE_TTL_DAYS', '30'))
+PLACE_CACHE_MAX_ENTRIES = int(os.getenv('PLACE_CACHE_MAX_ENTRIES', '5000'))
+
+# Place fields read from searchText; a details request is only made for
+# required fields the search left out, or always with PLACES_DETAILS_MODE=always
+PLACES_DETAILS_MODE = os.getenv('PLACES_DETAILS_MODE', 'fallback').lower()
+PLACE_FIELDS = (
+    'id', 'displayName', 'formattedAddress', 'location', 'types', 'photos',
+    'rating', 'userRatingCount', 'businessStatus', 'priceLevel'
+)
+PLACE_REQUIRED_FIELDS = ('id', 'displayName', 'formattedAddress', 'location')
+
+# Candidates fetched per place search; the best one is picked locally
+PLACES_CANDIDATES = int(os.getenv('PLACES_CANDIDATES', '5'))
+# Largest locationBias radius the Places API accepts
+PLACES_MAX_BIAS_RADIUS_M = 50000.0
+
+# Place photo thumbnails: longest side in pixels and on-disk cache size
+PHOTO_MAX_PX = int(os.getenv('PHOTO_MAX_PX', '300'))
+PHOTO_CACHE_MAX_MB = float(os.getenv('PHOTO_CACHE_MAX_MB', '100'))
+
+# Pipeline metrics: append events to a JSONL file and/or serve Prometheus text on a port
+METRICS_JSONL = os.getenv('METRICS_JSONL') or None
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+
+# Stream LLM responses so their JSON can be consumed while it arrives
+LLM_STREAMING = os.getenv('LLM_STREAMING', 'true').lower() in ('1', 'true', 'yes')
+
+# LLM response cache settings
+RESPONSE_CACHE_TTL_DAYS = float(os.getenv('RESPONSE_CACHE_TTL_DAYS', '7'))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '1000'))
+
+# Shared HTTP session settings
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', str(max(PLACES_MAX_WORKERS, 10))))
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '3'))
+HTTP_BACKOFF_FACTOR = float(os.getenv('HTTP_BACKOFF_FACTOR', '0.5'))
+
+# Per-provider request limits in requests per minute (0 disables the limit)
+PERPLEXITY_RPM = float(os.getenv('PERPLEXITY_RPM', '50'))
+ANTHROPIC_RPM = float(os.getenv('ANTHROPIC_RPM', '50'))
+PLACES_RPM = float(os.getenv('PLACES_RPM', '600'))
+
+# Backoff applied when a provider answers 429 Too Many Requests
+RATE_LIMIT_MAX_RETRIES = int(os.getenv('RATE_LIMIT_MAX_RETRIES', '5'))
+RATE_LIMIT_BASE_BACKOFF = float(os.getenv('RATE_LIMIT_BASE_BACKOFF', '1.0'))
+RATE_LIMIT_MAX_BACKOFF = float(os.getenv('RATE_LIMIT_MAX_BACKOFF', '60'))
+
+def parse_photo_name(photo_url: Optional[str]) -> Optional[str]:
+    """Extract the Places photo resource name from a media URL saved by older versions"""
+    if not photo_url:
+        return None
+    match = re.search(r'/v1/(places/[^/?]+/photos/[^/?]+)/media', photo_url)
+    return match.group(1) if match else None
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two points in kilometres"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2)
+    return 6371.0 * 2 * math.asin(math.sqrt(a))
+
+
+def name_similarity(a: str, b: str) -> float:
+    """0..1 similarity of two place names, ignoring case and punctuation"""
+    a = " ".join(re.sub(r'[^\w\s]', ' ', a.lower()).split())
+    b = " ".join(re.sub(r'[^\w\s]', ' ', b.lower()).split())
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    ratio = difflib.SequenceMatcher(None, a, b).ratio()
+    # "Louvre" vs "Musée du Louvre" should still count as a strong match
+    if a in b or b in a:
+        ratio = max(ratio, 0.9)
+    return ratio
+
+
+def perplexity_usage(payload: Dict) -> Optional[Tuple[int, int]]:
+    """(prompt, completion) tokens from a Perplexity response or stream event"""
+    usage = payload.get('usage') or {}
+    if 'prompt_tokens' not in usage:
+        return None
+    return usage['prompt_tokens'], usage.get('completion_tokens', 0)
+
+
+def parse_retry_after(value) -> Optional[float]:
+    """Parse a Retry-After header given either in seconds or as an HTTP date"""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+class RateLimiter:
+    """Token bucket shared by every thread calling one provider.
+
+    When the provider throttles us, every caller is held back until the
+    Retry-After time (or a jittered exponential backoff) has passed, and the
+    refill rate is halved, at most once per backoff window and never below a
+    tenth of the configured rate. Successful requests then restore it gradually.
+    """
+
+    def __init__(self, requests_per_minute: float, burst: int = None,
+                 base_backoff: float = RATE_LIMIT_BASE_BACKOFF,
+                 max_backoff: float = RATE_LIMIT_MAX_BACKOFF):
+        self.max_rate = requests_per_minute / 60.0
+        self.rate = self.max_rate
+        # Concurrent 429s from one burst must not drive the rate towards zero
+        self.min_rate = self.max_rate * 0.1
+        self.capacity = float(burst or max(1, int(self.rate)))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'throttled': 0, 'wait_seconds': 0.0}
+
+    def acquire(self, cancel_event: threading.Event = None):
+        """Block until a request may be sent"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = self.blocked_until - now
+                if wait <= 0:
+                    if self.rate <= 0:
+                        break
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                    self.updated_at = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        break
+                    wait = (1 - self.tokens) / self.rate
+            if cancel_event is not None:
+                if cancel_event.wait(wait):
+                    raise GenerationCancelled("Generation cancelled")
+            else:
+                time.sleep(wait)
+            waited += wait
+
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['wait_seconds'] += waited
+
+    def record_success(self):
+        """Recover the refill rate after a throttle, a little per success"""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+
+    def record_throttle(self, retry_after: Optional[float], attempt: int) -> float:
+        """Hold back all callers after a 429 and return the delay applied"""
+        if retry_after is not None:
+            delay = min(retry_after, self.max_backoff)
+        else:
+            # Full jitter keeps concurrent callers from retrying in lockstep
+            delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+        with self._lock:
+            now = time.monotonic()
+            if self.blocked_until <= now:
+                # Callers throttled by the same burst land inside this window
+                self.rate = max(self.min_rate, self.rate / 2)
+            self.blocked_until = max(self.blocked_until, now + delay)
+            self.tokens = min(self.tokens, 0.0)
+            self._stats['throttled'] += 1
+        return delay
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self._stats,
+                'wait_seconds': round(self._stats['wait_seconds'], 3),
+                'rate_per_minute': round(self.rate * 60, 2)
+            }
+
+
+class GenerationCancelled(Exception):
+    """Raised when a generation job is cancelled while in progress"""
+
+
+class CancellableHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose in-flight connections can be torn down from another thread"""
+
+    def __init__(self, *args, **kwargs):
+        self.cancelled = threading.Event()
+        self._connections = weakref.WeakSet()
+        self._connections_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        adapter = self
+
+        def tracked_pool(pool_cls):
+            class TrackedConnection(pool_cls.ConnectionCls):
+                def connect(self):
+                    if adapter.cancelled.is_set():
+                        raise GenerationCancelled("Request cancelled")
+                    super().connect()
+                    with adapter._connections_lock:
+                        adapter._connections.add(self)
+
+            return type(pool_cls.__name__, (pool_cls,), {'ConnectionCls': TrackedConnection})
+
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: tracked_pool(pool_cls)
+            for scheme, pool_cls in self.poolmanager.pool_classes_by_scheme.items()
+        }
+
+    def send(self, request, *args, **kwargs):
+        if self.cancelled.is_set():
+            raise GenerationCancelled("Request cancelled")
+        return super().send(request, *args, **kwargs)
+
+    def abort(self):
+        """Refuse new requests and shut down the sockets of those in flight"""
+        self.cancelled.set()
+        with self._connections_lock:
+            connections = list(self._connections)
+        for connection in connections:
+            sock = getattr(connection, 'sock', None)
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        logger.debug(f"Aborted {len(connections)} HTTP connections")
+
+    def reset(self):
+        self.cancelled.clear()
+
+
+def create_http_session(pool_maxsize: int = HTTP_POOL_MAXSIZE,
+                        max_retries: int = HTTP_MAX_RETRIES,
+                        backoff_factor: float = HTTP_BACKOFF_FACTOR) -> requests.Session:
+    """Create a keep-alive session with per-host connection pools and retries"""
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        # 429s and Retry-After are left to the per-provider RateLimiter so every
+        # thread backs off together
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'POST']),
+        respect_retry_after_header=False,
+        raise_on_status=False
+    )
+    adapter = CancellableHTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
 class LocationGenerator:
-    def __init__(self):
+    def __init__(self,
+                 places_max_workers: int = PLACES_MAX_WORKERS,
+                 ratings_max_workers: int = RATINGS_MAX_WORKERS,
+                 http_session: requests.Session = None,
+                 rate_limits: Dict[str, float] = None,
+                 metrics: Metrics = None,
+                 anthropic_client=None,
+                 data_dir: str = None):
+        """http_session and anthropic_client replace the provider clients,
+        e.g. with the record/replay stand-ins in fakes.py; data_dir moves the
+        generated files and caches away from the app's data directory."""
         logger.debug("Initializing LocationGenerator")
+        # Disabled (and free) unless METRICS_JSONL or METRICS_PORT is set
+        self.metrics = metrics or Metrics(METRICS_JSONL, METRICS_PORT or None)
+        self.places_max_workers = max(1, places_max_workers)
+        self.ratings_max_workers = max(1, ratings_max_workers)
+        self.cancel_event = threading.Event()
+        
+        # One limiter per provider, shared by all concurrent jobs
+        limits = {
+            'perplexity': PERPLEXITY_RPM,
+            'anthropic': ANTHROPIC_RPM,
+            'places': PLACES_RPM
+        }
+        limits.update(rate_limits or {})
+        self.rate_limiters = {provider: RateLimiter(rpm) for provider, rpm in limits.items()}
+        # How often place lookups needed a details request after searchText
+        self._places_stats_lock = threading.Lock()
+        self._places_stats = {'searches': 0, 'details_fallbacks': 0, 'reranked': 0}
+        # Token usage of the LLM calls actually sent, see token_stats()
+        self._token_stats_lock = threading.Lock()
+        self._token_stats = {}
+        # Futures of the geocoded centers (None when not found) of the destinations searched around
+        self._search_centers = {}
+        self._search_center_lock = threading.Lock()
+        # One pooled session for every outbound REST call
+        self.http = http_session or create_http_session(
+            pool_maxsize=max(HTTP_POOL_MAXSIZE, self.places_max_workers)
+        )
         self.template_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
-        self.data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+        self.data_dir = data_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
         
         # Create data directory if it doesn't exist
         os.makedirs(self.data_dir, exist_ok=True)
         logger.debug(f"Initialized data directory at: {self.data_dir}")
+        self.store = DataStore(self.data_dir)
         
         # Load templates with error handling
         self.score_template = {}
@@ -67,7 +395,7 @@ class LocationGenerator:
                             "brief": "Example description",
                             "formatted_address": "",
                             "place_id": "",
-                            "photo_url": None,
+                            "photo_name": None,
                             "rating": None,
                             "user_ratings_total": None,
                             "business_status": None,
@@ -78,37 +406,321 @@ class LocationGenerator:
         except Exception as e:
             logger.error(f"Error loading locations template: {e}")
 
-        # Initialize the clients
-        self.anthropic_client = anthropic.Client(api_key=ANTHROPIC_API_KEY)
+        # Country profiles are only validated when their template is available
+        self.country_template = {}
+        try:
+            country_template_path = os.path.join(self.template_dir, 'country_profile_template.json')
+            if os.path.exists(country_template_path):
+                with open(country_template_path) as f:
+                    self.country_template = json.load(f)
+            else:
+                logger.warning(f"Country profile template not found at {country_template_path}")
+        except Exception as e:
+            logger.error(f"Error loading country profile template: {e}")
+
+        # What LLM answers are checked against. Ratings never use the template's
+        # recommended_locations, and of a listed location only the fields Places
+        # can't fill in are required.
+        self.ratings_template = {
+            key: value for key, value in self.score_template.items() if key != 'recommended_locations'
+        }
+        location_example = (self.locations_template.get('recommended_locations') or [{}])[0]
+        self.listed_locations_template = {"recommended_locations": [
+            {key: location_example.get(key, '') for key in ('name', 'region')}
+        ]}
+        # Shape of a rating for the prompt, without the template's example content
+        self.ratings_schema = compact_schema(self.ratings_template)
+
+        # The Anthropic SDK is slow to import, so the client is built on first use
+        self._anthropic_client = anthropic_client
+        self._anthropic_client_lock = threading.Lock()
         self.perplexity_headers = {
             "Authorization": f"Bearer {PERPLEXITY_API_KEY}",
             "Content-Type": "application/json",
         }
         self.perplexity_url = "https://api.perplexity.ai/chat/completions"
 
-        # Initialize Google Maps client
-        self.gmaps = googlemaps.Client(key=GOOGLE_MAPS_API_KEY)
+        # Cache of resolved places shared across runs
+        self.place_cache = PlaceCache(
+            os.path.join(self.data_dir, 'cache', 'place_cache.sqlite3'),
+            ttl_seconds=PLACE_CACHE_TTL_DAYS * 24 * 3600,
+            max_entries=PLACE_CACHE_MAX_ENTRIES
+        )
+        
+        # Cache of LLM responses keyed by a hash of the request
+        self.response_cache = ResponseCache(
+            os.path.join(self.data_dir, 'cache', 'response_cache.sqlite3'),
+            ttl_seconds=RESPONSE_CACHE_TTL_DAYS * 24 * 3600,
+            max_entries=RESPONSE_CACHE_MAX_ENTRIES
+        )
+        
+        # Photo thumbnails are fetched on their own session so cancelling a
+        # generation job doesn't break photos the map is showing. An injected
+        # session is used for both.
+        self.photo_http = http_session or create_http_session(pool_maxsize=4)
+        self.photo_cache = PhotoCache(
+            os.path.join(self.data_dir, 'cache', 'photo_cache.sqlite3'),
+            os.path.join(self.data_dir, 'cache', 'photos'),
+            ttl_seconds=PLACE_CACHE_TTL_DAYS * 24 * 3600,
+            max_bytes=int(PHOTO_CACHE_MAX_MB * 1024 * 1024)
+        )
+
+    def cancel(self):
+        """Cancel the running job, aborting any HTTP requests in flight"""
+        logger.info("Cancelling generation")
+        self.cancel_event.set()
+        for adapter in set(self.http.adapters.values()):
+            if isinstance(adapter, CancellableHTTPAdapter):
+                adapter.abort()
+
+    def reset_cancel(self):
+        """Clear a previous cancellation so new jobs can run"""
+        self.cancel_event.clear()
+        for adapter in set(self.http.adapters.values()):
+            if isinstance(adapter, CancellableHTTPAdapter):
+                adapter.reset()
+
+    def _check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise GenerationCancelled("Generation cancelled")
+
+    def _acquire(self, provider: str, cancellable: bool = True):
+        """Wait for the provider's rate limit before sending a request"""
+        if not cancellable:
+            self.rate_limiters[provider].acquire()
+            return
+        self.rate_limiters[provider].acquire(self.cancel_event)
+        self._check_cancelled()
+
+    def _request(self, provider: str, method: str, url: str,
+                 session: requests.Session = None, **kwargs) -> requests.Response:
+        """Send a rate-limited request, backing off and retrying while throttled.
+        
+        Requests on a session other than the generation session are not tied
+        to the cancel event.
+        """
+        session = session or self.http
+        cancellable = session is self.http
+        limiter = self.rate_limiters[provider]
+        for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+            self._acquire(provider, cancellable)
+            started = time.perf_counter()
+            response = session.request(method, url, **kwargs)
+            # For streamed responses this is the time to the response headers
+            self.metrics.observe(
+                'request_seconds', time.perf_counter() - started,
+                provider=provider, status=response.status_code
+            )
+            if response.headers.get('Content-Length'):
+                self.metrics.observe(
+                    'response_bytes', int(response.headers['Content-Length']), SIZE_BUCKETS,
+                    provider=provider
+                )
+            if response.status_code != 429:
+                limiter.record_success()
+                return response
+            if attempt < RATE_LIMIT_MAX_RETRIES:
+                self.metrics.increment('rate_limit_retries', provider=provider)
+                response.close()
+                delay = limiter.record_throttle(
+                    parse_retry_after(response.headers.get('Retry-After')), attempt
+                )
+                logger.warning(f"{provider} rate limited us, backing off {delay:.1f}s")
+        return response
+
+    def _record_llm_call(self, provider: str, prompt: str, text: str, started: float,
+                         usage: Optional[Tuple[int, int]] = None):
+        """Record latency, sizes and (prompt, completion) token counts of one LLM call.
+        
+        Token counts come from the provider's usage report when it sent one,
+        and are estimated from the text otherwise.
+        """
+        seconds = time.perf_counter() - started
+        if usage:
+            prompt_tokens, completion_tokens = usage
+            source = 'provider'
+        else:
+            prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(text)
+            source = 'estimate'
+        self.metrics.observe('llm_seconds', seconds, provider=provider)
+        self.metrics.observe('prompt_chars', len(prompt), SIZE_BUCKETS, provider=provider)
+        self.metrics.observe('response_chars', len(text), SIZE_BUCKETS, provider=provider)
+        self.metrics.observe('prompt_tokens', prompt_tokens, TOKEN_BUCKETS, provider=provider, source=source)
+        self.metrics.observe('completion_tokens', completion_tokens, TOKEN_BUCKETS,
+                             provider=provider, source=source)
+        with self._token_stats_lock:
+            stats = self._token_stats.setdefault(
+                provider, {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'seconds': 0.0}
+            )
+            stats['calls'] += 1
+            stats['prompt_tokens'] += prompt_tokens
+            stats['completion_tokens'] += completion_tokens
+            stats['seconds'] += seconds
+        logger.debug(
+            f"{provider} call: {prompt_tokens} prompt and {completion_tokens} completion tokens "
+            f"({source}) in {seconds:.2f}s"
+        )
+
+    def token_stats(self) -> Dict[str, Dict]:
+        """Per-provider LLM calls with their total and average token counts"""
+        with self._token_stats_lock:
+            totals = {provider: dict(stats) for provider, stats in self._token_stats.items()}
+        for stats in totals.values():
+            calls = stats['calls']
+            stats['seconds'] = round(stats['seconds'], 3)
+            stats['avg_prompt_tokens'] = round(stats['prompt_tokens'] / calls, 1)
+            stats['avg_completion_tokens'] = round(stats['completion_tokens'] / calls, 1)
+            stats['avg_seconds'] = round(stats['seconds'] / calls, 3)
+        return totals
+
+    def _record_cache_lookup(self, cache: str, hit: bool, **labels):
+        self.metrics.increment('cache_requests', cache=cache, result='hit' if hit else 'miss', **labels)
+
+    def rate_limit_stats(self) -> Dict[str, Dict]:
+        """Per-provider request, throttle and wait counters"""
+        return {provider: limiter.stats() for provider, limiter in self.rate_limiters.items()}
+
+    def places_stats(self) -> Dict:
+        """Place lookup counters, including how often the details fallback fired"""
+        with self._places_stats_lock:
+            stats = dict(self._places_stats)
+        stats['fallback_rate'] = (
+            round(stats['details_fallbacks'] / stats['searches'], 3) if stats['searches'] else 0.0
+        )
+        return stats
+
+    def _count_places_stat(self, name: str):
+        with self._places_stats_lock:
+            self._places_stats[name] += 1
+
+    def _perplexity_payload(self, prompt: str) -> Dict:
+        return {
+            "model": "llama-3.1-sonar-small-128k-online",  # Updated to use sonar model
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "You are a location research expert. Provide accurate, real-world information about locations, including exact coordinates and verified details. Format responses as JSON when requested."
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "temperature": 0.1,  # Keep low temperature for factual responses
+            "max_tokens": 4000
+        }
+
+    def _claude_request(self, prompt: str) -> Dict:
+        return {
+            "model": "claude-3-opus-20240229",
+            "max_tokens": 4000,
+            "temperature": 0.7,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+        }
+
+    def _response_cache_key(self, provider: str, prompt: str) -> str:
+        request = self._perplexity_payload(prompt) if provider == 'perplexity' else self._claude_request(prompt)
+        return ResponseCache.make_key(provider=provider, **request)
+
+    def _discard_cached_response(self, provider: str, prompt: str):
+        """Forget a cached response that turned out to be unusable"""
+        self.response_cache.delete(self._response_cache_key(provider, prompt))
+
+    def _parse_checked(self, provider: str, response: str, template: Dict, context: str,
+                       score_range: Tuple = SCORE_RANGE, bypass_cache: bool = False) -> Dict:
+        """Parse a JSON answer and bring it in line with template.
+        
+        Defects are repaired locally first: a missing fence, trailing commas,
+        scores out of range. Sections that stay missing or malformed are asked
+        for again one at a time, given context (what the original prompt
+        wanted), so a bad answer costs a small call instead of a rerun.
+        Raises ValueError when the answer can't be repaired.
+        """
+        data = extract_json(response)
+        if not isinstance(data, dict):
+            data = salvage(response, template)
+            if not data:
+                raise ValueError(f"Could not extract JSON from {provider} response")
+            logger.warning(f"Salvaged {', '.join(data)} from a malformed {provider} response")
+        
+        data, fixes = repair(data, template, score_range)
+        if fixes:
+            logger.info(f"Repaired {fixes} values in {provider} response")
+            self.metrics.increment('json_local_repairs', fixes, provider=provider)
+        
+        for section in broken_sections(data, template, score_range):
+            self._check_cancelled()
+            replace_section(data, section, self._reask_section(
+                provider, context, section, section_template(template, section), score_range, bypass_cache
+            ))
+        return data
 
-    def _get_perplexity_response(self, prompt: str) -> str:
+    def _reask_section(self, provider: str, context: str, section: Tuple, template, score_range: Tuple,
+                       bypass_cache: bool = False):
+        """Ask the model for one section of an answer again and check the reply"""
+        name = '.'.join(str(member) for member in section)
+        logger.warning(f"Asking {provider} again for the {name} section")
+        self.metrics.increment('json_section_retries', provider=provider)
+        key = section[-1]
+        parent_key = section[-2] if len(section) > 1 else None
+        prompt = textwrap.dedent("""
+            {context}
+            
+            Reply with only the "{name}" part, as JSON of exactly this shape. Keys are literal; str is
+            a short factual description, {low}-{high} an integer score, [str] a list of short items:
+            {schema}
+            
+            Format response as ```json```.
+        """).strip().format(
+            context=context.strip(), name=name, low=score_range[0], high=score_range[1],
+            schema=compact_schema(template, score_range=score_range, key=key, parent_key=parent_key)
+        )
+        ask = self._get_claude_response if provider == 'anthropic' else self._get_perplexity_response
+        value = extract_json(ask(prompt, bypass_cache))
+        if isinstance(value, dict) and list(value) == [key] and not (
+            isinstance(template, dict) and key in template
+        ):
+            # The section came back wrapped in its own key
+            value = value[key]
+        value, _ = repair(value, template, score_range, key, parent_key)
+        issues = validate(value, template, score_range, key, parent_key)
+        if value is None or issues:
+            self._discard_cached_response(provider, prompt)
+            problem = f"{issues[0][1]} at {issues[0][0]}" if issues else "no JSON"
+            raise ValueError(f"Could not repair the {name} section: {problem}")
+        return value
+
+    def _get_perplexity_response(self, prompt: str, bypass_cache: bool = False, on_text=None) -> str:
+        """Send a prompt to Perplexity, streaming text chunks to on_text if given"""
         logger.debug("Sending prompt to Perplexity")
+        cache_key = self._response_cache_key('perplexity', prompt)
+        if not bypass_cache:
+            cached = self.response_cache.get(cache_key)
+            self._record_cache_lookup('response', cached is not None, provider='perplexity')
+            if cached is not None:
+                logger.debug("Response cache hit for Perplexity prompt")
+                if on_text:
+                    on_text(cached)
+                return cached
+        
+        self._check_cancelled()
+        started = time.perf_counter()
         try:
-            payload = {
-                "model": "llama-3.1-sonar-small-128k-online",  # Updated to use sonar model
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "You are a location research expert. Provide accurate, real-world information about locations, including exact coordinates and verified details. Format responses as JSON when requested."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "temperature": 0.1,  # Keep low temperature for factual responses
-                "max_tokens": 4000
-            }
+            payload = self._perplexity_payload(prompt)
+            if on_text:
+                content, usage = self._stream_perplexity_response(payload, on_text)
+                self._record_llm_call('perplexity', prompt, content, started, usage)
+                self.response_cache.put(cache_key, content)
+                return content
 
-            response = requests.post(
+            response = self._request(
+                'perplexity',
+                'POST',
                 self.perplexity_url,
                 headers=self.perplexity_headers,
                 json=payload,
@@ -122,11 +734,17 @@ class LocationGenerator:
             if 'choices' in result and len(result['choices']) > 0:
                 content = result['choices'][0]['message']['content']
                 logger.debug(f"Extracted content: {content}")
+                self._record_llm_call('perplexity', prompt, content, started, perplexity_usage(result))
+                self.response_cache.put(cache_key, content)
                 return content
             else:
                 raise ValueError("No content in Perplexity response")
             
+        except GenerationCancelled:
+            raise
         except requests.exceptions.RequestException as e:
+            if self.cancel_event.is_set():
+                raise GenerationCancelled("Generation cancelled") from e
             logger.error(f"Perplexity API request failed: {str(e)}")
             logger.error(f"Response content: {e.response.content if hasattr(e, 'response') else 'No response content'}")
             raise
@@ -134,153 +752,476 @@ class LocationGenerator:
             logger.error(f"Error getting Perplexity response: {e}")
             raise
 
-    def _get_claude_response(self, prompt: str) -> str:
+    def _stream_perplexity_response(self, payload: Dict, on_text) -> Tuple[str, Optional[Tuple[int, int]]]:
+        """Read a Perplexity server-sent event stream, passing each delta to on_text.
+        
+        Returns the text and the token usage reported with the stream, if any.
+        """
+        response = self._request(
+            'perplexity',
+            'POST',
+            self.perplexity_url,
+            headers=self.perplexity_headers,
+            json={**payload, "stream": True},
+            timeout=30,
+            stream=True
+        )
+        with response:
+            response.raise_for_status()
+            response.encoding = 'utf-8'
+            chunks = []
+            usage = None
+            for line in response.iter_lines(decode_unicode=True):
+                self._check_cancelled()
+                if not line or not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    break
+                event = json.loads(data)
+                # Usage is repeated on every event; the last one has the final count
+                usage = perplexity_usage(event) or usage
+                choices = event.get('choices') or []
+                delta = choices[0].get('delta', {}).get('content') if choices else None
+                if delta:
+                    chunks.append(delta)
+                    on_text(delta)
+        
+        content = ''.join(chunks)
+        if not content:
+            raise ValueError("No content in Perplexity response")
+        logger.debug(f"Streamed content: {content}")
+        return content, usage
+
+    @property
+    def anthropic_client(self):
+        with self._anthropic_client_lock:
+            if self._anthropic_client is None:
+                import anthropic
+                # No SDK retries: 429s must reach the shared rate limiter, and
+                # _get_claude_response retries the other transient failures itself
+                self._anthropic_client = anthropic.Client(
+                    api_key=ANTHROPIC_API_KEY,
+                    max_retries=0
+                )
+            return self._anthropic_client
+
+    def _get_claude_response(self, prompt: str, bypass_cache: bool = False, on_text=None) -> str:
+        """Send a prompt to Claude, streaming text chunks to on_text if given"""
         logger.debug("Sending prompt to Claude")
+        cache_key = self._response_cache_key('anthropic', prompt)
+        if not bypass_cache:
+            cached = self.response_cache.get(cache_key)
+            self._record_cache_lookup('response', cached is not None, provider='anthropic')
+            if cached is not None:
+                logger.debug("Response cache hit for Claude prompt")
+                if on_text:
+                    on_text(cached)
+                return cached
+        
+        # Only imported once a prompt actually has to be sent
+        import anthropic
+        self._check_cancelled()
+        started = time.perf_counter()
         try:
-            response = self.anthropic_client.messages.create(
-                model="claude-3-opus-20240229",
-                max_tokens=4000,
-                temperature=0.7,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            )
-            logger.debug(f"Claude response: {response.content[0].text}")
-            return response.content[0].text
+            limiter = self.rate_limiters['anthropic']
+            attempt = transient_attempt = 0
+            while True:
+                self._acquire('anthropic')
+                try:
+                    response = self.anthropic_client.messages.create(
+                        **self._claude_request(prompt),
+                        stream=bool(on_text)
+                    )
+                    limiter.record_success()
+                    break
+                except anthropic.RateLimitError as e:
+                    if attempt == RATE_LIMIT_MAX_RETRIES:
+                        raise
+                    self.metrics.increment('rate_limit_retries', provider='anthropic')
+                    delay = limiter.record_throttle(
+                        parse_retry_after(e.response.headers.get('retry-after')), attempt
+                    )
+                    attempt += 1
+                    logger.warning(f"anthropic rate limited us, backing off {delay:.1f}s")
+                except (anthropic.APIConnectionError, anthropic.InternalServerError) as e:
+                    # Connection errors and 5xx get the same retry budget as the REST calls
+                    if transient_attempt == HTTP_MAX_RETRIES:
+                        raise
+                    delay = HTTP_BACKOFF_FACTOR * (2 ** transient_attempt)
+                    transient_attempt += 1
+                    logger.warning(f"anthropic request failed ({e}), retrying in {delay:.1f}s")
+                    if self.cancel_event.wait(delay):
+                        raise GenerationCancelled("Generation cancelled") from e
+            
+            if on_text:
+                chunks = []
+                prompt_tokens = completion_tokens = None
+                for event in response:
+                    if self.cancel_event.is_set():
+                        # Closing the stream drops the connection mid-response
+                        response.response.close()
+                        raise GenerationCancelled("Generation cancelled")
+                    if event.type == 'content_block_delta' and getattr(event.delta, 'text', None):
+                        chunks.append(event.delta.text)
+                        on_text(event.delta.text)
+                    elif event.type == 'message_start':
+                        prompt_tokens = event.message.usage.input_tokens
+                    elif event.type == 'message_delta':
+                        completion_tokens = event.usage.output_tokens
+                text = ''.join(chunks)
+                usage = (prompt_tokens, completion_tokens) if prompt_tokens is not None else None
+            else:
+                # The Anthropic SDK cannot be interrupted mid-request, so drop late results
+                self._check_cancelled()
+                text = response.content[0].text
+                reported = getattr(response, 'usage', None)
+                usage = (reported.input_tokens, reported.output_tokens) if reported else None
+            
+            logger.debug(f"Claude response: {text}")
+            self._record_llm_call('anthropic', prompt, text, started, usage)
+            self.response_cache.put(cache_key, text)
+            return text
+        except GenerationCancelled:
+            raise
         except Exception as e:
             logger.error(f"Error getting Claude response: {e}")
             raise
 
-    def _get_location_coordinates(self, location_name: str, region: str) -> Dict:
-        """Get accurate coordinates and details using Google Places API"""
+    def _get_location_coordinates(self, location_name: str, region: str,
+                                  search_area: Optional[Dict] = None) -> Dict:
+        """Get accurate coordinates and details using Google Places API.
+        
+        search_area ({"lat", "lng", "radius_m"}) biases the search toward the
+        destination and is used to rank the candidates it returns.
+        """
         logger.debug(f"Getting coordinates and details for {location_name} in {region}")
+        cached = self.place_cache.get(location_name, region, search_area)
+        self._record_cache_lookup('place', bool(cached))
+        if cached:
+            logger.debug(f"Place cache hit for {location_name}")
+            return cached
+        
+        self._check_cancelled()
         try:
             # Use Text Search with more specific parameters
             text_search_url = "https://places.googleapis.com/v1/places:searchText"
             
             payload = {
-                "textQuery": f"{location_name}, {region}",
+                "textQuery": ", ".join(part for part in (location_name, region) if part),
                 "languageCode": "en",
-                "maxResultCount": 1,
-                "locationBias": {
+                "maxResultCount": max(1, PLACES_CANDIDATES)
+            }
+            if search_area:
+                payload["locationBias"] = {
                     "circle": {
                         "center": {
-                            "latitude": 0,
-                            "longitude": 0
+                            "latitude": search_area['lat'],
+                            "longitude": search_area['lng']
                         },
-                        "radius": 20000.0
+                        "radius": search_area['radius_m']
                     }
                 }
-            }
             
             headers = {
                 "Content-Type": "application/json",
                 "X-Goog-Api-Key": GOOGLE_MAPS_API_KEY,
-                "X-Goog-FieldMask": (
-                    "places.id,places.displayName,places.formattedAddress,"
-                    "places.location,places.types,places.photos,"
-                    "places.rating,places.userRatingCount,places.businessStatus,places.priceLevel"
-                )
+                "X-Goog-FieldMask": ",".join(f"places.{field}" for field in PLACE_FIELDS)
             }
             
-            response = requests.post(
+            response = self._request(
+                'places',
+                'POST',
                 text_search_url,
                 headers=headers,
                 json=payload,
                 timeout=30
             )
             response.raise_for_status()
+            self._count_places_stat('searches')
             
             result = response.json()
             
-            if result.get('places'):
-                place = result['places'][0]
+            candidates = [place for place in result.get('places', []) if place.get('id')]
+            if candidates:
+                place_details = self._pick_candidate(candidates, location_name, search_area)
                 
-                # Get additional details including photos
-                place_id = place['id']
-                details_url = f"https://places.googleapis.com/v1/places/{place_id}"
-                
-                details_response = requests.get(
-                    details_url,
-                    headers={
-                        "X-Goog-Api-Key": GOOGLE_MAPS_API_KEY,
-                        "X-Goog-FieldMask": (
-                            "id,formattedAddress,location,types,displayName,"
-                            "photos,rating,userRatingCount,businessStatus,priceLevel"
-                        )
-                    }
-                )
-                details_response.raise_for_status()
-                place_details = details_response.json()
+                # searchText already returns every field we need; only ask for what it left out
+                if PLACES_DETAILS_MODE == 'always':
+                    missing = list(PLACE_FIELDS)
+                else:
+                    missing = [field for field in PLACE_REQUIRED_FIELDS if field not in place_details]
+                if missing:
+                    self._count_places_stat('details_fallbacks')
+                    logger.debug(f"Fetching {missing} for {location_name} from place details")
+                    details_response = self._request(
+                        'places',
+                        'GET',
+                        f"https://places.googleapis.com/v1/places/{place_details['id']}",
+                        headers={
+                            "X-Goog-Api-Key": GOOGLE_MAPS_API_KEY,
+                            "X-Goog-FieldMask": ",".join(missing)
+                        },
+                        timeout=30
+                    )
+                    details_response.raise_for_status()
+                    place_details = {**place_details, **details_response.json()}
                 
-                # Get photo if available
-                photo_url = None
+                # Keep the photo reference; the image itself is fetched when viewed
+                photo_name = None
                 if place_details.get('photos'):
-                    photo = place_details['photos'][0]
-                    photo_url = (
-                        f"https://places.googleapis.com/v1/{photo['name']}/media"
-                        f"?key={GOOGLE_MAPS_API_KEY}&maxHeightPx=400"
-                    )
+                    photo_name = place_details['photos'][0]['name']
                 
-                return {
+                details = {
                     "lat": place_details['location']['latitude'],
                     "lng": place_details['location']['longitude'],
                     "formatted_address": place_details['formattedAddress'],
                     "place_id": place_details['id'],
                     "name": place_details['displayName']['text'],
                     "types": place_details.get('types', []),
-                    "photo_url": photo_url,
+                    "photo_name": photo_name,
                     "rating": place_details.get('rating'),
                     "user_ratings_total": place_details.get('userRatingCount'),
                     "business_status": place_details.get('businessStatus'),
                     "price_level": place_details.get('priceLevel')
                 }
+                self.place_cache.put(location_name, region, details, search_area)
+                return details
             else:
                 logger.warning(f"No results found for {location_name}")
                 return None
                 
+        except GenerationCancelled:
+            raise
         except Exception as e:
+            if self.cancel_event.is_set():
+                raise GenerationCancelled("Generation cancelled") from e
             logger.error(f"Error getting details for {location_name}: {e}")
             logger.error(f"Response content: {e.response.content if hasattr(e, 'response') else 'No response content'}")
             return None
 
-    def _process_locations_data(self, locations_data: Dict) -> Dict:
-        """Process locations data to add accurate coordinates and details"""
-        processed_locations = {"recommended_locations": []}
+    def _pick_candidate(self, candidates: list, location_name: str,
+                        search_area: Optional[Dict]) -> Dict:
+        """Choose the search result that best matches the name and lies in the search area"""
+        if len(candidates) == 1:
+            return candidates[0]
         
-        for location in locations_data.get("recommended_locations", []):
-            # Get accurate coordinates and details from Google
-            details = self._get_location_coordinates(location['name'], location['region'])
-            
-            if details:
-                location.update({
-                    'coords': {
-                        "lat": details['lat'],
-                        "lng": details['lng']
-                    },
-                    'formatted_address': details['formatted_address'],
-                    'place_id': details['place_id'],
-                    'photo_url': details['photo_url'],
-                    'rating': details['rating'],
-                    'user_ratings_total': details['user_ratings_total'],
-                    'business_status': details['business_status'],
-                    'price_level': details['price_level']
-                })
-                
-                processed_locations['recommended_locations'].append(location)
-            else:
-                logger.warning(f"Skipping location {location['name']} - details not found")
+        def score(rank_and_place):
+            rank, place = rank_and_place
+            similarity = name_similarity(location_name, place.get('displayName', {}).get('text', ''))
+            # Keep a little of Google's own ordering as a tie-breaker
+            total = 0.6 * similarity + 0.1 * (1 - rank / len(candidates))
+            position = place.get('location')
+            if search_area and position:
+                distance = haversine_km(
+                    search_area['lat'], search_area['lng'],
+                    position['latitude'], position['longitude']
+                )
+                # Full marks inside the radius, fading to zero at twice the radius
+                radius_km = search_area['radius_m'] / 1000
+                total += 0.3 * max(0.0, min(1.0, 2 - distance / radius_km))
+            return total
+        
+        rank, best = max(enumerate(candidates), key=score)
+        if rank:
+            self._count_places_stat('reranked')
+            logger.debug(f"Picked candidate {rank + 1} of {len(candidates)} for {location_name}")
+        return best
+
+    def _get_search_area(self, main_location: str, distance_km: float) -> Optional[Dict]:
+        """Geocoded center and radius of a destination, used to bias place searches.
+        
+        Each destination is geocoded once per generator, failures included; the
+        first caller does the lookup and any concurrent callers wait on its Future.
+        """
+        key = normalize_key(main_location)
+        with self._search_center_lock:
+            future = self._search_centers.get(key)
+            owner = future is None
+            if owner:
+                future = self._search_centers[key] = Future()
+        if owner:
+            try:
+                # Resolved like any other place, so the place cache covers it across runs
+                details = self._get_location_coordinates(main_location, "")
+            except BaseException as e:
+                # Not remembered, so a cancelled or failed lookup can be retried later
+                with self._search_center_lock:
+                    self._search_centers.pop(key, None)
+                future.set_exception(e)
+                raise
+            center = (details['lat'], details['lng']) if details else None
+            if center is None:
+                logger.warning(f"Could not geocode {main_location}; place searches are unbiased")
+            future.set_result(center)
+        center = future.result()
+        if center is None:
+            return None
+        return {
+            "lat": center[0],
+            "lng": center[1],
+            "radius_m": float(min(PLACES_MAX_BIAS_RADIUS_M, max(1000.0, distance_km * 1000)))
+        }
+
+    def get_place_photo(self, photo_name: str) -> Optional[Tuple[bytes, str]]:
+        """Return (image bytes, mime type) for a place photo thumbnail.
+        
+        Thumbnails come from the local photo cache when possible; otherwise the
+        Places media endpoint is asked for a short-lived photo URI, so the API
+        key never leaves the request headers.
+        """
+        photo_key = f"{photo_name}@{PHOTO_MAX_PX}"
+        cached = self.photo_cache.get(photo_key)
+        self._record_cache_lookup('photo', bool(cached))
+        if cached:
+            return cached
+        
+        try:
+            response = self._request(
+                'places',
+                'GET',
+                f"https://places.googleapis.com/v1/{photo_name}/media",
+                session=self.photo_http,
+                headers={"X-Goog-Api-Key": GOOGLE_MAPS_API_KEY},
+                params={
+                    "maxHeightPx": PHOTO_MAX_PX,
+                    "maxWidthPx": PHOTO_MAX_PX,
+                    "skipHttpRedirect": "true"
+                },
+                timeout=30
+            )
+            response.raise_for_status()
+            image = self.photo_http.get(response.json()['photoUri'], timeout=30)
+            image.raise_for_status()
+        except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+            logger.error(f"Error fetching photo {photo_name}: {e}")
+            return None
+        
+        mime_type = image.headers.get('Content-Type', 'image/jpeg').split(';')[0].strip()
+        self.photo_cache.put(photo_key, image.content, mime_type)
+        logger.debug(f"Cached photo {photo_name} ({len(image.content)} bytes)")
+        return image.content, mime_type
+
+    def _enrich_location(self, location: Dict, search_area: Optional[Dict] = None) -> Optional[Dict]:
+        """Add Places coordinates and details to a location, or None if not found"""
+        fields = self._place_fields(location, search_area)
+        if fields is None:
+            return None
+        location.update(fields)
+        return location
+
+    def _place_fields(self, location: Dict, search_area: Optional[Dict] = None) -> Optional[Dict]:
+        """The Places coordinates and details for a location, or None if not found"""
+        with self.metrics.span('place_lookup'):
+            details = self._get_location_coordinates(location['name'], location['region'], search_area)
+        if not details:
+            logger.warning(f"Skipping location {location['name']} - details not found")
+            return None
+        return {
+            'coords': {
+                "lat": details['lat'],
+                "lng": details['lng']
+            },
+            'formatted_address': details['formatted_address'],
+            'place_id': details['place_id'],
+            'photo_name': details.get('photo_name') or parse_photo_name(details.get('photo_url')),
+            'rating': details['rating'],
+            'user_ratings_total': details['user_ratings_total'],
+            'business_status': details['business_status'],
+            'price_level': details['price_level']
+        }
+
+    def _process_locations_data(self, locations_data: Dict, search_area: Optional[Dict] = None,
+                                stop: Optional[threading.Event] = None) -> Dict:
+        """Process locations data to add accurate coordinates and details
+
+        Lookups that have not started when ``stop`` is set are skipped.
+        """
+        def enrich(location: Dict) -> Optional[Dict]:
+            if stop is not None and stop.is_set():
+                return None
+            return self._enrich_location(location, search_area)
 
+        processed_locations = {"recommended_locations": []}
+        locations = locations_data.get("recommended_locations", [])
+        if not locations:
+            return processed_locations
+        
+        # Resolve all locations in parallel; map() keeps the input order
+        max_workers = min(self.places_max_workers, len(locations))
+        logger.debug(f"Resolving {len(locations)} locations with {max_workers} workers")
+        with self.metrics.span('places_enrichment'), ThreadPoolExecutor(max_workers=max_workers) as executor:
+            enriched = list(executor.map(enrich, locations))
+        
+        processed_locations['recommended_locations'] = [
+            location for location in enriched if location
+        ]
         return processed_locations
 
+    def _stream_locations_data(self, prompt: str, bypass_cache: bool, progress_callback=None,
+                               main_location: str = None, distance_km: float = None,
+                               context: str = '', stop: Optional[threading.Event] = None) -> Dict:
+        """Resolve each location with Places as soon as it appears in the streamed response"""
+        def lookup(location: Dict) -> Optional[Dict]:
+            if stop is not None and stop.is_set():
+                return None
+            # The first lookup geocodes the destination; the rest reuse it
+            search_area = self._get_search_area(main_location, distance_km) if main_location else None
+            fields = self._place_fields(location, search_area)
+            if fields and progress_callback:
+                progress_callback("location", {**location, **fields})
+            return fields
+
+        # Stream index -> (streamed item, future of its Places fields)
+        futures = {}
+        with ThreadPoolExecutor(max_workers=self.places_max_workers) as executor:
+            def on_item(index, item):
+                if isinstance(item, dict) and item.get('name') and item.get('region'):
+                    futures[index] = (item, executor.submit(lookup, dict(item)))
+
+            extractor = StreamingJSONExtractor('recommended_locations', on_item)
+            response = self._get_perplexity_response(prompt, bypass_cache, on_text=extractor.feed)
+            logger.debug(f"Started {extractor.items_emitted} Places lookups while streaming")
+            try:
+                locations = self._parse_checked(
+                    'perplexity', response, self.listed_locations_template, context, bypass_cache=bypass_cache
+                )["recommended_locations"]
+            except ValueError:
+                self._discard_cached_response('perplexity', prompt)
+                raise
+
+            # Repairs only drop or change items, so pair each record with the next streamed
+            # item of the same name and region; a place listed twice keeps both lookups.
+            # Anything the scanner could not hand over early is looked up now.
+            streamed = [futures[index] for index in sorted(futures)]
+            position = 0
+            pending = []
+            for location in locations:
+                future = None
+                for offset in range(position, len(streamed)):
+                    item, candidate = streamed[offset]
+                    if (item['name'], item['region']) == (location['name'], location['region']):
+                        future, position = candidate, offset + 1
+                        break
+                pending.append(future or executor.submit(lookup, location))
+
+            # The Places fields go onto the repaired records, not the streamed copies
+            enriched = []
+            for location, future in zip(locations, pending):
+                fields = future.result()
+                if fields:
+                    location.update(fields)
+                    enriched.append(location)
+
+        return {"recommended_locations": enriched}
+
     def _get_basic_location_info(self, 
                                 main_location: str, 
                                 focus_keyword: str, 
                                 distance_km: int, 
-                                num_results: int) -> Dict:
+                                num_results: int,
+                                bypass_cache: bool = False,
+                                progress_callback=None) -> Dict:
         logger.debug(f"Getting basic location info for {main_location}")
         
         # Update prompts to emphasize real-world data
@@ -346,24 +1287,71 @@ class LocationGenerator:
         Ensure all coordinates and details are accurate. Format as ```json```.
         """
 
+        # What each prompt asks for, repeated when a section of an answer is asked for again
+        country_context = (
+            f"Create a country profile for {main_location} focusing on {focus_keyword}. "
+            "Use only verified, real-world information."
+        )
+        locations_context = (
+            f"List {num_results} verified, real-world locations within {distance_km}km of "
+            f"{main_location} that are great for {focus_keyword}, with a brief description of each."
+        )
+
+        # Set when one prompt fails, so the other stops starting Places lookups.
+        # Not the shared cancel_event: concurrent jobs on this generator must keep running.
+        abandoned = threading.Event()
+
+        def fetch_country_data() -> Dict:
+            with self.metrics.span('country_profile'):
+                country_response = self._get_perplexity_response(country_prompt, bypass_cache)
+                try:
+                    return self._parse_checked(
+                        'perplexity', country_response, self.country_template, country_context,
+                        COUNTRY_SCORE_RANGE, bypass_cache
+                    )
+                except ValueError:
+                    # Don't replay an unusable answer on the next run
+                    self._discard_cached_response('perplexity', country_prompt)
+                    raise
+
+        def fetch_locations_data() -> Dict:
+            with self.metrics.span('locations_list'):
+                if LLM_STREAMING:
+                    return self._stream_locations_data(
+                        locations_prompt, bypass_cache, progress_callback, main_location, distance_km,
+                        locations_context, stop=abandoned
+                    )
+                locations_response = self._get_perplexity_response(locations_prompt, bypass_cache)
+                try:
+                    raw_locations_data = self._parse_checked(
+                        'perplexity', locations_response, self.listed_locations_template,
+                        locations_context, bypass_cache=bypass_cache
+                    )
+                except ValueError:
+                    self._discard_cached_response('perplexity', locations_prompt)
+                    raise
+                # Start Places enrichment right away rather than waiting on the country profile
+                return self._process_locations_data(
+                    raw_locations_data, self._get_search_area(main_location, distance_km), stop=abandoned
+                )
+
         try:
-            # Get country data from Perplexity
-            country_response = self._get_perplexity_response(country_prompt)
-            country_match = re.search(r'```json(.*?)```', country_response, re.DOTALL)
-            if country_match:
-                country_data = json.loads(country_match.group(1).strip())
-            else:
-                raise ValueError("Could not extract JSON from country response")
-
-            # Get locations from Perplexity
-            locations_response = self._get_perplexity_response(locations_prompt)
-            locations_match = re.search(r'```json(.*?)```', locations_response, re.DOTALL)
-            if locations_match:
-                raw_locations_data = json.loads(locations_match.group(1).strip())
-                # Process locations to get accurate coordinates
-                locations_data = self._process_locations_data(raw_locations_data)
-            else:
-                raise ValueError("Could not extract JSON from locations response")
+            # The two prompts are independent, so send them concurrently
+            executor = ThreadPoolExecutor(max_workers=2)
+            try:
+                country_future = executor.submit(fetch_country_data)
+                locations_future = executor.submit(fetch_locations_data)
+                done, _ = wait((country_future, locations_future), return_when=FIRST_EXCEPTION)
+                for future in done:
+                    future.result()
+                country_data = country_future.result()
+                locations_data = locations_future.result()
+            except BaseException:
+                # Surface the failure now instead of waiting on the other prompt
+                abandoned.set()
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+            executor.shutdown()
 
             return {
                 "country_data": country_data,
@@ -380,31 +1368,73 @@ class LocationGenerator:
         clean_location = main_location.lower().replace(' ', '_')
         clean_keyword = focus_keyword.lower().replace(' ', '_')
         
-        country_filename = f"country_{clean_location}_{clean_keyword}.json"
-        locations_filename = f"locations_{clean_location}_{clean_keyword}.json"
-        
-        with open(os.path.join(self.data_dir, country_filename), 'w') as f:
-            json.dump(basic_info['country_data'], f, indent=2)
-        
-        with open(os.path.join(self.data_dir, locations_filename), 'w') as f:
-            json.dump(basic_info['locations_data'], f, indent=2)
+        # Written atomically, and in the format DATA_FORMAT asks for
+        country_filename = self.store.save(
+            f"country_{clean_location}_{clean_keyword}.json", basic_info['country_data']
+        )
+        locations_filename = self.store.save(
+            f"locations_{clean_location}_{clean_keyword}.json", basic_info['locations_data']
+        )
         
         logger.debug(f"Saved country data to {country_filename} and locations data to {locations_filename}")
         return country_filename, locations_filename
 
-    def _get_detailed_info(self, basic_info: Dict) -> Dict:
-        logger.debug("Getting detailed scores and descriptions for locations")
-        # Simply return the basic_info since it already contains all necessary data
-        # and is properly formatted
+    def _get_detailed_info(self, basic_info: Dict, main_location: str, locations_filename: str,
+                           bypass_cache: bool = False, progress_callback=None) -> Dict:
+        """Add detailed ratings to every recommended location.
+        
+        Locations are rated ratings_max_workers at a time, sharing the Anthropic
+        rate limiter with any other job. The locations file is saved once when
+        the ratings are done, or as far as they got if the job stops early.
+        A location whose rating fails is kept without one.
+        """
+        locations = basic_info['locations_data'].get('recommended_locations', [])
+        if not LOCATION_RATINGS or not locations:
+            return basic_info
+        logger.debug(f"Getting detailed ratings for {len(locations)} locations")
+        rated_lock = threading.Lock()
+        rated = []
+        
+        def rate(location: Dict):
+            self._check_cancelled()
+            region = location.get('region') or main_location
+            summary = location.get('brief') or f"{location['name']} in {region}"
+            ratings = self.generate_ratings(f"{location['name']}, {region}", summary, bypass_cache)
+            with rated_lock:
+                location['ratings'] = ratings
+                rated.append(location['name'])
+                if progress_callback:
+                    progress_callback("location_ratings", {
+                        "name": location['name'],
+                        "rated": len(rated),
+                        "total": len(locations)
+                    })
+        
+        max_workers = min(self.ratings_max_workers, len(locations))
+        try:
+            with self.metrics.span('location_ratings'), ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(rate, location) for location in locations]
+                for location, future in zip(locations, futures):
+                    try:
+                        future.result()
+                    except GenerationCancelled:
+                        raise
+                    except Exception as e:
+                        logger.warning(f"Could not rate {location.get('name')}: {e}")
+        finally:
+            # One write for the whole batch; _update_files_with_details then finds it unchanged
+            if rated:
+                self.store.save(locations_filename, basic_info['locations_data'])
+        
+        logger.debug(f"Rated {len(rated)} of {len(locations)} locations")
         return basic_info
 
     def _update_files_with_details(self, detailed_info: Dict, country_filename: str, locations_filename: str):
         logger.debug("Updating files with detailed information")
-        with open(os.path.join(self.data_dir, country_filename), 'w') as f:
-            json.dump(detailed_info['country_data'], f, indent=2)
-        
-        with open(os.path.join(self.data_dir, locations_filename), 'w') as f:
-            json.dump(detailed_info['locations_data'], f, indent=2)
+        # The store skips records that are unchanged since _save_basic_info,
+        # which is every record while _get_detailed_info adds nothing
+        self.store.save(country_filename, detailed_info['country_data'])
+        self.store.save(locations_filename, detailed_info['locations_data'])
         logger.debug("Files updated successfully")
 
     def generate_locations(self, 
@@ -412,14 +1442,19 @@ class LocationGenerator:
                          focus_keyword: str, 
                          distance_km: int, 
                          num_results: int,
-                         progress_callback=None) -> tuple[str, str]:
+                         progress_callback=None,
+                         bypass_cache: bool = False) -> tuple[str, str]:
         logger.info(f"Generating locations for {main_location} with focus on {focus_keyword}")
         try:
             # Step 1: Identify locations
             logger.info("Step 1: Identifying locations and coordinates...")
-            basic_info = self._get_basic_location_info(
-                main_location, focus_keyword, distance_km, num_results
-            )
+            with self.metrics.span('basic_info'):
+                basic_info = self._get_basic_location_info(
+                    main_location, focus_keyword, distance_km, num_results, bypass_cache,
+                    progress_callback
+                )
+            
+            self._check_cancelled()
             
             # Update progress with country data
             if progress_callback:
@@ -427,9 +1462,10 @@ class LocationGenerator:
             
             # Step 2: Save basic info and update map
             logger.info("Step 2: Saving basic info and updating map...")
-            country_filename, locations_filename = self._save_basic_info(
-                basic_info, main_location, focus_keyword
-            )
+            with self.metrics.span('save_basic_info'):
+                country_filename, locations_filename = self._save_basic_info(
+                    basic_info, main_location, focus_keyword
+                )
             
             # Update progress with locations data
             if progress_callback:
@@ -437,22 +1473,31 @@ class LocationGenerator:
             
             # Step 3: Add scores and details
             logger.info("Step 3: Adding scores and additional details...")
-            detailed_info = self._get_detailed_info(basic_info)
+            detailed_info = self._get_detailed_info(
+                basic_info, main_location, locations_filename, bypass_cache, progress_callback
+            )
             
             # Step 4: Update tables with details
             logger.info("Step 4: Updating tables with detailed information...")
-            self._update_files_with_details(
-                detailed_info, country_filename, locations_filename
-            )
+            with self.metrics.span('update_files'):
+                self._update_files_with_details(
+                    detailed_info, country_filename, locations_filename
+                )
             
             logger.info("Location generation completed successfully")
             return country_filename, locations_filename
             
+        except GenerationCancelled:
+            logger.info("Location generation cancelled")
+            raise
         except Exception as e:
+            if self.cancel_event.is_set():
+                raise GenerationCancelled("Generation cancelled") from e
             logger.error(f"Error generating locations: {e}")
             raise
 
-    def generate_ratings(self, location_name: str, summary: str) -> Dict:
+    def generate_ratings(self, location_name: str, summary: str, bypass_cache: bool = False,
+                         progress_callback=None) -> Dict:
         """Generate detailed ratings using the template structure"""
         logger.debug(f"Generating ratings for {location_name}")
         
@@ -461,48 +1506,52 @@ class LocationGenerator:
             if not self.score_template:
                 raise ValueError("Score template not loaded")
             
-            prompt = f"""
-            Generate detailed ratings for {location_name} based on this summary:
-            {summary}
-            
-            Follow the exact structure of this template, but generate appropriate scores and descriptions:
-            {json.dumps(self.score_template, indent=2)}
-            
-            Ensure all scores are realistic and justified by available data.
-            Format response as ```json```.
-            """
+            # Dedented before filling in, with the schema in compact form, to keep input tokens down
+            prompt = textwrap.dedent("""
+                Generate detailed ratings for {location_name} based on this summary:
+                {summary}
+                
+                Reply with JSON of exactly this shape. Keys are literal; str is a short factual
+                description, 1-10 an integer score, [str] a list of short items:
+                {schema}
+                
+                Ensure all scores are realistic and justified by available data.
+                Format response as ```json```.
+            """).strip().format(location_name=location_name, summary=summary, schema=self.ratings_schema)
             
             logger.debug("Sending prompt to Claude")
-            response = self._get_claude_response(prompt)
+            on_text = None
+            if LLM_STREAMING and progress_callback:
+                # Report each score category as soon as its object closes in the stream
+                extractor = StreamingJSONExtractor(
+                    'scores',
+                    lambda category, data: progress_callback(
+                        "rating_category", {"category": category, "data": data}
+                    )
+                )
+                on_text = extractor.feed
+            with self.metrics.span('ratings_response'):
+                response = self._get_claude_response(prompt, bypass_cache, on_text=on_text)
             logger.debug(f"Received response from Claude: {response[:200]}...")  # Log first 200 chars
             
-            ratings_match = re.search(r'```json(.*?)```', response, re.DOTALL)
-            
-            if ratings_match:
-                ratings_text = ratings_match.group(1).strip()
-                logger.debug(f"Extracted JSON text: {ratings_text[:200]}...")  # Log first 200 chars
-                
-                try:
-                    ratings_data = json.loads(ratings_text)
-                    logger.debug("Successfully parsed JSON data")
-                    
-                    # Validate the structure
-                    if not isinstance(ratings_data, dict):
-                        raise ValueError("Ratings data is not a dictionary")
-                    if 'scores' not in ratings_data:
-                        raise ValueError("Ratings data missing 'scores' section")
-                    
-                    return ratings_data
-                    
-                except json.JSONDecodeError as json_error:
-                    logger.error(f"JSON parsing error: {json_error}")
-                    logger.error(f"Problematic JSON text: {ratings_text}")
-                    raise ValueError(f"Failed to parse ratings JSON: {json_error}")
-            else:
-                logger.error("Could not find JSON in Claude's response")
-                logger.error(f"Full response: {response}")
-                raise ValueError("Could not extract JSON from ratings response")
+            try:
+                ratings_data = self._parse_checked(
+                    'anthropic', response, self.ratings_template,
+                    f"Generate detailed ratings for {location_name} based on this summary:\n{summary}",
+                    bypass_cache=bypass_cache
+                )
+                logger.debug("Successfully parsed ratings JSON")
+                return ratings_data
+            except ValueError:
+                # Don't replay an unusable answer on the next run
+                self._discard_cached_response('anthropic', prompt)
+                raise
                 
+        except GenerationCancelled:
+            logger.info("Ratings generation cancelled")
+            raise
         except Exception as e:
+            if self.cancel_event.is_set():
+                raise GenerationCancelled("Generation cancelled") from e
             logger.error(f"Error generating ratings: {e}")
             raise
\ No newline at end of file